@@ -178,13 +178,12 @@ export const useMainStore = defineStore('main', () => {
 
   function getCompanyProducts() {
     const url = "http://localhost:5000/products"
-    const productsPayload = {
-      user_id: localStorage.getItem('userId'),
-      token: localStorage.getItem('token'),
-      comp_id: localStorage.getItem('companyId')
+    // GET so the browser revalidates its cached copy with the ETag instead of downloading it again
+    const productsHeaders = {
+      Authorization: `Bearer ${localStorage.getItem('token')}`
     };
     axios
-      .post(url, productsPayload)
+      .get(url, { headers: productsHeaders })
       .then((r) => {
         this.products = r.data.products
       })
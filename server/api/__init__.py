@@ -5,11 +5,16 @@ from api.company.routes import company
 from api.sales.routes import sales
 from api.clients.routes import clients
 from api.admin.routes import admin
+from api.auth.jwt_utils import load_keys
+from db.pool import pool_stats
+from services.audit_service import audit_service
+from services.sales_journal import sales_journal
 
 def create_app(config_file='settings.py'):
     ''' we add template from folder templates inside app directory '''
     app = Flask(__name__)
     app.config.from_pyfile(config_file)
+    load_keys(app)
     CORS(auth, origins=["*"])
     CORS(clients, origins=["*"])
     CORS(sales, origins=["*"])
@@ -20,6 +25,8 @@ def create_app(config_file='settings.py'):
     app.register_blueprint(sales)
     app.register_blueprint(clients)
     app.register_blueprint(admin)
+    # Write-behind mode: queue sales journaled by a previous run for commit and start the flusher
+    sales_journal.start()
 
     @app.route('/health', methods=['GET'])
     def health_check():
@@ -27,6 +34,9 @@ def create_app(config_file='settings.py'):
         return {
             'status': 'healthy',
             'message': 'ISCTE Spot API is running',
+            'db_pool': pool_stats(),
+            'audit_writer': dict(audit_service.stats, depth=audit_service.depth()),
+            'sales_write_behind': sales_journal.metrics(),
         }, 200
 
     return app
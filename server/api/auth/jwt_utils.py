@@ -1,17 +1,37 @@
-from flask import current_app
+import os
+import hashlib
+import time
+from flask import current_app, g, has_request_context, request
 import jwt
-import traceback
-from db.db_connector import DBConnector  # <--- [FIX] Importar para aceder à BD
+from cryptography.hazmat.primitives import serialization
+from api.utils.cache import TTLCache
+from .token_state import token_state
 
-def issue_token(user_id: int, comp_id: int, is_admin: bool, is_agent: bool) -> str:
+JWT_CACHE_TTL = float(os.getenv('JWT_CACHE_TTL', '300'))
+JWT_CACHE_SIZE = int(os.getenv('JWT_CACHE_SIZE', '10000'))
+
+# sha256(token) -> verified payload, so repeat tokens skip RSA verification
+_verified_tokens = TTLCache(maxsize=JWT_CACHE_SIZE, ttl=JWT_CACHE_TTL)
+
+def load_keys(app):
+    """ Parse the PEM keys once at app start and keep the key objects in the config """
+    private_pem = app.config.get('JWT_PRIVATE_PEM')
+    public_pem = app.config.get('JWT_PUBLIC_PEM')
+    if private_pem:
+        app.config['JWT_PRIVATE_KEY'] = serialization.load_pem_private_key(private_pem.encode(), password=None)
+    if public_pem:
+        app.config['JWT_PUBLIC_KEY'] = serialization.load_pem_public_key(public_pem.encode())
+
+def issue_token(user_id: int, comp_id: int, is_admin: bool, is_agent: bool, token_version: int = 0) -> str:
     """ Create a new token with user information """
     payload = {
         'user_id': user_id,
         'comp_id': comp_id,
         'is_admin': is_admin,
         'is_agent': is_agent,
+        'ver': token_version,
     }
-    private_key = current_app.config.get('JWT_PRIVATE_PEM')
+    private_key = current_app.config.get('JWT_PRIVATE_KEY') or current_app.config.get('JWT_PRIVATE_PEM')
     if private_key:
         try:
             token = jwt.encode(payload, key=private_key, algorithm='RS256')
@@ -20,41 +40,54 @@ def issue_token(user_id: int, comp_id: int, is_admin: bool, is_agent: bool) -> s
         except Exception as e:
             raise Exception('Issue RS256 token failed', e) from e
 
+def bearer_token(dict_data=None):
+    """ Token from the Authorization: Bearer header, else the body's token field; never read from the URL """
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and token.strip():
+        return token.strip()
+    return dict_data.get('token') if isinstance(dict_data, dict) else None
+
 def validate_token(token: str):
-    """ Validate JWT token with Database Check """
+    """ Validate JWT token, reusing the result within the same request """
+    if not has_request_context():
+        return _validate_token(token)
+    validated = g.setdefault('validated_tokens', {})
+    if token not in validated:
+        validated[token] = _validate_token(token)
+    return validated[token]
+
+def verify_signature(token: str) -> dict:
+    """ Decode an RS256 token, serving repeat tokens from the verified-token cache """
+    digest = hashlib.sha256(token.encode('utf-8')).digest()
+    payload = _verified_tokens.get(digest)
+    if payload is None:
+        public_key = current_app.config.get('JWT_PUBLIC_KEY') or current_app.config.get('JWT_PUBLIC_PEM')
+        payload = jwt.decode(token, key=public_key, algorithms=['RS256'])
+        ttl = JWT_CACHE_TTL
+        if 'exp' in payload:
+            ttl = min(ttl, payload['exp'] - time.time())
+        if ttl > 0:
+            _verified_tokens.set(digest, payload, ttl=ttl)
+    return dict(payload)
+
+def _validate_token(token: str):
+    """ Validate JWT signature and revocation state """
     if not token:
         return False, None
-    try:
-        jwt.get_unverified_header(token)
-    except Exception as e:
-        print("Error decoding header", e, traceback.format_exc())
-        return False, None
 
     try:
-        public_key_pem = current_app.config.get('JWT_PUBLIC_PEM', '')
-        if public_key_pem:
-            # 1. Validação Criptográfica (Assinatura)
-            payload = jwt.decode(
-                token,
-                key=public_key_pem,
-                algorithms=['RS256']
-            )
-
-            # --- [FIX START] VALIDAÇÃO DE ESTADO NA BASE DE DADOS ---
-            # Verifica se o token pertence a um utilizador que fez logout (isActive=0)
-            user_id = payload.get('user_id')
-            if user_id:
-                dbc = DBConnector()
-                # Usa a query existente 'get_user_by_id' que retorna {UserID, isActive, ...}
-                user_data = dbc.execute_query('get_user_by_id', args=user_id)
-                
-                # Se o utilizador não for encontrado ou isActive for 0/False
-                if not user_data or not user_data.get('isActive'):
-                    print(f"[AUTH SECURITY] Token rejected: User {user_id} is inactive (Logged out).")
-                    return False, None
-            # --- [FIX END] ---
-
-            return True, payload
+        # 1. Validação Criptográfica (Assinatura)
+        payload = verify_signature(token)
+
+        # 2. Revogação: utilizador ativo e versão do token atual (cache com TTL)
+        # Logout incrementa TokenVersion, invalidando os tokens emitidos antes
+        user_id = payload.get('user_id')
+        if user_id:
+            if not token_state.is_valid(user_id, payload.get('ver', 0)):
+                print(f"[AUTH SECURITY] Token rejected: User {user_id} is inactive or token revoked.")
+                return False, None
+
+        return True, payload
     except Exception as e:
         print("Error decoding RS256 with public key", e)
         pass
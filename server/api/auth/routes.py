@@ -4,6 +4,10 @@ from Crypto.Cipher import DES
 from Crypto.Util.Padding import pad, unpad
 import base64
 from .jwt_utils import issue_token, validate_token
+from .token_state import token_state
+from api.utils.timing import ServerTiming
+from services.activity_service import activity_service
+from services.bulk_sales import company_ownership
 
 auth = Blueprint('auth', __name__)
 
@@ -27,47 +31,47 @@ DES_KEY = "12345678"
 @auth.route('/login', methods=['POST'])
 def login():
     ''' Login function'''
+    timing = ServerTiming()
     dbc = DBConnector()
     dict_data = request.get_json()
     username = dict_data['username']
     password = dict_data['password']
 
-    _id = dbc.execute_query(query='get_user_by_name', args=username)
-    if not isinstance(_id, int):
+    # ID, hash, admin/agent flags and company in a single round trip
+    with timing.measure('db'):
+        profile = dbc.execute_query(query='get_login_profile', args=username)
+    if not profile or not isinstance(profile.get('UserID'), int):
         return jsonify({'status': 'Bad request'}), 400
+    _id = profile['UserID']
 
     # Check if it is Temporary password
     decrypted_password = ''
-    if password == 'T3MP-password-32':
-        decrypted_password = password
-    else:
-        encrypted_password = dbc.execute_query(query='get_user_password', args=_id)
-        decrypted_password = str(decrypt_password(encrypted_password, DES_KEY))
-        print(f'Password comparsion!! input: {password} vs decrypted_password: {decrypted_password}')
+    with timing.measure('password'):
+        if password == 'T3MP-password-32':
+            decrypted_password = password
+        else:
+            encrypted_password = profile['PasswordHash']
+            decrypted_password = str(decrypt_password(encrypted_password, DES_KEY))
+            print(f'Password comparsion!! input: {password} vs decrypted_password: {decrypted_password}')
     if password == decrypted_password:
-        dbc.execute_query(query='update_user_activity', args={
-            'user_id': _id,
-            'active': True
-        })
-        is_admin = dbc.execute_query(query='get_user_admin', args=_id)
-        is_agent = dbc.execute_query(query='get_user_agent', args=_id)
+        # LastLogin/isActive are written in batches off the request path;
+        # priming the token state lets the new token through meanwhile
+        activity_service.record_login(_id, profile['TokenVersion'])
+        token_state.mark_login(_id, profile['TokenVersion'])
+        is_admin = profile['IsAdmin'] == 1
+        is_agent = profile['IsAgent'] == 1
         print(f'Admin --> {is_admin}')
-        if is_admin == 1:
-            is_admin = True
-        else:
-            is_admin = False
-        if is_agent:
-            is_agent = True
-        else:
-            is_agent = False
 
-        comp_id = dbc.execute_query(query='get_user_comp_id', args=_id)
+        comp_id = profile['CompanyID']
         if not isinstance(comp_id, int):
             return jsonify({'status': 'Bad request'}), 400
 
-        token: str = issue_token(user_id=_id, comp_id=comp_id, is_admin=is_admin, is_agent=is_agent)
+        with timing.measure('token'):
+            token: str = issue_token(user_id=_id, comp_id=comp_id, is_admin=is_admin, is_agent=is_agent,
+                                     token_version=profile['TokenVersion'])
 
-        return jsonify({'status': 'Ok', 'user_id': _id, 'token': token, 'is_admin': is_admin, 'comp_id': comp_id}), 200
+        response = jsonify({'status': 'Ok', 'user_id': _id, 'token': token, 'is_admin': is_admin, 'comp_id': comp_id})
+        return timing.apply(response), 200
 
     return jsonify({'status': 'Bad credentials'}), 403
 
@@ -96,11 +100,12 @@ def logout():
 
     user_id = payload['user_id']
 
-    # 4. Desativa o utilizador na BD
+    # 4. Desativa o utilizador na BD e revoga os tokens emitidos (TokenVersion + 1)
     result = dbc.execute_query(query='update_user_activity', args={
         'user_id': user_id,
         'active': False
     })
+    token_state.invalidate(user_id)
 
     if isinstance(result, int):
         return jsonify({'status': 'Ok'}), 200
@@ -139,30 +144,31 @@ def signup():
     
     encrypted_password = encrypt_password(dict_data['password'], DES_KEY)
 
-    result = dbc.execute_query('create_user_admin', args={
-        "username": dict_data['username'],
-        "password": encrypted_password,
-        "email": dict_data['email'],
-        "comp_name": dict_data['comp_name'],
-        "num_employees": dict_data['num_employees'],
-        "is_admin": True 
-    })
-    if isinstance(result, int):
-        user_id = result
-    else:
+    try:
+        # Admin user and company are created together or not at all
+        with dbc.transaction() as tx:
+            user_id = tx.execute('create_user_admin', args={
+                "username": dict_data['username'],
+                "password": encrypted_password,
+                "email": dict_data['email'],
+                "comp_name": dict_data['comp_name'],
+                "num_employees": dict_data['num_employees'],
+                "is_admin": True
+            })
+            comp_id = tx.execute('create_company', args={
+                "user_id": user_id,
+                "comp_name": dict_data['comp_name'],
+                "num_employees": dict_data['num_employees']
+            })
+            result = tx.execute('update_user_comp_id', args={
+                'user_id': user_id,
+                'comp_id': comp_id
+            })
+    except Exception as e:
+        print(f"[SIGNUP] Failed to create company: {e}")
         return jsonify({'status': 'Bad request'}), 400
-
-    comp_id = dbc.execute_query('create_company', args={
-        "user_id": user_id,
-        "comp_name": dict_data['comp_name'],
-        "num_employees": dict_data['num_employees']
-    })
-    result = dbc.execute_query('update_user_comp_id', args={
-        'user_id': user_id,
-        'comp_id': comp_id
-    })
     token: str = issue_token(user_id=user_id, comp_id=comp_id, is_admin=True, is_agent=False)
-    if isinstance(result, int):
+    if result is True:
         return jsonify(
             {
                 'status': 'Ok',
@@ -189,6 +195,7 @@ def new_employee():
         'comp_id': dict_data['comp_id']
     })
     if isinstance(result, int):
+        company_ownership.invalidate(dict_data['comp_id'], 'user')
         return jsonify({'status': 'Ok', 'employee_id': result})
     else:
         return jsonify({'status': 'Bad request'})
@@ -201,23 +208,24 @@ def retire():
     is_valid, payload = validate_token(dict_data.get('token'))
     if not is_valid or not payload.get('is_admin'):
         return jsonify({'status': 'Unauthorized'}), 403
-    comp_id = payload['comp_id']
-    user_id = payload['user_id']
-    result = dbc.execute_query(query='delete_sales_by_comp_id', args=dict_data['comp_id'])
-    if result is False:
-        return jsonify({'status': 'Bad request'}), 400
-    result = dbc.execute_query(query='delete_products_by_comp_id', args=dict_data['comp_id'])
-    if result is False:
-        return jsonify({'status': 'Bad request'}), 400
-    result = dbc.execute_query(query='delete_users_by_comp_id', args=dict_data['comp_id'])
-    if result is False:
+    comp_id = dict_data['comp_id']
+    user_id = dict_data['user_id']
+    try:
+        # Company, catalog, sales and staff are removed atomically
+        with dbc.transaction() as tx:
+            tx.execute('delete_sales_by_comp_id', comp_id)
+            tx.execute('delete_products_by_comp_id', comp_id)
+            result = tx.execute('delete_company_by_id', comp_id)
+            if result is not True:
+                tx.rollback()
+            else:
+                tx.execute('delete_users_by_comp_id', comp_id)
+                tx.execute('delete_user_by_id', user_id)
+    except Exception as e:
+        print(f"[RETIRE] Failed to delete company {comp_id}: {e}")
         return jsonify({'status': 'Bad request'}), 400
-    result = dbc.execute_query('delete_company_by_id', dict_data['comp_id'])
-    if result is not True:
-        return jsonify({'status': "Bad request"}), 400
-    result = dbc.execute_query('delete_user_by_id', dict_data['user_id'])
-    if result is not True:
-        return jsonify({'status': "Bad request"}), 400
+    token_state.invalidate(user_id)
+    company_ownership.invalidate(comp_id)
     if result is True:
         return jsonify({'status': 'Ok'}), 200
     else:
@@ -232,6 +240,8 @@ def delete_employee():
     if not is_valid or not payload.get('is_admin'):
         return jsonify({'status': 'Unauthorized'}), 403
     result = dbc.execute_query('delete_user_by_id', dict_data['employee_id'])
+    token_state.invalidate(dict_data['employee_id'])
+    company_ownership.invalidate(payload['comp_id'], 'user')
     if result is True:
         return jsonify({'status': 'Ok'}), 200
     else:
@@ -0,0 +1,42 @@
+import os
+from db.db_connector import DBConnector
+from api.utils.cache import TTLCache
+
+# How long another worker may keep accepting a token revoked elsewhere
+TOKEN_STATE_TTL = float(os.getenv('TOKEN_STATE_TTL', '30'))
+TOKEN_STATE_SIZE = int(os.getenv('TOKEN_STATE_SIZE', '10000'))
+
+
+class TokenState:
+    '''
+    In-process cache of each user's active flag and token version.
+    A token is only accepted while its `ver` claim matches the user's
+    current TokenVersion, which logout increments.
+    '''
+
+    def __init__(self):
+        self._cache = TTLCache(maxsize=TOKEN_STATE_SIZE, ttl=TOKEN_STATE_TTL)
+
+    def get(self, user_id: int):
+        ''' {'active': bool, 'version': int} for the user, or None if it does not exist '''
+        state = self._cache.get(user_id)
+        if state is None:
+            row = DBConnector().execute_query('get_token_state', args=user_id)
+            if not row:
+                return None
+            state = {'active': bool(row['isActive']), 'version': row['TokenVersion']}
+            self._cache.set(user_id, state)
+        return state
+
+    def is_valid(self, user_id: int, version: int) -> bool:
+        state = self.get(user_id)
+        return bool(state and state['active'] and state['version'] == version)
+
+    def mark_login(self, user_id: int, version: int):
+        ''' Prime the cache after a login so its token is accepted before the activity write lands '''
+        self._cache.set(user_id, {'active': True, 'version': version})
+
+    def invalidate(self, user_id: int):
+        self._cache.pop(user_id)
+
+token_state = TokenState()
@@ -3,6 +3,7 @@ from db.db_connector import DBConnector
 from api.auth.jwt_utils import validate_token
 # Import corrigido para funcionar dentro do container
 from services.security_service import security_service
+from services.bulk_sales import company_ownership
 
 clients = Blueprint('clients', __name__)
 
@@ -62,6 +63,7 @@ def new_client():
     })
     
     if isinstance(result, int):
+        company_ownership.invalidate(comp_id, 'client')
         return jsonify({'status': 'Ok', 'client_id': result}), 200
     else:
         return jsonify({'status': 'Bad request'}), 400
@@ -75,6 +77,7 @@ def delete_client():
     if not is_valid:
         return jsonify({'status': 'Unauthorised'}), 403
     result = dbc.execute_query(query='delete_client_by_id', args=dict_data['client_id'])
+    company_ownership.invalidate(payload['comp_id'], 'client')
     if isinstance(result, int):
         return jsonify({'status': 'Ok', 'client_id':result}), 200
     else:
@@ -1,46 +1,50 @@
 import os
 import json
-from flask import Blueprint, request, jsonify, abort, send_file
+from datetime import datetime
+from flask import Blueprint, Response, request, jsonify, abort, send_file, stream_with_context
 from db.db_connector import DBConnector
-from services.process_file import ProcessFile
-from services.process_cash_flow import ProcessCashFlow
+from services.process_file import save_upload, IMPORT_MODES
+from services.import_jobs import import_jobs
+from services.product_catalog import product_catalog
+from services.cash_flow import CashFlow
 from services.process_sales import ProcessSales
-from api.auth.jwt_utils import validate_token
+from api.auth.jwt_utils import bearer_token, validate_token
+from api.utils.keyset import InvalidCursor, decode_cursor, encode_cursor, page, page_args
+from api.utils.streaming import ndjson_response
 
 # Importar serviços de segurança e pagamentos
 from services.fastpay_service import fastpay_service
 from services.security_service import security_service
+from services.audit_service import audit_service
 
 company = Blueprint('company', __name__)
 
+AUDIT_PAGE_SIZE = int(os.getenv('AUDIT_PAGE_SIZE', '100'))
+AUDIT_PAGE_MAX = int(os.getenv('AUDIT_PAGE_MAX', '1000'))
+CASH_FLOW_MAX_MONTHS = int(os.getenv('CASH_FLOW_MAX_MONTHS', '36'))
+
 # --- AUDIT LOGGING ---
 @company.after_request
 def audit_log(response):
     if request.method == 'OPTIONS':
         return response
     try:
-        user_id = None
-        if request.is_json:
-            data = request.get_json(silent=True)
-            if data and 'token' in data:
-                valid, payload = validate_token(data['token'])
-                if valid:
-                    user_id = payload.get('user_id')
+        user_id = comp_id = None
+        # Same token sources as the routes: Authorization header, then the JSON body or upload form
+        token = bearer_token(request.get_json(silent=True) if request.is_json else request.form)
+        if token:
+            # Reuses the validation already done by the route (memoized per request)
+            valid, payload = validate_token(token)
+            if valid:
+                user_id = payload.get('user_id')
+                comp_id = payload.get('comp_id')
 
         body_content = request.get_data(as_text=True)
         if 'token' in body_content:
             body_content = "HIDDEN_SENSITIVE_DATA"
 
-        dbc = DBConnector()
-        dbc.execute_query('create_audit_log', args={
-            'user_id': user_id,
-            'endpoint': request.path,
-            'method': request.method,
-            'ip': request.remote_addr,
-            'headers': str(dict(request.headers)),
-            'body': body_content[:1000],
-            'status': response.status_code
-        })
+        # Written in background batches, off the response path
+        audit_service.record(user_id, request, response.status_code, body_content[:1000], comp_id)
     except Exception as e:
         print(f"[AUDIT SYSTEM ERROR] Failed to log request: {e}")
     return response
@@ -110,19 +114,13 @@ def process_company_payments():
     try:
         dbc = DBConnector()
 
-        # 3. Obter token da empresa
-        # [CORREÇÃO APLICADA] O execute_query devolve uma lista [{'token': '...'}]
-        company_card_list = dbc.execute_query('get_company_card_token', args=comp_id)
-        
-        # Validar se a lista veio vazia
-        if not company_card_list or len(company_card_list) == 0:
-            return jsonify({"error": "Company has no payment card configured. Use /add-card first."}), 400
-
-        # Extrair a string do token do primeiro resultado
-        company_card_token = company_card_list[0].get('token')
+        # 3-4. Token da empresa e comissões pendentes lidos numa só ligação
+        with dbc.transaction() as tx:
+            company_card_token = tx.execute('get_company_card_token', comp_id)
+            pending_commissions = tx.execute('get_pending_commissions', comp_id)
 
-        # 4. Calcular Pagamentos
-        pending_commissions = dbc.execute_query('get_pending_commissions', args=comp_id)
+        if not company_card_token:
+            return jsonify({"error": "Company has no payment card configured. Use /add-card first."}), 400
 
         if not pending_commissions:
             return jsonify({"message": "No pending commissions found to pay."}), 200
@@ -176,6 +174,60 @@ def process_company_payments():
         print(f"[ERROR] Payment processing failed: {str(e)}") 
         return jsonify({"error": "Internal Server Error"}), 500
 
+@company.route('/audit-logs', methods=['POST'])
+def list_audit_logs():
+    dict_data = request.get_json(silent=True) or {}
+    is_valid, payload = validate_token(dict_data.get('token'))
+    if not is_valid or not payload.get('is_admin'):
+        return jsonify({'status': 'Unauthorised'}), 403
+
+    try:
+        limit = min(int(dict_data.get('limit', AUDIT_PAGE_SIZE)), AUDIT_PAGE_MAX)
+        args = {
+            'comp_id': payload['comp_id'],
+            'user_id': dict_data.get('user_id'),
+            'endpoint': dict_data.get('endpoint'),
+            'status': dict_data.get('status'),
+            'since': datetime.fromisoformat(dict_data['from']) if dict_data.get('from') else None,
+            'until': datetime.fromisoformat(dict_data['to']) if dict_data.get('to') else None,
+            'after': decode_cursor(dict_data['cursor']) if dict_data.get('cursor') else None,
+            # One extra row tells whether there is a next page
+            'limit': limit + 1
+        }
+    except (ValueError, TypeError, InvalidCursor) as e:
+        return jsonify({'status': 'Bad request', 'message': str(e)}), 400
+    if limit < 1:
+        return jsonify({'status': 'Bad request', 'message': 'limit must be positive'}), 400
+
+    rows = DBConnector().stream_query('search_audit_logs', args=args)
+    try:
+        # Runs the query now so a database error is still a 500, not a cut stream
+        first = next(rows, None)
+    except Exception as e:
+        rows.close()
+        print(f"[ERROR] Audit log query failed: {e}")
+        return jsonify({'status': 'Internal Server Error'}), 500
+
+    def generate():
+        # Rows are written as they arrive so a full page is never built in memory
+        yield '{"status": "Ok", "logs": ['
+        count, last, row = 0, None, first
+        try:
+            while row is not None:
+                if count == limit:
+                    break
+                log = dict(row, Timestamp=row['Timestamp'].isoformat(sep=' '))
+                yield (',' if count else '') + json.dumps(log, default=str)
+                count, last = count + 1, row
+                row = next(rows, None)
+        finally:
+            rows.close()
+        has_more = row is not None and count == limit
+        next_cursor = encode_cursor(last['Timestamp'], last['LogID']) if has_more else None
+        yield '], "next_cursor": ' + json.dumps(next_cursor) + '}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
 # --- Rotas Existentes ---
 
 @company.route('/analytics', methods=['GET', 'POST'])
@@ -185,13 +237,36 @@ def list_sales_analytics():
     is_valid, payload = validate_token(dict_data.get('token'))
     if not is_valid or not payload.get('is_admin'):
         return jsonify({'status': 'Unauthorised'}), 403
-    results = dbc.execute_query(query='get_company_sales', args=payload['comp_id'])
-    pcf = ProcessCashFlow(payload['comp_id'], 'PT', month=7)
-    revenue = pcf.revenue
+    try:
+        paging = page_args(dict_data)
+        after = decode_cursor(dict_data['cursor']) if dict_data.get('cursor') else None
+    except (ValueError, TypeError) as e:
+        return jsonify({'status': 'Bad request', 'message': str(e)}), 400
+    if dict_data.get('stream'):
+        # NDJSON straight from an unbuffered cursor, whatever the history size
+        try:
+            return ndjson_response(dbc.stream_query('page_company_sales', args={'owner_id': payload['comp_id'], 'after': after}))
+        except Exception as e:
+            print(f"[ERROR] Sales stream failed: {e}")
+            return jsonify({'status': 'Internal Server Error'}), 500
+
+    next_cursor = None
+    if paging:
+        results = dbc.execute_query(query='page_company_sales', args={
+            'owner_id': payload['comp_id'], 'after': paging['after'], 'limit': paging['limit'] + 1
+        })
+        if isinstance(results, list):
+            results, next_cursor = page(results, paging['limit'], 'SaleDate', 'SaleID')
+    else:
+        results = dbc.execute_query(query='get_company_sales', args=payload['comp_id'])
+    revenue = float(dbc.execute_query(query='get_company_revenue', args=payload['comp_id']) or 0)
     ps = ProcessSales(results, payload['user_id'])
     ps.get_3_most_recent_sales()
     if isinstance(results, list):
-        return jsonify({'status': 'Ok', 'last_3_sales': ps.last_3_sales, 'revenue': revenue, 'sales': results}), 200
+        response = {'status': 'Ok', 'last_3_sales': ps.last_3_sales, 'revenue': revenue, 'sales': results}
+        if paging:
+            response['next_cursor'] = next_cursor
+        return jsonify(response), 200
     return jsonify({'status': 'Bad request'}), 403
 
 @company.route('/employees', methods=['GET', 'POST'])
@@ -208,15 +283,21 @@ def list_employees():
 
 @company.route('/products', methods=['GET', 'POST'])
 def list_products():
-    dbc = DBConnector()
-    dict_data = request.get_json()
-    is_valid, _payload = validate_token(dict_data.get('token'))
+    # GET (token in the Authorization header) lets the browser cache the list and revalidate it with If-None-Match
+    is_valid, _payload = validate_token(bearer_token(request.get_json(silent=True)))
     if not is_valid:
         return jsonify({'status': 'Unauthorised'}), 403
-    results = dbc.execute_query(query='get_products_list', args=_payload['comp_id'])
-    if isinstance(results, list):
-        return jsonify({'status': 'Ok', 'products': results}), 200
-    return jsonify({'status': 'Bad request'}), 403
+    body, etag = product_catalog.get(_payload['comp_id'])
+    if body is None:
+        return jsonify({'status': 'Bad request'}), 403
+    if request.method == 'GET' and etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Cached per user and always revalidated, so a new import shows up on the next view
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @company.route('/invoice', methods=['GET', 'POST'])
 def invoice():
@@ -256,10 +337,28 @@ def upload_excel():
     file = request.files['file']
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
-    pf = ProcessFile(file, comp_id)
-    if not pf.is_updated:
-        return jsonify({'error': 'File processing failed'}), 400
-    return jsonify({'status': 'Ok','message': 'File successfully uploaded'}), 200
+    mode = request.form.get('mode', 'upsert')
+    if mode not in IMPORT_MODES:
+        return jsonify({'error': f"mode must be one of {', '.join(IMPORT_MODES)}"}), 400
+    # The import runs on the job pool; progress is polled on /jobs/<id>
+    file_path, content_hash = save_upload(file, comp_id)
+    job_id, queued = import_jobs.submit(file_path, content_hash, file.filename, comp_id, payload.get('user_id'), mode)
+    if job_id is None:
+        return jsonify({'error': 'File processing failed'}), 500
+    if not queued:
+        # Same content as the last successful import: the catalog already matches it
+        return jsonify({'status': 'Ok', 'message': 'File already imported', 'job_id': job_id, 'unchanged': True}), 200
+    return jsonify({'status': 'Ok', 'message': 'File queued for import', 'job_id': job_id}), 202
+
+@company.route('/jobs/<int:job_id>', methods=['GET', 'POST'])
+def import_job_status(job_id):
+    is_valid, payload = validate_token(bearer_token(request.get_json(silent=True)))
+    if not is_valid or not payload.get('is_admin'):
+        return jsonify({'status': 'Unauthorized'}), 403
+    job = import_jobs.status(job_id)
+    if job is None or job['CompanyID'] != payload.get('comp_id'):
+        return jsonify({'status': 'Not found'}), 404
+    return jsonify({'status': 'Ok', 'job': job}), 200
 
 @company.route('/cash-flow', methods=['POST'])
 def cash_flow():
@@ -267,13 +366,18 @@ def cash_flow():
     is_valid, payload = validate_token(dict_data.get('token'))
     if not is_valid or not payload.get('is_admin'):
         return jsonify({'status': 'Unauthorised'}), 403
-    pcf7 = ProcessCashFlow(country_code=dict_data['country_code'], company_id=payload['comp_id'], month=7)
-    pcf8 = ProcessCashFlow(country_code=dict_data['country_code'], company_id=payload['comp_id'], month=8)
-    pcf9 = ProcessCashFlow(country_code=dict_data['country_code'], company_id=payload['comp_id'], month=9)
-    return jsonify({
-        'profit': pcf7.profit + pcf8.profit + pcf9.profit,
-        'status': 'Ok',
-        'July': pcf7.__dict__, 
-        'August': pcf8.__dict__,
-        'September': pcf9.__dict__
-    }), 200
+    # Months as YYYY-MM, both inclusive; defaults to the quarter the dashboard shows
+    try:
+        start = datetime.strptime(dict_data.get('start', '2024-07'), '%Y-%m').date()
+        end = datetime.strptime(dict_data.get('end', '2024-09'), '%Y-%m').date()
+    except (TypeError, ValueError):
+        return jsonify({'status': 'Bad request', 'message': 'start and end must be YYYY-MM'}), 400
+    if end < start or (end.year - start.year) * 12 + end.month - start.month >= CASH_FLOW_MAX_MONTHS:
+        return jsonify({'status': 'Bad request', 'message': f'Range must be 1 to {CASH_FLOW_MAX_MONTHS} months'}), 400
+
+    cf = CashFlow(payload['comp_id'], dict_data['country_code'], start, end)
+    response = {'profit': cf.profit, 'status': 'Ok', 'months': cf.months}
+    if start.year == end.year:
+        # Month-name keys kept for the dashboard
+        response.update({month['name']: month for month in cf.months})
+    return jsonify(response), 200
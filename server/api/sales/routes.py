@@ -1,10 +1,18 @@
+import json
+import hashlib
 from flask import Blueprint, request, jsonify
 from db.db_connector import DBConnector
-from services.process_sales import ProcessSales
-from api.auth.jwt_utils import validate_token
+from services.process_sales import split_overview
+from services.bulk_sales import sales_ingest
+from services.sales_journal import client_ref, sales_journal
+from api.auth.jwt_utils import bearer_token, validate_token
+from api.utils.keyset import decode_cursor, page, page_args
+from api.utils.streaming import ndjson_response
 
 sales = Blueprint('sales', __name__)
 
+IDEMPOTENCY_KEY_MAX = 128
+
 @sales.route('/user/overview', methods=['GET', 'POST'])
 def list_user_sales():
     ''' List user sales function'''
@@ -13,13 +21,36 @@ def list_user_sales():
     is_valid, _payload = validate_token(dict_data.get('token'))
     if not is_valid:
         return jsonify({'status': 'Unauthorised'}), 403
-    results = dbc.execute_query(query='get_user_sales', args=_payload['user_id'])
-    ps = ProcessSales(results, dict_data['user_id'])
-    ps.get_3_most_recent_sales()
-    revenue = ps.revenue
-    if isinstance(results, list):
-        return jsonify({'status': 'Ok', 'sales': results, 'last_3_sales': ps.last_3_sales, 'revenue': revenue}), 200
-    return jsonify({'status': 'Bad request'}), 400
+    try:
+        paging = page_args(dict_data)
+        after = decode_cursor(dict_data['cursor']) if dict_data.get('cursor') else None
+    except (ValueError, TypeError) as e:
+        return jsonify({'status': 'Bad request', 'message': str(e)}), 400
+    if dict_data.get('stream'):
+        # NDJSON straight from an unbuffered cursor, whatever the history size
+        try:
+            return ndjson_response(dbc.stream_query('page_user_sales', args={'owner_id': _payload['user_id'], 'after': after}))
+        except Exception as e:
+            print(f"[ERROR] Sales stream failed: {e}")
+            return jsonify({'status': 'Internal Server Error'}), 500
+
+    # Totals ride on the index-ordered page of sales; a page is fetched
+    # with one extra row to know whether another one follows
+    results = dbc.execute_query(query='get_user_overview', args={
+        'user_id': _payload['user_id'],
+        'after': paging['after'] if paging else None,
+        'limit': paging['limit'] + 1 if paging else None
+    })
+    if not isinstance(results, list):
+        return jsonify({'status': 'Bad request'}), 400
+    results, sales_count, revenue = split_overview(results)
+    response = {'status': 'Ok', 'sales_count': sales_count, 'revenue': revenue}
+    if paging:
+        results, response['next_cursor'] = page(results, paging['limit'], 'SaleDate', 'SaleID')
+    if not paging or paging['after'] is None:
+        response['last_3_sales'] = results[:3]
+    response['sales'] = results
+    return jsonify(response), 200
 
 @sales.route('/sales/new', methods=['POST'])
 def add_new_sale():
@@ -29,12 +60,95 @@ def add_new_sale():
     is_valid, _payload = validate_token(dict_data.get('token'))
     if not is_valid:
         return jsonify({'status': 'Unauthorised'}), 403
-    result = dbc.execute_query(query='create_sale', args={
+    args = {
         'client_id': dict_data['client_id'],
         'user_id': _payload['user_id'],
         'product_id': dict_data['product_id'],
         'quantity': dict_data['quantity']
-    })
-    if isinstance(result, int):
-        return jsonify({'status': 'Ok', 'sale_id': result}), 200
-    return jsonify({'status': 'Bad request'}), 400
+    }
+    try:
+        idempotency_key = _idempotency_key(dict_data)
+    except ValueError as e:
+        return jsonify({'status': 'Bad request', 'message': str(e)}), 400
+    if sales_journal.enabled:
+        # Write-behind: acknowledged once journaled, committed by the next group flush
+        sale, error = sales_ingest.validate(_payload['comp_id'], _payload['user_id'], False, args)
+        if error:
+            return jsonify({'status': 'Bad request', 'message': error}), 400
+        outcome = sales_journal.submit(dict(sale, comp_id=_payload['comp_id']), idempotency_key)
+        if outcome is not None:
+            if outcome.get('conflict'):
+                return jsonify({'status': 'Conflict', 'message': 'Idempotency-Key already used for another request'}), 422
+            return jsonify(dict(outcome, status='Ok')), 202 if outcome['queued'] else 200
+    if idempotency_key is None:
+        result = dbc.execute_query(query='create_sale', args=args)
+        if isinstance(result, int):
+            return jsonify({'status': 'Ok', 'sale_id': result}), 200
+        return jsonify({'status': 'Bad request'}), 400
+
+    # A retry with the same key gets the original sale back instead of a second one
+    outcome = dbc.execute_query(query='create_sale_once', args=dict(
+        args, idempotency_key=idempotency_key, request_hash=_request_hash(args),
+        client_ref=client_ref(_payload['user_id'], idempotency_key)
+    ))
+    if not outcome:
+        return jsonify({'status': 'Bad request'}), 400
+    if outcome.get('conflict'):
+        return jsonify({'status': 'Conflict', 'message': 'Idempotency-Key already used for another request'}), 422
+    return jsonify({'status': 'Ok', 'sale_id': outcome['result'], 'replayed': outcome['replayed']}), 200
+
+def _idempotency_key(dict_data):
+    ''' Idempotency-Key header (or idempotency_key field) of the request, None when absent '''
+    key = request.headers.get('Idempotency-Key') or (dict_data or {}).get('idempotency_key')
+    if key is None:
+        return None
+    key = str(key)
+    if not 0 < len(key) <= IDEMPOTENCY_KEY_MAX:
+        raise ValueError(f'Idempotency-Key must have 1 to {IDEMPOTENCY_KEY_MAX} characters')
+    return key
+
+def _request_hash(args: dict) -> str:
+    return hashlib.sha256(json.dumps(args, sort_keys=True, default=str).encode()).hexdigest()
+
+def _bulk_sales_rows(dict_data):
+    ''' Sales of a /sales/bulk request: NDJSON lines read as they arrive, or a JSON array '''
+    if dict_data is None:
+        for line in request.stream:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                # Reported against its row, the other lines are still recorded
+                yield ValueError(f'Invalid JSON: {e}')
+    else:
+        yield from dict_data if isinstance(dict_data, list) else dict_data.get('sales') or []
+
+@sales.route('/sales/bulk', methods=['POST'])
+def add_sales_bulk():
+    '''
+    Record many sales in one request: a JSON array (or {'token', 'sales'}) or
+    an application/x-ndjson stream with the token in the Authorization header.
+    '''
+    dict_data = None if request.mimetype == 'application/x-ndjson' else request.get_json()
+    is_valid, _payload = validate_token(bearer_token(dict_data))
+    if not is_valid:
+        return jsonify({'status': 'Unauthorised'}), 403
+    try:
+        outcome = sales_ingest.ingest(
+            _payload['comp_id'], _payload['user_id'], bool(_payload.get('is_admin')), _bulk_sales_rows(dict_data),
+            idempotency_key=_idempotency_key(dict_data if isinstance(dict_data, dict) else None)
+        )
+    except ValueError as e:
+        return jsonify({'status': 'Bad request', 'message': str(e)}), 400
+    except Exception as e:
+        print(f"[ERROR] Bulk sales failed: {e}")
+        return jsonify({'status': 'Internal Server Error'}), 500
+    if outcome.get('conflict'):
+        return jsonify({'status': 'Conflict', 'message': 'Idempotency-Key already used for another request'}), 422
+    results = outcome['results']
+    created = sum(1 for result in results if result['status'] == 'Ok')
+    return jsonify({
+        'status': 'Ok', 'created': created, 'failed': len(results) - created,
+        'replayed': outcome['replayed'], 'results': results
+    }), 200
@@ -0,0 +1,44 @@
+import os
+import json
+import base64
+from datetime import datetime
+
+# Listing pages when the request does not say, and the most it may ask for
+PAGE_SIZE = int(os.getenv('PAGE_SIZE', '100'))
+PAGE_MAX = int(os.getenv('PAGE_MAX', '1000'))
+
+
+class InvalidCursor(ValueError):
+    ''' Raised when a page cursor sent by a client cannot be decoded '''
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    ''' Opaque cursor pointing after the row (timestamp, row_id) '''
+    raw = json.dumps([timestamp.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> tuple:
+    ''' (timestamp, row_id) of an encode_cursor value '''
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {cursor}') from e
+
+def page_args(dict_data: dict, default_size: int = PAGE_SIZE, max_size: int = PAGE_MAX):
+    ''' {'limit', 'after'} of a request that asked for a page (limit or cursor), else None '''
+    if 'limit' not in dict_data and 'cursor' not in dict_data:
+        return None
+    limit = int(dict_data.get('limit') or default_size)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    cursor = dict_data.get('cursor')
+    return {'limit': min(limit, max_size), 'after': decode_cursor(cursor) if cursor else None}
+
+def page(rows: list, limit: int, timestamp_key: str, id_key: str) -> tuple:
+    ''' (page rows, next cursor or None) from rows fetched with limit + 1 '''
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor(last[timestamp_key], last[id_key])
@@ -0,0 +1,34 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from flask import Response, stream_with_context
+
+
+def json_default(value):
+    ''' JSON encoding of the column types rows carry '''
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+def ndjson_response(rows):
+    '''
+    Stream rows (a DBConnector.stream_query generator) as one JSON object per
+    line. The first row is read before responding so a failing query is still
+    reported as an error status rather than a truncated body.
+    '''
+    first = next(rows, None)
+
+    def generate():
+        try:
+            row = first
+            while row is not None:
+                yield json.dumps(row, default=json_default) + '\n'
+                row = next(rows, None)
+        finally:
+            rows.close()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
@@ -0,0 +1,31 @@
+import time
+from contextlib import contextmanager
+
+
+class ServerTiming:
+    ''' Collects the duration of named request phases and publishes them as a Server-Timing header '''
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def measure(self, name: str):
+        ''' with timing.measure('db'): ... '''
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, (time.perf_counter() - started) * 1000))
+
+    def header(self) -> str:
+        total = (time.perf_counter() - self.started) * 1000
+        phases = self.phases + [('total', total)]
+        return ', '.join(f'{name};dur={ms:.2f}' for name, ms in phases)
+
+    def apply(self, response):
+        ''' Add the Server-Timing header to a response and log the breakdown '''
+        header = self.header()
+        response.headers['Server-Timing'] = header
+        print(f'[TIMING] {header}')
+        return response
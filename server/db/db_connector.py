@@ -1,5 +1,82 @@
 import mariadb
 import sys
+import time
+from contextlib import contextmanager
+from db.pool import get_pool
+from db.queries import QUERIES
+
+
+class UnknownQueryError(KeyError):
+    ''' Raised when execute_query is called with a name missing from the registry '''
+
+
+class _Session:
+    ''' Runs named queries on one checked-out connection '''
+
+    def __init__(self, pool, connection):
+        self.pool = pool
+        self.connection = connection
+        self.queries = 0
+        self.elapsed_ms = 0.0
+
+    def execute(self, query, args=None):
+        ''' Execute a named query and return its shaped result '''
+        spec = _lookup(query)
+        if spec.script:
+            return spec.script(self, args)
+        sql, params = spec.statement(args)
+        started = time.perf_counter()
+        try:
+            cursor = self.pool.statement(self.connection, sql)
+            cursor.execute(sql, params)
+            return spec.result(cursor)
+        finally:
+            self._timed(started)
+
+    def execute_many(self, query, rows):
+        ''' Execute a named write once per row using a single batched round trip '''
+        rows = list(rows)
+        if not rows:
+            return 0
+        spec = _lookup(query)
+        started = time.perf_counter()
+        try:
+            cursor = self.pool.statement(self.connection, spec.sql)
+            cursor.executemany(spec.sql, [spec.params(row) for row in rows])
+            return cursor.rowcount
+        finally:
+            self._timed(started)
+
+    def _timed(self, started):
+        self.queries += 1
+        self.elapsed_ms += (time.perf_counter() - started) * 1000
+
+
+class Transaction(_Session):
+    ''' Unit of work returned by DBConnector.transaction() '''
+
+    def __init__(self, pool, connection):
+        super().__init__(pool, connection)
+        self.rollback_only = False
+
+    def rollback(self):
+        ''' Roll back instead of committing when the with block ends '''
+        self.rollback_only = True
+
+
+def _lookup(query):
+    try:
+        return QUERIES[query]
+    except KeyError:
+        raise UnknownQueryError(query) from None
+
+
+def _rollback(connection):
+    try:
+        connection.rollback()
+    except mariadb.Error as e:
+        print(f"Error rolling back: {e}")
+
 
 class DBConnector:
 
@@ -9,6 +86,13 @@ class DBConnector:
         self.password = 'teste123'
         self.database = 'iscte_spot'
         self.port = 3306
+        self.pool = get_pool(
+            user=self.user,
+            password=self.password,
+            host=self.host,
+            port=self.port,
+            database=self.database
+        )
 
     def connect(self):
         ''' Connect to database mariadb'''
@@ -25,616 +109,75 @@ class DBConnector:
             print(f"Error connecting to MariaDB Platform: {e}")
             return None
 
+    @contextmanager
+    def transaction(self):
+        ''' with dbc.transaction() as tx: run named queries on one connection with a single commit '''
+        connection = self.pool.acquire()
+        tx = Transaction(self.pool, connection)
+        outcome = 'rolled back'
+        try:
+            connection.begin()
+            yield tx
+            if tx.rollback_only:
+                connection.rollback()
+            else:
+                connection.commit()
+                outcome = 'committed'
+        except BaseException as e:
+            _rollback(connection)
+            if isinstance(e, mariadb.Error):
+                self.pool.discard_statements(connection)
+            raise
+        finally:
+            self.pool.release(connection)
+            print(f'DB transaction {outcome}: {tx.queries} queries in {tx.elapsed_ms:.1f} ms')
+
+    def stream_query(self, query, args=None, fetch_size: int = 500):
+        '''
+        Yield the rows of a named read query as the server sends them.
+        The cursor is unbuffered, so the result set is never held in memory;
+        it runs on a dedicated stream connection (see ConnectionPool.stream_connection)
+        that stays open until the generator is exhausted or closed.
+        '''
+        spec = _lookup(query)
+        sql, params = spec.statement(args)
+        print(f'DB query streamed: {query}, args: {args}')
+        with self.pool.stream_connection() as connection:
+            cursor = connection.cursor(dictionary=True, buffered=False)
+            try:
+                cursor.execute(sql, params)
+                while True:
+                    rows = cursor.fetchmany(fetch_size)
+                    if not rows:
+                        break
+                    yield from rows
+            finally:
+                try:
+                    cursor.close()
+                except mariadb.Error as e:
+                    print(f"Error closing stream: {e}")
+
     def execute_query(self, query, args=None):
         ''' Execute queries by query name '''
         print(f'DB query selected: {query}, args: {args}')
-        connection = self.connect()
-        if connection is None:
+        spec = _lookup(query)
+        try:
+            if spec.script:
+                # Multi-statement queries commit or roll back as a unit
+                with self.transaction() as tx:
+                    return tx.execute(query, args)
+            connection = self.pool.acquire()
+        except mariadb.Error as e:
+            print(f"Error: {e}")
             return None
 
-        cursor = connection.cursor(dictionary=True)
         result = None
         try:
-            # --- READ QUERIES ---
-            if query == 'get_user_by_name':
-                cursor.execute("SELECT UserID FROM Users WHERE Username = ?", (args,))
-                result = cursor.fetchone()
-                
-                # CORREÇÃO: Retornar o ID, não True/False
-                if result:
-                    # Como estás a usar cursor(dictionary=True)
-                    return result['UserID']
-                else:
-                    return False
-            elif query == 'get_user_password':
-                cursor.execute("SELECT PasswordHash FROM Users WHERE UserID = ?", (args,))
-                result = cursor.fetchone()
-                try:
-                    if isinstance(result, tuple):
-                        return result[0]['PasswordHash']
-                    else:
-                        return result['PasswordHash']
-                except TypeError:
-                    return False
-
-            elif query == 'get_user_by_id':
-                cursor.execute(f"SELECT * FROM Users WHERE UserID = {args}")
-                result = cursor.fetchone()
-
-            elif query == 'get_clients_list':
-                cursor.execute(
-                    f"""
-                    SELECT ClientID, FirstName, LastName, Email, PhoneNumber, Address, City, Country, EncryptedIBAN
-                    FROM Clients
-                    WHERE CompanyID = {args}
-                    """)
-                result = cursor.fetchall()
-                if isinstance(result, list):
-                    return result
-                else:
-                    return False
-
-            elif query == 'get_employees_list':
-                cursor.execute(f"SELECT UserID, Username, Email, CommissionPercentage, isActive FROM Users WHERE CompanyID = {args}")
-                result = cursor.fetchall()
-                if isinstance(result, list):
-                    return result
-                else:
-                    return False
-
-            elif query == 'get_compnay_id_by_user':
-                cursor.execute(f'SELECT CompanyID FROM Users WHERE UserID = {args}')
-                result = cursor.fetchone()
-                if isinstance(result, tuple):
-                    return result[0]['CompanyID']
-                else:
-                    return result["CompanyID"]
-
-            elif query == 'get_company_sales':
-                cursor.execute(
-                    f"""
-                    SELECT Sales.SaleID, Products.ProductName, Users.Username, Clients.FirstName, Products.SellingPrice, Sales.Quantity, Sales.SaleDate
-                    FROM Sales
-                    JOIN Clients ON Sales.ClientID = Clients.ClientID
-                    JOIN Users ON Sales.UserID = Users.UserID
-                    JOIN Products ON Sales.ProductID = Products.ProductID
-                    WHERE Clients.CompanyID = {args};
-                    """
-                )
-                result = cursor.fetchall()
-                if isinstance(result, list):
-                    return result
-                else:
-                    return False
-                
-            
-            elif query == 'get_user_sales':
-                cursor.execute(
-                    f"""
-                    SELECT 
-                        S.SaleID, U.UserName, C.FirstName, P.ProductName, P.SellingPrice, S.Quantity, S.SaleDate
-                    FROM Sales S
-                    JOIN Users U ON S.UserID = U.UserID
-                    JOIN Clients C ON S.ClientID = C.ClientID
-                    JOIN Products P ON S.ProductID = P.ProductID
-                    WHERE S.UserID = {args};
-                    """
-                )
-                result = cursor.fetchall()
-                if isinstance(result, list):
-                    return result
-                else:
-                    return False
-
-            elif query == 'get_user_admin':
-                cursor.execute(f"SELECT IsAdmin FROM Users WHERE UserID = {args};")
-                result = cursor.fetchone()
-                if isinstance(result, tuple):
-                    return result[0]['IsAdmin']
-                else:
-                    return result['IsAdmin']
-
-            elif query == 'get_user_comp_id':
-                cursor.execute(f"SELECT CompanyID FROM Users WHERE UserID = {args};")
-                result = cursor.fetchone()
-                if isinstance(result, tuple):
-                    return result[0]['CompanyID']
-                else:
-                    return result['CompanyID']
-
-            elif query == 'get_products_list':
-                cursor.execute(f"SELECT ProductID, ProductName, SellingPrice FROM Products WHERE CompanyID = {args}")
-                result = cursor.fetchall()
-                if isinstance(result, list):
-                    return result
-                else:
-                    return False
-
-            elif query == 'get_company_revenue':
-                cursor.execute(f"SELECT Revenue FROM Companies WHERE CompanyID = {args}")
-                result = cursor.fetchone()
-                if isinstance(result, tuple):
-                    return result[0]
-                return result['Revenue']
-
-            elif query == 'get_employees_return':
-                cursor.execute(
-                    f"""
-                    SELECT 
-                        u.UserID, u.Username, u.CommissionPercentage,
-                        COUNT(s.SaleID) AS total_sales,
-                        SUM(s.Quantity * p.SellingPrice) AS total_sales_amount,
-                        (SUM(s.Quantity * p.SellingPrice) * (u.CommissionPercentage / 100)) AS total_commission
-                    FROM Users u
-                    LEFT JOIN Sales s ON u.UserID = s.UserID
-                    LEFT JOIN Products p ON s.ProductID = p.ProductID
-                    WHERE u.CompanyID = {args['comp_id']} 
-                    AND (p.CompanyID = u.CompanyID OR p.CompanyID IS NULL)
-                    AND MONTH(s.SaleDate) = {args['month']}
-                    AND YEAR(s.SaleDate) = 2024
-                    GROUP BY u.UserID, u.CommissionPercentage
-                    """
-                )
-                result = cursor.fetchall()
-                employee_sales_data = []
-                for row in result:
-                    employee_sales_data.append({
-                        "UserID": row['UserID'],
-                        "Username": row['Username'],
-                        "CommissionPercentage": row['CommissionPercentage'],
-                        "TotalSales": row['total_sales'],
-                        "TotalSalesAmount": row['total_sales_amount'],
-                        "TotalCommission": row['total_commission']
-                    })
-                return employee_sales_data
-
-            elif query == 'get_last_3_sales':
-                cursor.execute(
-                    f"""
-                    SELECT S.SaleID, U.UserName, C.FirstName, P.ProductName, P.SellingPrice, S.Quantity, S.SaleDate
-                    FROM Sales S
-                    JOIN Users U ON S.UserID = U.UserID
-                    JOIN Clients C ON S.ClientID = C.ClientID
-                    JOIN Products P ON S.ProductID = P.ProductID
-                    WHERE S.UserID = {args}
-                    ORDER BY S.SaleDate DESC
-                    LIMIT 3;
-                    """
-                )
-                result = cursor.fetchall()
-                if isinstance(result, list):
-                    return result
-                else:
-                    return False
-
-            elif query == 'get_sales_month_comp_id':
-                cursor.execute(
-                    """
-                    SELECT Sales.SaleID, Sales.UserID, Sales.ClientID, Sales.ProductID, Sales.Quantity, Sales.SaleDate
-                    FROM Sales
-                    JOIN Users ON Sales.UserID = Users.UserID
-                    WHERE Users.CompanyID = ? AND MONTH(Sales.SaleDate) = ? AND YEAR(Sales.SaleDate) = 2024;
-                    """,
-                    (args['comp_id'], args['month'])
-                )
-                result = cursor.fetchall()
-                if isinstance(result, list):
-                    return result
-                else:
-                    return False
-
-            elif query == 'get_costs_sales_month':
-                cursor.execute(
-                    f"""
-                    SELECT 
-                        SUM(Products.SellingPrice * Sales.Quantity) AS TotalSellingPrice,
-                        SUM(Products.FactoryPrice * Sales.Quantity) AS TotalFactoryPrice
-                    FROM Sales
-                    JOIN Products ON Sales.ProductID = Products.ProductID
-                    WHERE Products.CompanyID = {args['comp_id']}
-                    AND MONTH(Sales.SaleDate) = {args['month']}
-                    AND YEAR(Sales.SaleDate) = 2024;
-                    """
-                )
-                result = cursor.fetchone()
-                try:
-                    if isinstance(result, tuple):
-                        return result[0]
-                    else:
-                        return result
-                except TypeError:
-                    return False
-
-            elif query == 'get_admin_tickets':
-                cursor.execute(
-                    f"""
-                    SELECT st.TicketID, st.UserID, u.CompanyID, st.Status, st.Category, st.Description, st.Messages, st.CreatedAt, st.UpdatedAt
-                    FROM SupportTickets st
-                    JOIN Users u ON st.UserID = u.UserID
-                    WHERE u.CompanyID = {args};
-                    """
-                )
-                result = cursor.fetchall()
-                if isinstance(result, list):
-                    return result
-                else:
-                    return False
-
-            elif query == 'get_user_tickets':
-                cursor.execute(
-                    f"""
-                    SELECT TicketID, UserID, Status, Category, Description, Messages, CreatedAt, UpdatedAt
-                    FROM SupportTickets st
-                    WHERE UserID = {args};
-                    """
-                )
-                result = cursor.fetchall()
-                if isinstance(result, list):
-                    return result
-                else:
-                    return False
-
-            elif query == 'get_user_agent':
-                cursor.execute(f"SELECT IsAgent FROM Users WHERE UserID = {args};")
-                result = cursor.fetchone()
-                try:
-                    return result['IsAgent'] == 1
-                except TypeError:
-                    return False
-
-            elif query == 'get_ticket_by_id':
-                cursor.execute(f"SELECT * FROM SupportTickets WHERE TicketID = {args};")
-                result = cursor.fetchone()
-                try:
-                    if isinstance(result, tuple):
-                        return result[0]
-                    else:
-                        return result
-                except TypeError:
-                    return False
-
-            elif query == 'get_agent_tickets':
-                cursor.execute('SELECT * From SupportTickets')
-                result = cursor.fetchall()
-                if isinstance(result, list):
-                    return result
-                else:
-                    return False
-            
-            # --- PAGAMENTO & CARD QUERIES (NOVAS) ---
-            elif query == 'create_payment':
-                cursor.execute(
-                    """
-                    INSERT INTO Payments (CompanyID, AdminUserID, TransactionID, Amount, Status, DigitalSignature, CreatedAt)
-                    VALUES (?, ?, ?, ?, 'Pending', ?, CURRENT_TIMESTAMP)
-                    """,
-                    (args['company_id'], args['user_id'], args['transaction_id'], args['amount'], args['signature'])
-                )
-                connection.commit()
-                return cursor.lastrowid
-
-            elif query == 'update_payment_status':
-                cursor.execute(
-                    "UPDATE Payments SET Status = ? WHERE TransactionID = ?",
-                    (args['status'], args['transaction_id'])
-                )
-                connection.commit()
-                return cursor.rowcount > 0
-            
-            elif query == 'get_payment_by_transaction':
-                cursor.execute("SELECT * FROM Payments WHERE TransactionID = ?", (args,))
-                result = cursor.fetchone()
-                return result
-
-            elif query == 'update_company_card_token':
-                cursor.execute(
-                    "UPDATE Companies SET FastPayCardToken = ? WHERE CompanyID = ?",
-                    (args['token'], args['company_id'])
-                )
-                connection.commit()
-                return True
-
-            elif query == 'update_company_schedule':
-                cursor.execute(
-                    "UPDATE Companies SET PaymentSchedule = ? WHERE CompanyID = ?",
-                    (args['schedule'], args['company_id'])
-                )
-                connection.commit()
-                return True
-
-            elif query == 'get_company_card_token':
-                cursor.execute("SELECT FastPayCardToken FROM Companies WHERE CompanyID = ?", (args,))
-                result = cursor.fetchone()
-                return result['FastPayCardToken'] if result else None
-
-            # Cálculo de Comissões Reais: Soma das vendas * preço * comissão%
-            elif query == 'get_pending_commissions':
-                cursor.execute(
-                    """
-                    SELECT 
-                        u.UserID, 
-                        u.EncryptedIBAN, 
-                        SUM(s.Quantity * p.SellingPrice * (u.CommissionPercentage / 100)) as TotalToPay
-                    FROM Sales s
-                    JOIN Users u ON s.UserID = u.UserID
-                    JOIN Products p ON s.ProductID = p.ProductID
-                    WHERE u.CompanyID = ? 
-                      AND u.EncryptedIBAN IS NOT NULL
-                    GROUP BY u.UserID, u.EncryptedIBAN
-                    HAVING TotalToPay > 0
-                    """, (args,)
-                )
-                return cursor.fetchall()
-
-            elif query == 'create_audit_log':
-                cursor.execute(
-                    """
-                    INSERT INTO AuditLogs (UserID, Endpoint, Method, SourceIP, RequestHeaders, RequestBody, ResponseStatus)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (args['user_id'], args['endpoint'], args['method'], args['ip'], args['headers'], args['body'], args['status'])
-                )
-                connection.commit()
-                return True
-            
-            elif query == 'update_user_iban':
-                cursor.execute("UPDATE Users SET EncryptedIBAN = ? WHERE UserID = ?", (args['iban'], args['user_id']))
-                connection.commit()
-                return True
-
-            # --- CREATE QUERIES ---
-            elif query == 'create_user_employee':
-                cursor.execute(
-                    "INSERT INTO Users (Username, PasswordHash, Email, CompanyID, CommissionPercentage, CreatedAt) VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
-                    (args['username'], 'T3MP-password-32',args['email'], args['comp_id'], 5)
-                )
-                connection.commit()
-                result = cursor.lastrowid
-                if isinstance(result, tuple):
-                    return result[0]
-                else:
-                    return result
-
-            elif query == 'create_user_admin':
-                cursor.execute(
-                    "INSERT INTO Users (Username, PasswordHash, Email, IsAdmin, CreatedAt) VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP);",
-                    (args['username'], args['password'],args['email'], args['is_admin'])
-                )
-                connection.commit()
-                result = cursor.lastrowid
-                if isinstance(result, tuple):
-                    return result[0]
-                else:
-                    return result
-
-            elif query == 'create_company':
-                cursor.execute(
-                    "INSERT INTO Companies (CompanyName, NumberOfEmployees, AdminUserID, Revenue) VALUES (?, ?, ?, ?)",
-                    (args['comp_name'], args['num_employees'], args['user_id'], 0)
-                )
-                connection.commit()
-                result = cursor.lastrowid
-                if isinstance(result, tuple):
-                    return result[0]
-                else:
-                    return result
-
-            elif query == 'create_client':
-                cursor.execute(
-                    """
-                    INSERT INTO Clients 
-                    (FirstName, LastName, Email, PhoneNumber, Address, City, Country, CompanyID, EncryptedIBAN, CreatedAt) 
-                    VALUES (?, ?, ?, ?, ?, ? ,?, ?, ?, CURRENT_TIMESTAMP)
-                    """,
-                    (
-                        args['first_name'], 
-                        args['last_name'], 
-                        args['email'], 
-                        args['phone_number'], 
-                        args['address'], 
-                        args['city'], 
-                        args['country'], 
-                        args['comp_id'],
-                        args.get('encrypted_iban') 
-                    )
-                )
-                connection.commit()
-                result = cursor.lastrowid
-                if isinstance(result, tuple):
-                    return result[0]
-                else:
-                    return result
-
-            elif query == 'create_sale':
-                cursor.execute(
-                    "INSERT INTO Sales (UserID, ClientID, ProductID, Quantity, SaleDate) VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
-                    (args['user_id'], args['client_id'], args['product_id'], args['quantity'])
-                )
-                connection.commit()
-                result = cursor.lastrowid
-                if isinstance(result, tuple):
-                    return result[0]
-                else:
-                    return result
-
-            elif query == 'create_ticket':
-                cursor.execute(
-                    "INSERT INTO SupportTickets (UserID, Status, Category, Description, Messages, CreatedAt) VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
-                    (args['user_id'], args['status'], args['category'], args['description'], args['messages'])
-                )
-                connection.commit()
-                result = cursor.lastrowid
-                if isinstance(result, tuple):
-                    return result[0]
-                else:
-                    return result
-
-            # --- UPDATE QUERIES ---
-            elif query == 'update_user_password':
-                cursor.execute("UPDATE Users SET PasswordHash = ? WHERE UserID = ?;", (args["new_password"], args["user_id"]))
-                connection.commit()
-                if cursor.rowcount > 0:
-                    return True
-                else:
-                    return False
-
-            elif query == 'update_user_comp_id':
-                cursor.execute("UPDATE Users SET CompanyID = ? WHERE UserID = ?;", (args["comp_id"], args["user_id"]))
-                connection.commit()
-                if cursor.rowcount > 0:
-                    return True
-                else:
-                    return False
-
-            elif query == 'update_user_activity':
-                if args['active']:
-                    cursor.execute(f"UPDATE Users SET LastLogin = CURRENT_TIMESTAMP, isActive = True WHERE UserID = {args['user_id']}")
-                else:
-                    cursor.execute(f"UPDATE Users SET LastLogout = CURRENT_TIMESTAMP, isActive = False WHERE UserID = {args['user_id']}")
-                connection.commit()
-                return cursor.rowcount
-
-            elif query == 'update_products_by_comp_id':
-                cursor.execute(f"DELETE FROM Products WHERE CompanyID = {args['comp_id']}")
-                insert_query = """
-                    INSERT INTO Products (ProductID, CompanyID, ProductName, FactoryPrice, SellingPrice, CreatedAt)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """
-                for index, row in args['file'].iterrows():
-                    cursor.execute(insert_query, (row['ProductID'], args['comp_id'], row['ProductName'],row['FactoryPrice'], row['SellingPrice'],  row['CreatedAt']))
-                connection.commit()
-                return True
-
-            elif query == 'update_company_revenue':
-                cursor.execute(
-                    f"""
-                    SELECT SUM(s.Quantity * p.SellingPrice) AS total_sales
-                    FROM Sales s
-                    JOIN Products p ON s.ProductID = p.ProductID
-                    JOIN Users u ON s.UserID = u.UserID
-                    WHERE u.CompanyID = {args};
-                    """
-                )
-                result = cursor.fetchone()
-                if isinstance(result, dict):
-                    result = result['total_sales']
-                
-                if result is None: result = 0
-
-                cursor.execute(f"UPDATE Companies SET Revenue = {result} WHERE CompanyID = {args}")
-                connection.commit()
-                return cursor.rowcount > 0
-
-            elif query == 'update_ticket_messages':
-                message = args["message"]
-                username = args['username']
-                ticket_id = args['ticket_id']
-                new_status = 'Waiting for customer' if args['is_agent'] else 'Waiting for support'
-                
-                cursor.execute(
-                    """
-                    UPDATE SupportTickets
-                    SET 
-                        Messages = JSON_ARRAY_APPEND(
-                            IFNULL(Messages, JSON_ARRAY()), '$', JSON_OBJECT('Username', ?, 'MessageText', ?)
-                        ),
-                        UpdatedAt = CURRENT_TIMESTAMP,
-                        Status = ?
-                    WHERE TicketID = ?;
-                    """, (username, message, new_status, ticket_id)
-                )
-                connection.commit()
-                affected_rows = cursor.rowcount
-                return affected_rows >= 0
-
-            elif query == 'update_ticket_status':
-                cursor.execute(
-                    """
-                    UPDATE SupportTickets
-                    SET Status = ?, UpdatedAt = CURRENT_TIMESTAMP
-                    WHERE TicketID = ?""",
-                    (args['status'], args['ticket_id'])
-                )
-                connection.commit()
-                affected_rows = cursor.rowcount
-                return affected_rows >= 0
-
-            elif query == 'update_seller_commission':
-                value = args['new_commission']
-                user_id = args['seller_id']
-                cursor.execute(f"UPDATE Users SET CommissionPercentage = {value} WHERE UserID = {user_id};")
-                connection.commit()
-                result = cursor.rowcount
-                if isinstance(result, tuple):
-                    result = result[0]
-                return result
-
-            elif query == 'update_client_payment_info':
-                cursor.execute(
-                    "UPDATE Clients SET EncryptedIBAN = ? WHERE ClientID = ?",
-                    (args['encrypted_iban'], args['client_id'])
-                )
-                connection.commit()
-                return True
-
-            # --- DELETE QUERIES ---
-            elif query == 'delete_sales_by_comp_id':
-                cursor.execute(
-                    f"""
-                    DELETE FROM Sales
-                    WHERE UserID IN (
-                        SELECT UserID FROM Users WHERE CompanyID = {args}
-                    );
-                    """)
-                connection.commit()
-                return True
-
-            elif query == 'delete_products_by_comp_id':
-                cursor.execute(f"DELETE FROM Products WHERE CompanyID = {args}")
-                connection.commit()
-                return True
-            
-            elif query == 'delete_users_by_comp_id':
-                cursor.execute(f"DELETE FROM Users WHERE CompanyID = {args}")
-                connection.commit()
-                return True
-
-            elif query == 'delete_user_by_id':
-                cursor.execute("DELETE FROM Users WHERE UserID = ?", (args,))
-                connection.commit()
-                result = cursor.rowcount
-                return result > 0
-
-            elif query == 'delete_company_by_id':
-                cursor.execute("DELETE FROM Companies WHERE CompanyID = ?", (args,))
-                connection.commit()
-                result = cursor.rowcount
-                return result > 0
-
-            elif query == 'delete_client_by_id':
-                cursor.execute(f"DELETE FROM Clients WHERE ClientID = {args}")
-                connection.commit()
-                result = cursor.rowcount
-                return result > 0
-            elif query == 'update_company_card_token':
-            # Guarda o token do cartão na tabela Companies
-                cursor.execute(
-                "UPDATE Companies SET FastPayCardToken = ? WHERE CompanyID = ?", (args['token'], args['company_id']))
-                connection.commit()
-                return True
-
-            elif query == 'get_company_card_token':
-            # Recupera o token para processar pagamentos
-                cursor.execute(
-                "SELECT FastPayCardToken FROM Companies WHERE CompanyID = ?", (args,))
-                row = cursor.fetchone()
-                return row[0] if row else None
-
+            result = _Session(self.pool, connection).execute(query, args)
         except mariadb.Error as e:
             print(f"Error: {e}")
             result = None
+            self.pool.discard_statements(connection)
         finally:
-            if connection:
-                cursor.close()
-                connection.close()
+            self.pool.release(connection)
         return result
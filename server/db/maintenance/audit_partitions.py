@@ -0,0 +1,153 @@
+'''
+Monthly partition maintenance for AuditLogs.
+
+AuditLogs is RANGE partitioned on UNIX_TIMESTAMP(Timestamp), one partition
+per month plus a catch-all `pmax`. Run this daily (cron) from the server
+directory:
+
+    python -m db.maintenance.audit_partitions
+
+It converts an unpartitioned table, creates the partitions of the next
+AUDIT_PARTITIONS_AHEAD months and drops (or, with AUDIT_ARCHIVE=1, exchanges
+into an AuditLogs_pYYYYMM archive table) every partition older than
+AUDIT_RETENTION_MONTHS. Dropping a partition is O(1), no DELETE scan.
+'''
+import os
+import sys
+from datetime import date, datetime
+
+AUDIT_RETENTION_MONTHS = int(os.getenv('AUDIT_RETENTION_MONTHS', '12'))
+AUDIT_PARTITIONS_AHEAD = int(os.getenv('AUDIT_PARTITIONS_AHEAD', '3'))
+AUDIT_ARCHIVE = os.getenv('AUDIT_ARCHIVE', '0') == '1'
+
+
+def add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f'p{month.year}{month.month:02d}'
+
+def partition_month(name: str):
+    ''' First day of the month a pYYYYMM partition holds, None for pmax '''
+    if len(name) != 7 or not name[1:].isdigit():
+        return None
+    return date(int(name[1:5]), int(name[5:7]), 1)
+
+def partition_definition(month: date) -> str:
+    upper = add_months(month, 1)
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN (UNIX_TIMESTAMP('{upper.isoformat()} 00:00:00'))"
+
+def partition_clause(first: date, last: date) -> str:
+    ''' PARTITION BY clause with one partition per month from `first` to `last` '''
+    partitions = []
+    month = date(first.year, first.month, 1)
+    while month <= last:
+        partitions.append(partition_definition(month))
+        month = add_months(month, 1)
+    partitions.append('PARTITION pmax VALUES LESS THAN MAXVALUE')
+    return 'PARTITION BY RANGE (UNIX_TIMESTAMP(Timestamp)) (\n        ' + ',\n        '.join(partitions) + '\n    )'
+
+def existing_partitions(cursor) -> list:
+    cursor.execute(
+        """
+        SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'AuditLogs'
+        ORDER BY PARTITION_ORDINAL_POSITION
+        """
+    )
+    return [row[0] for row in cursor.fetchall() if row[0]]
+
+def is_partitioned(cursor, table: str) -> bool:
+    cursor.execute(
+        """
+        SELECT COUNT(*) FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = ? AND PARTITION_NAME IS NOT NULL
+        """,
+        (table,)
+    )
+    return cursor.fetchone()[0] > 0
+
+def ensure_partitioned(cursor, today: date):
+    ''' Convert a pre-partitioning AuditLogs table in place '''
+    if existing_partitions(cursor):
+        return
+    cursor.execute("SELECT MIN(Timestamp) FROM AuditLogs")
+    oldest = cursor.fetchone()[0] or today
+    print('Partitioning AuditLogs (rebuilds the table once)...')
+    cursor.execute(
+        f"""
+        ALTER TABLE AuditLogs
+            MODIFY Timestamp TIMESTAMP NOT NULL DEFAULT current_timestamp(),
+            DROP PRIMARY KEY,
+            ADD PRIMARY KEY (LogID, Timestamp),
+            ADD INDEX UserTimestamp (UserID, Timestamp),
+            ADD INDEX EndpointTimestamp (Endpoint, Timestamp),
+            ADD INDEX IF NOT EXISTS TimestampLog (Timestamp, LogID)
+        {partition_clause(oldest, add_months(today, AUDIT_PARTITIONS_AHEAD))}
+        """
+    )
+
+def rollover(cursor, today: date, months_ahead: int = AUDIT_PARTITIONS_AHEAD) -> list:
+    ''' Split the empty pmax partition so the coming months have their own partition '''
+    months = [partition_month(name) for name in existing_partitions(cursor)]
+    newest = max((month for month in months if month), default=add_months(today, -1))
+    created = []
+    month = add_months(newest, 1)
+    while month <= add_months(today, months_ahead):
+        cursor.execute(
+            f"""
+            ALTER TABLE AuditLogs REORGANIZE PARTITION pmax INTO (
+                {partition_definition(month)},
+                PARTITION pmax VALUES LESS THAN MAXVALUE
+            )
+            """
+        )
+        created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+def expire(cursor, today: date, retention_months: int = AUDIT_RETENTION_MONTHS, archive: bool = AUDIT_ARCHIVE) -> list:
+    ''' Drop, or archive then drop, every partition older than the retention window '''
+    cutoff = add_months(today, -retention_months)
+    expired = []
+    for name in existing_partitions(cursor):
+        month = partition_month(name)
+        if month is None or month >= cutoff:
+            continue
+        if archive:
+            archive_table = f'AuditLogs_{name}'
+            # A run that died after the exchange left the archive table unpartitioned and filled
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {archive_table} LIKE AuditLogs")
+            if is_partitioned(cursor, archive_table):
+                cursor.execute(f"ALTER TABLE {archive_table} REMOVE PARTITIONING")
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {archive_table})")
+            if cursor.fetchone()[0]:
+                cursor.execute(f"SELECT EXISTS (SELECT 1 FROM AuditLogs PARTITION ({name}))")
+                if cursor.fetchone()[0]:
+                    # Exchanging would swap the archived rows back in; leave both for an operator
+                    print(f'Skipping {name}: {archive_table} already holds rows and the partition is not empty')
+                    continue
+            else:
+                cursor.execute(f"ALTER TABLE AuditLogs EXCHANGE PARTITION {name} WITH TABLE {archive_table}")
+        cursor.execute(f"ALTER TABLE AuditLogs DROP PARTITION {name}")
+        expired.append(name)
+    return expired
+
+def main():
+    from db.db_connector import DBConnector
+    connection = DBConnector().connect()
+    if connection is None:
+        sys.exit(1)
+    cursor = connection.cursor()
+    today = datetime.now().date()
+    try:
+        ensure_partitioned(cursor, today)
+        print(f'Created partitions: {rollover(cursor, today)}')
+        print(f'Expired partitions: {expire(cursor, today)}')
+    finally:
+        cursor.close()
+        connection.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+'''
+TTL cleanup of IdempotencyKeys.
+
+A sale request retried with the same Idempotency-Key within
+IDEMPOTENCY_TTL_HOURS gets its original result back; older keys are only
+kept until this job deletes them, in batches so no long lock is held on the
+table. Run it hourly (cron) from the server directory:
+
+    python -m db.maintenance.expire_idempotency_keys
+'''
+import os
+import sys
+
+IDEMPOTENCY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_TTL_HOURS', '24'))
+EXPIRE_BATCH = int(os.getenv('IDEMPOTENCY_EXPIRE_BATCH', '5000'))
+
+
+def expire(dbc, ttl_hours: int = IDEMPOTENCY_TTL_HOURS, batch: int = EXPIRE_BATCH) -> int:
+    ''' Delete keys older than ttl_hours; returns how many were deleted '''
+    deleted = 0
+    while True:
+        count = dbc.execute_query('delete_expired_idempotency_keys', args={'ttl_hours': ttl_hours, 'batch': batch})
+        if count is None:
+            raise RuntimeError('Could not delete expired idempotency keys')
+        deleted += count
+        if count < batch:
+            return deleted
+
+def main():
+    from db.db_connector import DBConnector
+    try:
+        deleted = expire(DBConnector())
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
+    print(f'Deleted {deleted} idempotency keys older than {IDEMPOTENCY_TTL_HOURS} h')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+'''
+Rebuild of SalesMonthlyRollup from Sales.
+
+create_sale keeps the rollup current; this backfills it for sales that
+predate the table or were inserted around it (seed data, manual fixes).
+Run it from the server directory, for every company or only some:
+
+    python -m db.maintenance.rebuild_sales_rollup [company_id ...]
+'''
+import sys
+import mariadb
+
+
+def rebuild(dbc, company_id: int) -> int:
+    ''' Replace the company rollup rows with totals recomputed from Sales '''
+    with dbc.transaction() as tx:
+        # create_sale takes this row lock before inserting, so sales made
+        # during the rebuild wait and are added on top of it
+        tx.execute('lock_company_revenue', company_id)
+        tx.execute('delete_company_rollup', company_id)
+        return tx.execute('rebuild_company_rollup', company_id)
+
+def main():
+    from db.db_connector import DBConnector
+    dbc = DBConnector()
+    company_ids = [int(arg) for arg in sys.argv[1:]] or dbc.execute_query('get_company_ids')
+    if company_ids is None:
+        sys.exit(1)
+    for company_id in company_ids:
+        try:
+            print(f'Company {company_id}: {rebuild(dbc, company_id)} rollup rows')
+        except mariadb.Error as e:
+            print(f'Could not rebuild company {company_id}: {e}')
+
+if __name__ == '__main__':
+    main()
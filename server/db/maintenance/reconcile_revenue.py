@@ -0,0 +1,48 @@
+'''
+Reconciliation of the incrementally maintained Companies.Revenue.
+
+create_sale adds each sale to its company's revenue and the deletes that
+drop sales out of it subtract them, so Revenue is normally exact. This job
+recomputes every company from Sales and repairs any drift (manual edits,
+races between a delete and a concurrent sale). Run it nightly (cron) from
+the server directory:
+
+    python -m db.maintenance.reconcile_revenue
+'''
+import sys
+import mariadb
+from decimal import Decimal
+
+
+def reconcile(dbc, company_id: int):
+    ''' Set the company revenue to the value of its sales; returns (stored, expected) when they differed '''
+    with dbc.transaction() as tx:
+        # The row lock is taken before reading Sales, so a sale committing
+        # meanwhile waits and adds its value on top of the corrected total
+        stored = tx.execute('lock_company_revenue', company_id)
+        expected = Decimal(tx.execute('get_company_sales_revenue', company_id))
+        if stored is not None and Decimal(stored) == expected:
+            return None
+        tx.execute('set_company_revenue', {'revenue': expected, 'comp_id': company_id})
+    return stored, expected
+
+def main():
+    from db.db_connector import DBConnector
+    dbc = DBConnector()
+    company_ids = dbc.execute_query('get_company_ids')
+    if company_ids is None:
+        sys.exit(1)
+    repaired = 0
+    for company_id in company_ids:
+        try:
+            drift = reconcile(dbc, company_id)
+        except mariadb.Error as e:
+            print(f'Could not reconcile company {company_id}: {e}')
+            continue
+        if drift:
+            repaired += 1
+            print(f'Company {company_id}: revenue {drift[0]} -> {drift[1]}')
+    print(f'Reconciled {len(company_ids)} companies, repaired {repaired}')
+
+if __name__ == '__main__':
+    main()
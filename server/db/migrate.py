@@ -0,0 +1,198 @@
+'''
+Versioned schema migrations.
+
+Migrations live in db/migrations as NNNN_description.sql (statements
+separated by `;`) or NNNN_description.py (a `migrate(cursor)` function for
+DDL that must be computed, e.g. partitions). They are applied in version
+order and recorded in SchemaMigrations with a checksum, so an applied file
+that is edited afterwards stops the run instead of silently diverging.
+Run from the server directory:
+
+    python -m db.migrate            apply pending migrations
+    python -m db.migrate status     list applied and pending migrations
+
+MariaDB DDL is not transactional, so statements should be idempotent
+(IF [NOT] EXISTS) to make a migration that failed halfway safe to re-run.
+Index changes should ask for ALGORITHM=INPLACE, LOCK=NONE: the server then
+refuses, rather than silently locking the table, when it cannot build the
+index online. DDL waits at most MIGRATION_LOCK_WAIT_TIMEOUT seconds for the
+table metadata lock so it never queues every query behind a long transaction.
+'''
+import os
+import re
+import sys
+import time
+import hashlib
+import importlib.util
+import mariadb
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_LOCK_WAIT_TIMEOUT = int(os.getenv('MIGRATION_LOCK_WAIT_TIMEOUT', '30'))
+# Only one process migrates at a time
+MIGRATION_LOCK = 'iscte_spot.schema_migrations'
+
+_FILENAME = re.compile(r'^(\d+)_(\w+)\.(sql|py)$')
+
+
+class MigrationError(Exception):
+    ''' Raised when a migration fails or an applied one no longer matches its file '''
+
+
+class Migration:
+    ''' One migration file '''
+
+    def __init__(self, version: int, name: str, path: str):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, 'rb') as migration_file:
+            self.checksum = hashlib.sha256(migration_file.read()).hexdigest()
+
+    def apply(self, cursor):
+        if self.path.endswith('.py'):
+            spec = importlib.util.spec_from_file_location(f'migration_{self.version:04d}', self.path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            try:
+                module.migrate(cursor)
+            except mariadb.Error as e:
+                raise MigrationError(f'{self.name}: {e}') from e
+            return
+        with open(self.path, encoding='utf-8') as migration_file:
+            for statement in split_statements(migration_file.read()):
+                try:
+                    cursor.execute(statement)
+                except mariadb.Error as e:
+                    raise MigrationError(f'{self.name}: {e}\n{statement}') from e
+
+
+def split_statements(sql: str) -> list:
+    ''' Split a script on `;`, ignoring the ones inside quotes and comments '''
+    statements, current = [], []
+    i, quote = 0, None
+    while i < len(sql):
+        char = sql[i]
+        if quote:
+            current.append(char)
+            if char == '\\' and quote != '`':
+                current.append(sql[i + 1:i + 2])
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '\'"`':
+            quote = char
+            current.append(char)
+        elif sql.startswith('-- ', i) or sql.startswith('--\n', i) or char == '#':
+            end = sql.find('\n', i)
+            i = len(sql) if end == -1 else end
+            continue
+        elif sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            i = len(sql) if end == -1 else end + 2
+            continue
+        elif char == ';':
+            statements.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+        i += 1
+    statements.append(''.join(current).strip())
+    return [statement for statement in statements if statement]
+
+def discover(directory: str = MIGRATIONS_DIR) -> list:
+    ''' Migration files sorted by version '''
+    migrations = {}
+    for filename in os.listdir(directory):
+        match = _FILENAME.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(f'Duplicate migration version {version}: {filename}')
+        migrations[version] = Migration(version, filename, os.path.join(directory, filename))
+    return [migrations[version] for version in sorted(migrations)]
+
+def applied(cursor) -> dict:
+    ''' {version: checksum} of the migrations recorded in SchemaMigrations '''
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS SchemaMigrations (
+            Version INT(11) NOT NULL,
+            Name VARCHAR(255) NOT NULL,
+            Checksum CHAR(64) NOT NULL,
+            AppliedAt TIMESTAMP NOT NULL DEFAULT current_timestamp(),
+            DurationMs INT(11) NOT NULL,
+            PRIMARY KEY (Version)
+        )
+        COLLATE='latin1_swedish_ci'
+        ENGINE=InnoDB
+        """
+    )
+    cursor.execute("SELECT Version, Checksum FROM SchemaMigrations")
+    return dict(cursor.fetchall())
+
+def pending(cursor, migrations: list) -> list:
+    ''' Migrations not applied yet, after checking the applied ones are unchanged '''
+    done = applied(cursor)
+    for migration in migrations:
+        if migration.version in done and done[migration.version] != migration.checksum:
+            raise MigrationError(f'{migration.name} was changed after being applied; add a new migration instead')
+    return [migration for migration in migrations if migration.version not in done]
+
+def migrate(connection, migrations: list = None) -> list:
+    ''' Apply every pending migration in order; returns the applied names '''
+    migrations = discover() if migrations is None else migrations
+    connection.autocommit = True
+    cursor = connection.cursor()
+    cursor.execute("SELECT GET_LOCK(?, ?)", (MIGRATION_LOCK, MIGRATION_LOCK_WAIT_TIMEOUT))
+    if cursor.fetchone()[0] != 1:
+        raise MigrationError('Another process is running migrations')
+    try:
+        cursor.execute(f"SET SESSION lock_wait_timeout = {MIGRATION_LOCK_WAIT_TIMEOUT}")
+        done = []
+        for migration in pending(cursor, migrations):
+            print(f'Applying {migration.name}...')
+            started = time.perf_counter()
+            migration.apply(cursor)
+            elapsed_ms = int((time.perf_counter() - started) * 1000)
+            cursor.execute(
+                "INSERT INTO SchemaMigrations (Version, Name, Checksum, DurationMs) VALUES (?, ?, ?, ?)",
+                (migration.version, migration.name, migration.checksum, elapsed_ms)
+            )
+            print(f'Applied {migration.name} in {elapsed_ms} ms')
+            done.append(migration.name)
+        return done
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(?)", (MIGRATION_LOCK,))
+        cursor.fetchall()
+        cursor.close()
+
+def status(connection):
+    cursor = connection.cursor()
+    try:
+        migrations = discover()
+        waiting = {migration.version for migration in pending(cursor, migrations)}
+        for migration in migrations:
+            print(f"{'pending' if migration.version in waiting else 'applied':<8} {migration.name}")
+    finally:
+        cursor.close()
+
+def main():
+    from db.db_connector import DBConnector
+    connection = DBConnector().connect()
+    if connection is None:
+        sys.exit(1)
+    try:
+        if sys.argv[1:] == ['status']:
+            status(connection)
+        else:
+            applied_now = migrate(connection)
+            print(f'{len(applied_now)} migrations applied' if applied_now else 'Schema is up to date')
+    except MigrationError as e:
+        print(f'Migration failed: {e}')
+        sys.exit(1)
+    finally:
+        connection.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+-- Token revocation: the `ver` claim of a JWT must match Users.TokenVersion,
+-- which logout increments
+ALTER TABLE Users
+    ADD COLUMN IF NOT EXISTS TokenVersion INT(11) NOT NULL DEFAULT '0',
+    ALGORITHM=INSTANT;
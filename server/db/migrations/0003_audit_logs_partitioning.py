@@ -0,0 +1,51 @@
+''' Monthly RANGE partitions and (column, Timestamp) indexes for AuditLogs '''
+from datetime import date
+
+# Months partitioned ahead of today; the daily audit_partitions job keeps the window rolling afterwards
+PARTITIONS_AHEAD = 3
+
+
+def _add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+def _partition_clause(first: date, last: date) -> str:
+    ''' One pYYYYMM partition per month from `first` to `last`, then pmax '''
+    partitions = []
+    month = date(first.year, first.month, 1)
+    while month <= last:
+        upper = _add_months(month, 1)
+        partitions.append(
+            f"PARTITION p{month.year}{month.month:02d} VALUES LESS THAN (UNIX_TIMESTAMP('{upper.isoformat()} 00:00:00'))"
+        )
+        month = upper
+    partitions.append('PARTITION pmax VALUES LESS THAN MAXVALUE')
+    return 'PARTITION BY RANGE (UNIX_TIMESTAMP(Timestamp)) (\n        ' + ',\n        '.join(partitions) + '\n    )'
+
+
+def migrate(cursor):
+    # Self-contained on purpose: the checksum only covers this file, so it must not depend on app code
+    cursor.execute(
+        """
+        SELECT COUNT(*) FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'AuditLogs' AND PARTITION_NAME IS NOT NULL
+        """
+    )
+    if not cursor.fetchone()[0]:
+        today = date.today()
+        cursor.execute("SELECT MIN(Timestamp) FROM AuditLogs")
+        oldest = cursor.fetchone()[0] or today
+        print('Partitioning AuditLogs (rebuilds the table once)...')
+        cursor.execute(
+            f"""
+            ALTER TABLE AuditLogs
+                MODIFY Timestamp TIMESTAMP NOT NULL DEFAULT current_timestamp(),
+                DROP PRIMARY KEY,
+                ADD PRIMARY KEY (LogID, Timestamp),
+                ADD INDEX UserTimestamp (UserID, Timestamp),
+                ADD INDEX EndpointTimestamp (Endpoint, Timestamp),
+                ADD INDEX IF NOT EXISTS TimestampLog (Timestamp, LogID)
+            {_partition_clause(oldest, _add_months(today, PARTITIONS_AHEAD))}
+            """
+        )
+    cursor.execute("CREATE INDEX IF NOT EXISTS TimestampLog ON AuditLogs (Timestamp, LogID)")
@@ -0,0 +1,14 @@
+-- Companies.Revenue is maintained by create_sale instead of being recomputed
+-- on every read. Changing the column type copies the table (small, once).
+UPDATE Companies SET Revenue = 0 WHERE Revenue IS NULL;
+ALTER TABLE Companies MODIFY Revenue DECIMAL(12,2) NOT NULL DEFAULT '0.00';
+
+-- Start from the exact value; db/maintenance/reconcile_revenue.py keeps it there
+UPDATE Companies c
+SET Revenue = (
+    SELECT COALESCE(SUM(s.Quantity * p.SellingPrice), 0)
+    FROM Sales s
+    JOIN Products p ON s.ProductID = p.ProductID
+    JOIN Users u ON s.UserID = u.UserID
+    WHERE u.CompanyID = c.CompanyID
+);
@@ -0,0 +1,32 @@
+-- Monthly sales totals, maintained by create_sale
+CREATE TABLE IF NOT EXISTS SalesMonthlyRollup (
+    CompanyID INT(11) NOT NULL,
+    SalesYear SMALLINT NOT NULL,
+    SalesMonth TINYINT NOT NULL,
+    UserID INT(11) NOT NULL,
+    ProductID INT(11) NOT NULL,
+    SalesCount INT(11) NOT NULL DEFAULT '0',
+    Quantity INT(11) NOT NULL DEFAULT '0',
+    Revenue DECIMAL(14,2) NOT NULL DEFAULT '0.00',
+    FactoryCost DECIMAL(14,2) NOT NULL DEFAULT '0.00',
+    PRIMARY KEY (CompanyID, SalesYear, SalesMonth, UserID, ProductID) USING BTREE,
+    INDEX UserID (UserID) USING BTREE,
+    INDEX ProductID (ProductID) USING BTREE
+)
+COLLATE='latin1_swedish_ci'
+ENGINE=InnoDB;
+
+-- Backfill; overwriting on conflict keeps it correct if sales arrive meanwhile
+INSERT INTO SalesMonthlyRollup
+    (CompanyID, SalesYear, SalesMonth, UserID, ProductID, SalesCount, Quantity, Revenue, FactoryCost)
+SELECT u.CompanyID, YEAR(s.SaleDate), MONTH(s.SaleDate), s.UserID, s.ProductID,
+       COUNT(*), SUM(s.Quantity), SUM(s.Quantity * p.SellingPrice), SUM(s.Quantity * p.FactoryPrice)
+FROM Sales s
+JOIN Users u ON s.UserID = u.UserID
+JOIN Products p ON s.ProductID = p.ProductID
+GROUP BY u.CompanyID, YEAR(s.SaleDate), MONTH(s.SaleDate), s.UserID, s.ProductID
+ON DUPLICATE KEY UPDATE
+    SalesCount = VALUES(SalesCount),
+    Quantity = VALUES(Quantity),
+    Revenue = VALUES(Revenue),
+    FactoryCost = VALUES(FactoryCost);
@@ -0,0 +1,13 @@
+-- Per-seller listings filter, sort and read from one index; built online
+ALTER TABLE Sales
+    ADD INDEX IF NOT EXISTS UserSaleDate (UserID, SaleDate, ProductID, ClientID, Quantity),
+    ADD INDEX IF NOT EXISTS ProductSaleDate (ProductID, SaleDate),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Now redundant prefixes of the indexes above (the foreign keys use those)
+ALTER TABLE Sales
+    DROP INDEX IF EXISTS UserID,
+    DROP INDEX IF EXISTS ProductID,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE Clients ADD INDEX IF NOT EXISTS CompanyID (CompanyID), ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,23 @@
+-- Catalog uploads run as background jobs; any API worker reads their progress here
+CREATE TABLE IF NOT EXISTS ImportJobs (
+    JobID INT(11) NOT NULL AUTO_INCREMENT,
+    CompanyID INT(11) NOT NULL,
+    UserID INT(11) NULL DEFAULT NULL,
+    FileName VARCHAR(255) NOT NULL COLLATE 'latin1_swedish_ci',
+    FilePath VARCHAR(1024) NOT NULL COLLATE 'latin1_swedish_ci',
+    Mode VARCHAR(16) NOT NULL DEFAULT 'upsert' COLLATE 'latin1_swedish_ci',
+    Status ENUM('queued','running','done','failed') NOT NULL DEFAULT 'queued' COLLATE 'latin1_swedish_ci',
+    RowsParsed INT(11) NOT NULL DEFAULT '0',
+    RowsWritten INT(11) NOT NULL DEFAULT '0',
+    Diff JSON NULL,
+    Error TEXT NULL DEFAULT NULL COLLATE 'latin1_swedish_ci',
+    CreatedAt TIMESTAMP NOT NULL DEFAULT current_timestamp(),
+    StartedAt TIMESTAMP NULL DEFAULT NULL,
+    FinishedAt TIMESTAMP NULL DEFAULT NULL,
+    UpdatedAt TIMESTAMP NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+    PRIMARY KEY (JobID) USING BTREE,
+    INDEX CompanyCreated (CompanyID, CreatedAt) USING BTREE,
+    CONSTRAINT importjobs_ibfk_1 FOREIGN KEY (CompanyID) REFERENCES Companies (CompanyID) ON UPDATE RESTRICT ON DELETE CASCADE
+)
+COLLATE='latin1_swedish_ci'
+ENGINE=InnoDB;
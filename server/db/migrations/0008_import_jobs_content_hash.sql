@@ -0,0 +1,5 @@
+-- Uploads are content-addressed; a re-upload of the last imported file is skipped after one lookup
+ALTER TABLE ImportJobs
+    ADD COLUMN IF NOT EXISTS ContentHash CHAR(64) NULL DEFAULT NULL COLLATE 'latin1_swedish_ci' AFTER FilePath,
+    ADD INDEX IF NOT EXISTS CompanyStatus (CompanyID, Status),
+    ALGORITHM=INPLACE, LOCK=NONE;
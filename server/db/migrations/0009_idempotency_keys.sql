@@ -0,0 +1,14 @@
+-- Sale requests retried with the same Idempotency-Key return the original result instead of inserting again
+CREATE TABLE IF NOT EXISTS IdempotencyKeys (
+    UserID INT(11) NOT NULL,
+    IdempotencyKey VARCHAR(128) NOT NULL COLLATE 'latin1_bin',
+    Endpoint VARCHAR(64) NOT NULL COLLATE 'latin1_swedish_ci',
+    RequestHash CHAR(64) NOT NULL COLLATE 'latin1_swedish_ci',
+    SaleID INT(11) NULL DEFAULT NULL,
+    Response LONGTEXT NULL DEFAULT NULL COLLATE 'latin1_swedish_ci',
+    CreatedAt TIMESTAMP NOT NULL DEFAULT current_timestamp(),
+    PRIMARY KEY (UserID, IdempotencyKey) USING BTREE,
+    INDEX CreatedAt (CreatedAt) USING BTREE
+)
+COLLATE='latin1_swedish_ci'
+ENGINE=InnoDB;
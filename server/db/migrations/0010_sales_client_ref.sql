@@ -0,0 +1,5 @@
+-- Write-behind sales carry the reference given to the client; the unique index makes journal replays no-ops
+ALTER TABLE Sales
+    ADD COLUMN IF NOT EXISTS ClientRef CHAR(36) NULL DEFAULT NULL COLLATE 'latin1_bin',
+    ADD UNIQUE INDEX IF NOT EXISTS ClientRef (ClientRef),
+    ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,14 @@
+-- Company sales listings filter, sort and page on one index instead of sorting the company's history
+ALTER TABLE Sales
+    ADD COLUMN IF NOT EXISTS CompanyID INT(11) NULL DEFAULT NULL,
+    ALGORITHM=INSTANT;
+
+-- A sale belongs to the company of its client, as in the listings that joined Clients
+UPDATE Sales S
+JOIN Clients C ON C.ClientID = S.ClientID
+SET S.CompanyID = C.CompanyID
+WHERE S.CompanyID IS NULL;
+
+ALTER TABLE Sales
+    ADD INDEX IF NOT EXISTS CompanySaleDate (CompanyID, SaleDate, SaleID),
+    ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,4 @@
+-- Throughput of a finished import, reported by /jobs/<id> as the upload response used to
+ALTER TABLE ImportJobs
+    ADD COLUMN IF NOT EXISTS RowsPerSecond DECIMAL(12,1) NULL DEFAULT NULL AFTER RowsWritten,
+    ALGORITHM=INSTANT;
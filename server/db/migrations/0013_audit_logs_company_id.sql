@@ -0,0 +1,13 @@
+-- Company audit trails filter, sort and page on one index instead of walking every tenant's logs
+ALTER TABLE AuditLogs
+    ADD COLUMN IF NOT EXISTS CompanyID INT(11) NULL DEFAULT NULL AFTER UserID;
+
+-- A log belongs to the company of its user, as in the listing that joined Users
+UPDATE AuditLogs a
+JOIN Users u ON u.UserID = a.UserID
+SET a.CompanyID = u.CompanyID
+WHERE a.CompanyID IS NULL;
+
+ALTER TABLE AuditLogs
+    ADD INDEX IF NOT EXISTS CompanyTimestamp (CompanyID, Timestamp, LogID),
+    ALGORITHM=INPLACE, LOCK=NONE;
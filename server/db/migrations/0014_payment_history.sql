@@ -0,0 +1,31 @@
+-- FastPay transfers made by ProcessPayments, with the destination IBAN masked
+CREATE TABLE IF NOT EXISTS PaymentHistory (
+    PaymentHistoryID INT(11) NOT NULL AUTO_INCREMENT,
+    CompanyID INT(11) NOT NULL,
+    DestinationIBANMasked VARCHAR(50) NOT NULL,
+    AmountCents INT(11) NOT NULL,
+    Status VARCHAR(50) NOT NULL,
+    ExternalID VARCHAR(255) NULL DEFAULT NULL,
+    CreatedAt TIMESTAMP NULL DEFAULT current_timestamp(),
+    PRIMARY KEY (PaymentHistoryID) USING BTREE,
+    INDEX CompanyID (CompanyID) USING BTREE,
+    CONSTRAINT paymenthistory_ibfk_1 FOREIGN KEY (CompanyID) REFERENCES Companies (CompanyID)
+)
+COLLATE='latin1_swedish_ci'
+ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS ScheduledPayments (
+    ScheduledPaymentID INT(11) NOT NULL AUTO_INCREMENT,
+    CompanyID INT(11) NOT NULL,
+    DestinationIBANMasked VARCHAR(50) NOT NULL,
+    AmountCents INT(11) NOT NULL,
+    ScheduledAt VARCHAR(40) NOT NULL,
+    Status VARCHAR(50) NOT NULL,
+    ExternalID VARCHAR(255) NULL DEFAULT NULL,
+    CreatedAt TIMESTAMP NULL DEFAULT current_timestamp(),
+    PRIMARY KEY (ScheduledPaymentID) USING BTREE,
+    INDEX CompanyID (CompanyID) USING BTREE,
+    CONSTRAINT scheduledpayments_ibfk_1 FOREIGN KEY (CompanyID) REFERENCES Companies (CompanyID)
+)
+COLLATE='latin1_swedish_ci'
+ENGINE=InnoDB;
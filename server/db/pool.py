@@ -0,0 +1,217 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import mariadb
+
+POOL_NAME = 'iscte_spot'
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+CONNECT_RETRIES = int(os.getenv('DB_CONNECT_RETRIES', '3'))
+CONNECT_BACKOFF = float(os.getenv('DB_CONNECT_BACKOFF', '0.2'))
+# Unbuffered streams run on their own connections, so slow downloads never hold pooled ones
+STREAM_LIMIT = int(os.getenv('DB_STREAM_LIMIT', '8'))
+# Prepared statements kept per connection; queries built with IN lists vary in text
+STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', '256'))
+
+
+class ConnectionPool:
+    ''' Process-wide pool of MariaDB connections shared by every DBConnector '''
+
+    def __init__(self, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT, stream_limit: int = STREAM_LIMIT, **conn_params):
+        self.size = size
+        self.timeout = timeout
+        self.stream_limit = stream_limit
+        self.conn_params = conn_params
+        self._pool = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._stream_slots = threading.BoundedSemaphore(stream_limit)
+        self._statements = {}
+        self._stats = {
+            'in_use': 0,
+            'waiting': 0,
+            'checkouts': 0,
+            'timeouts': 0,
+            'reconnects': 0,
+            'failures': 0,
+            'checkout_ms_total': 0.0,
+            'checkout_ms_max': 0.0,
+            'streams': 0,
+            'stream_timeouts': 0,
+        }
+
+    def _create_pool(self):
+        ''' Create the underlying mariadb pool, retrying with exponential backoff '''
+        delay = CONNECT_BACKOFF
+        for attempt in range(1, CONNECT_RETRIES + 1):
+            try:
+                # Connections are not reset on release so server-side prepared
+                # statements survive; transactions are closed explicitly instead.
+                return mariadb.ConnectionPool(
+                    pool_name=POOL_NAME,
+                    pool_size=self.size,
+                    pool_reset_connection=False,
+                    autocommit=True,
+                    **self.conn_params
+                )
+            except mariadb.Error as e:
+                print(f"Error creating MariaDB pool (attempt {attempt}/{CONNECT_RETRIES}): {e}")
+                if attempt == CONNECT_RETRIES:
+                    raise
+                time.sleep(delay)
+                delay *= 2
+
+    def _healthy(self, connection) -> bool:
+        ''' Ping the connection, reconnecting with backoff if the server dropped it '''
+        delay = CONNECT_BACKOFF
+        for attempt in range(CONNECT_RETRIES):
+            try:
+                connection.ping()
+                return True
+            except mariadb.Error as e:
+                print(f"Pooled connection failed health check: {e}")
+                time.sleep(delay)
+                delay *= 2
+                try:
+                    connection.reconnect()
+                    self._statements.pop(id(connection), None)
+                    with self._lock:
+                        self._stats['reconnects'] += 1
+                except mariadb.Error as err:
+                    print(f"Error reconnecting to MariaDB: {err}")
+        return False
+
+    def acquire(self):
+        ''' Check out a healthy connection, waiting up to `timeout` for a free slot '''
+        started = time.perf_counter()
+        with self._lock:
+            self._stats['waiting'] += 1
+        acquired = self._slots.acquire(timeout=self.timeout)
+        with self._lock:
+            self._stats['waiting'] -= 1
+            if not acquired:
+                self._stats['timeouts'] += 1
+        if not acquired:
+            raise mariadb.PoolError(f"No connection available after {self.timeout}s")
+
+        try:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = self._create_pool()
+            connection = self._pool.get_connection()
+            if not self._healthy(connection):
+                connection.close()
+                raise mariadb.OperationalError("Pooled connection is not usable")
+        except Exception:
+            self._slots.release()
+            with self._lock:
+                self._stats['failures'] += 1
+            raise
+
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._stats['in_use'] += 1
+            self._stats['checkouts'] += 1
+            self._stats['checkout_ms_total'] += elapsed
+            self._stats['checkout_ms_max'] = max(self._stats['checkout_ms_max'], elapsed)
+        return connection
+
+    def release(self, connection):
+        ''' Return a connection to the pool '''
+        try:
+            connection.close()
+        finally:
+            self._slots.release()
+            with self._lock:
+                self._stats['in_use'] -= 1
+
+    def statement(self, connection, sql: str):
+        ''' Prepared cursor for `sql`, prepared once per pooled connection and reused (LRU bounded) '''
+        statements = self._statements.setdefault(id(connection), OrderedDict())
+        cursor = statements.get(sql)
+        if cursor is None:
+            cursor = connection.cursor(dictionary=True, prepared=True)
+            statements[sql] = cursor
+            while len(statements) > STATEMENT_CACHE_SIZE:
+                _, evicted = statements.popitem(last=False)
+                try:
+                    evicted.close()
+                except mariadb.Error:
+                    pass
+        else:
+            statements.move_to_end(sql)
+        return cursor
+
+    def discard_statements(self, connection):
+        ''' Forget the prepared cursors of a connection after an error '''
+        for cursor in self._statements.pop(id(connection), {}).values():
+            try:
+                cursor.close()
+            except mariadb.Error:
+                pass
+
+    @contextmanager
+    def connection(self):
+        ''' with pool.connection() as connection: ... '''
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    @contextmanager
+    def stream_connection(self):
+        '''
+        with pool.stream_connection() as connection: a dedicated connection for
+        an unbuffered stream, at most stream_limit at a time. It lives as long
+        as the client takes to download, so it is kept out of the pool.
+        '''
+        if not self._stream_slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats['stream_timeouts'] += 1
+            raise mariadb.PoolError(f"No stream slot available after {self.timeout}s")
+        connection = None
+        try:
+            connection = mariadb.connect(autocommit=True, **self.conn_params)
+            with self._lock:
+                self._stats['streams'] += 1
+            yield connection
+        finally:
+            if connection is not None:
+                with self._lock:
+                    self._stats['streams'] -= 1
+                try:
+                    connection.close()
+                except mariadb.Error as e:
+                    print(f"Error closing stream connection: {e}")
+            self._stream_slots.release()
+
+    def stats(self) -> dict:
+        ''' Snapshot of pool usage and checkout latency '''
+        with self._lock:
+            stats = dict(self._stats)
+        checkouts = stats.pop('checkout_ms_total')
+        stats['size'] = self.size
+        stats['stream_limit'] = self.stream_limit
+        stats['checkout_ms_avg'] = round(checkouts / stats['checkouts'], 3) if stats['checkouts'] else 0.0
+        stats['checkout_ms_max'] = round(stats['checkout_ms_max'], 3)
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool(**conn_params) -> ConnectionPool:
+    ''' Return the process-wide pool, creating it on first use '''
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(**conn_params)
+    return _pool
+
+def pool_stats() -> dict:
+    ''' Pool stats, or an empty dict if no query has run yet '''
+    return _pool.stats() if _pool is not None else {}
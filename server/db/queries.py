@@ -0,0 +1,972 @@
+''' Named queries run by DBConnector.execute_query '''
+import json
+from datetime import date
+
+# Result shapes
+ONE = 'one'             # first row as a dict
+ALL = 'all'             # list of row dicts
+SCALAR = 'scalar'       # first column of the first row
+ROWCOUNT = 'rowcount'   # affected rows
+LASTROWID = 'lastrowid' # id generated by an INSERT
+
+
+class Query:
+    ''' SQL text, how to bind execute_query args and how to shape the result '''
+
+    def __init__(self, sql=None, shape=ALL, bind=None, post=None, default=None, script=None, build=None):
+        self.sql = sql
+        self.shape = shape
+        self.bind = bind or _no_args
+        self.post = post
+        self.default = default
+        self.script = script
+        self.build = build
+
+    def params(self, args) -> tuple:
+        ''' Positional parameters for the statement '''
+        return tuple(self.bind(args))
+
+    def statement(self, args) -> tuple:
+        ''' (sql, params) to execute; `build` queries assemble the SQL from their filters '''
+        if self.build:
+            sql, params = self.build(args)
+            return sql, tuple(params)
+        return self.sql, self.params(args)
+
+    def result(self, cursor):
+        ''' Shape the executed cursor into the value returned to callers '''
+        if self.shape == ALL:
+            result = cursor.fetchall()
+        elif self.shape == ROWCOUNT:
+            result = cursor.rowcount
+        elif self.shape == LASTROWID:
+            result = cursor.lastrowid
+        else:
+            result = cursor.fetchone()
+            if result is None:
+                return self.default
+            if self.shape == SCALAR:
+                result = next(iter(result.values()))
+        return self.post(result) if self.post else result
+
+
+def _no_args(args):
+    return ()
+
+def _arg(args):
+    return (args,)
+
+def _keys(*keys):
+    ''' Bind dict args to placeholders in the given order '''
+    return lambda args: tuple(args[key] for key in keys)
+
+def _affected(rowcount):
+    return rowcount > 0
+
+def _done(result):
+    return True
+
+
+def _update_user_activity(args):
+    active = int(bool(args['active']))
+    return (active, active, active, active, args['user_id'])
+
+def _update_ticket_messages(args):
+    new_status = 'Waiting for customer' if args['is_agent'] else 'Waiting for support'
+    return (args['username'], args['message'], new_status, args['ticket_id'])
+
+def _replace_products(session, args):
+    '''
+    Replace the company catalog with the product rows of an uploaded file, one
+    batched insert per chunk. The revenue of the replaced products is read with
+    their rollup rows locked and only subtracted at the end, so the company row
+    is not held for the whole import.
+    '''
+    removed = session.execute('lock_company_products_rollup', args['comp_id'])
+    session.execute('delete_company_products_rollup', args['comp_id'])
+    session.execute('delete_company_products', args['comp_id'])
+    imported = 0
+    for rows in args['chunks']:
+        session.execute_many('insert_product', rows)
+        imported += len(rows)
+    for row in removed:
+        session.execute('subtract_company_revenue', {'amount': row['Revenue'], 'comp_id': row['CompanyID']})
+    return imported
+
+def _product_ids(template):
+    '''
+    Build a statement over a company's products listed in args['ids']: the
+    first placeholder is the company, then the {ids} list, and any
+    placeholder left after it is the company again.
+    '''
+    def build(args):
+        ids = list(args['ids'])
+        sql = template.format(ids=', '.join('?' * len(ids)))
+        trailing = sql.count('?') - len(ids) - 1
+        return sql, [args['comp_id']] + ids + [args['comp_id']] * trailing
+    return build
+
+def _products_revenue(sign):
+    ''' Add (sign '+') or remove (sign '-') the rolled-up revenue of some products from their company '''
+    return Query(shape=ROWCOUNT, build=_product_ids(
+        f"""
+        UPDATE Companies
+        SET Revenue = COALESCE(Revenue, 0) {sign} (
+            SELECT COALESCE(SUM(Revenue), 0)
+            FROM SalesMonthlyRollup
+            WHERE CompanyID = ? AND ProductID IN ({{ids}})
+        )
+        WHERE CompanyID = ?
+        """))
+
+# Sales.CompanyID is the company of the sale's client; it keys the company listings
+_SALE_COMPANY = '(SELECT CompanyID FROM Clients WHERE ClientID = ?)'
+
+def _insert_sales(rows):
+    ''' One multi-row INSERT for a chunk of sales, returning their SaleIDs in row order '''
+    rows = list(rows)
+    values = ', '.join([f'(?, ?, ?, {_SALE_COMPANY}, ?, COALESCE(?, CURRENT_TIMESTAMP))'] * len(rows))
+    params = []
+    for row in rows:
+        params.extend((row['user_id'], row['client_id'], row['product_id'], row['client_id'], row['quantity'], row.get('sale_date')))
+    return f"INSERT INTO Sales (UserID, ClientID, ProductID, CompanyID, Quantity, SaleDate) VALUES {values} RETURNING SaleID", params
+
+def _sale_ids(template):
+    ''' Build a statement over the sales listed in args['ids']; a placeholder after the list is args['comp_id'] '''
+    def build(args):
+        ids = list(args['ids'])
+        sql = template.format(ids=', '.join('?' * len(ids)))
+        return sql, ids + [args.get('comp_id')] * (sql.count('?') - len(ids))
+    return build
+
+def _create_sale(session, args):
+    ''' Insert a sale and add it to the company revenue and monthly rollup in the same transaction '''
+    # The revenue update goes first: its company row lock serialises sales with the maintenance jobs
+    session.execute('add_sale_revenue', args)
+    sale_id = session.execute('insert_sale', args)
+    session.execute('add_sale_to_rollup', sale_id)
+    return sale_id
+
+def _create_sales(session, args):
+    '''
+    Insert args['sales'] ((result, sale args) pairs) in chunks of args['chunk']:
+    one multi-row insert, revenue update and rollup upsert per chunk. Fills
+    each result's sale_id and returns args['results'].
+    '''
+    # Same lock order as create_sale and the maintenance jobs: the company row first
+    session.execute('lock_company_revenue', args['comp_id'])
+    sales = args['sales']
+    for start in range(0, len(sales), args['chunk']):
+        chunk = sales[start:start + args['chunk']]
+        sale_ids = session.execute('insert_sales', [sale for _, sale in chunk])
+        session.execute('add_sales_revenue', {'ids': sale_ids, 'comp_id': args['comp_id']})
+        session.execute('add_sales_to_rollup', {'ids': sale_ids})
+        for (result, _), sale_id in zip(chunk, sale_ids):
+            result['sale_id'] = sale_id
+    return args['results']
+
+def _insert_journaled_sales(rows):
+    ''' One multi-row INSERT for a chunk of write-behind sales, with the ClientRef each was acknowledged with '''
+    rows = list(rows)
+    values = ', '.join([f'(?, ?, ?, {_SALE_COMPANY}, ?, ?, ?)'] * len(rows))
+    params = []
+    for row in rows:
+        params.extend((
+            row['user_id'], row['client_id'], row['product_id'], row['client_id'], row['quantity'], row['sale_date'], row['ref']
+        ))
+    return (
+        f"INSERT INTO Sales (UserID, ClientID, ProductID, CompanyID, Quantity, SaleDate, ClientRef) VALUES {values} RETURNING SaleID",
+        params
+    )
+
+def _once(endpoint, script):
+    '''
+    Run `script` at most once per (user_id, idempotency_key). The key is
+    claimed in the same transaction as the writes: a concurrent retry waits
+    on the claimed row and, once the first request commits, gets its stored
+    result instead of writing again. Returns {'result', 'replayed'}; a key
+    reused with a different request returns {'conflict': True}. A key
+    claimed again after it expired replays the sale stored under its
+    args['client_ref'], if any.
+    '''
+    def run(session, args):
+        claim = dict(args, endpoint=endpoint)
+        if not session.execute('claim_idempotency_key', claim):
+            stored = session.execute('get_idempotency_key', claim)
+            if stored['RequestHash'] != args['request_hash'] or stored['Endpoint'] != endpoint:
+                return {'conflict': True}
+            result = stored['SaleID'] if stored['Response'] is None else json.loads(stored['Response'])
+            return {'result': result, 'replayed': True}
+        if args.get('client_ref'):
+            # The key expired but its sale is still recorded under the ClientRef, as write-behind replays it
+            sale = session.execute('get_sale_by_client_ref', args['client_ref'])
+            if sale:
+                if (sale['UserID'], sale['ClientID'], sale['ProductID'], sale['Quantity']) != tuple(
+                        int(args[key]) for key in ('user_id', 'client_id', 'product_id', 'quantity')):
+                    session.execute('release_idempotency_key', claim)
+                    return {'conflict': True}
+                session.execute('store_idempotency_key', dict(claim, sale_id=sale['SaleID'], response=None))
+                return {'result': sale['SaleID'], 'replayed': True}
+        result = script(session, args)
+        session.execute('store_idempotency_key', dict(
+            claim,
+            sale_id=result if isinstance(result, int) else None,
+            response=None if isinstance(result, int) else json.dumps(result)
+        ))
+        return {'result': result, 'replayed': False}
+    return run
+
+def _month_bounds(args):
+    ''' Bind a month/year as a half-open [first day, first day of next month) SaleDate range '''
+    year, month = args['year'], args['month']
+    return (args['comp_id'], date(year, month, 1), date(year + month // 12, month % 12 + 1, 1))
+
+def _month_range(args):
+    ''' Bind a [start, end) month range for SalesMonthlyRollup (year bounds keep it on the primary key) '''
+    start, end = args['start'], args['end']
+    return (args['comp_id'], start.year, end.year, start.year * 100 + start.month, end.year * 100 + end.month)
+
+def _cleaning_up(delete, *cleanups):
+    ''' Script that removes what a delete drops out of revenue and the sales rollup before deleting '''
+    def script(session, args):
+        for cleanup in cleanups:
+            session.execute(cleanup, args)
+        return session.execute(delete, args)
+    return script
+
+def _revenue_removal(column):
+    ''' Subtract from each company the value of its sales matching `column` = ? '''
+    return Query(
+        f"""
+        UPDATE Companies c
+        JOIN (
+            SELECT u.CompanyID, SUM(s.Quantity * p.SellingPrice) AS Amount
+            FROM Sales s
+            JOIN Products p ON s.ProductID = p.ProductID
+            JOIN Users u ON s.UserID = u.UserID
+            WHERE {column} = ?
+            GROUP BY u.CompanyID
+        ) removed ON removed.CompanyID = c.CompanyID
+        SET c.Revenue = COALESCE(c.Revenue, 0) - removed.Amount
+        """,
+        ROWCOUNT, _arg)
+
+
+def _after_sale(args) -> tuple:
+    ''' Keyset predicate continuing a newest-first (SaleDate, SaleID) listing after args['after'] '''
+    if args.get('after') is None:
+        return [], []
+    sale_date, sale_id = args['after']
+    return ['(S.SaleDate < ? OR (S.SaleDate = ? AND S.SaleID < ?))'], [sale_date, sale_date, sale_id]
+
+def _limit(sql, params, args):
+    if args.get('limit') is not None:
+        sql += ' LIMIT ?'
+        params.append(args['limit'])
+    return sql, params
+
+def _sales_page(select, owner):
+    '''
+    Build a sales listing ordered newest first by (SaleDate, SaleID), continued
+    after the `after` key of the previous page; `limit` is optional so the same
+    query also feeds the unpaginated stream.
+    '''
+    def build(args):
+        where, params = _after_sale(args)
+        where.insert(0, f'{owner} = ?')
+        params.insert(0, args['owner_id'])
+        sql = f"{select} WHERE {' AND '.join(where)} ORDER BY S.SaleDate DESC, S.SaleID DESC"
+        return _limit(sql, params, args)
+    return build
+
+def _user_overview(args):
+    '''
+    A page of a seller's sales, newest first, read in UserSaleDate order like
+    page_user_sales; the totals from SalesMonthlyRollup ride on every row as
+    scalar subqueries, evaluated once per statement.
+    '''
+    sql, params = _sales_page(_USER_OVERVIEW, 'S.UserID')(dict(args, owner_id=args['user_id']))
+    return sql, [args['user_id'], args['user_id']] + params
+
+def _get_user_overview(session, args):
+    '''
+    get_user_overview rows. A seller without sales, or a cursor past the last
+    page, gets one row of totals with no sale in it.
+    '''
+    rows = session.execute('page_user_overview', args)
+    if rows:
+        return rows
+    return [session.execute('get_user_totals', args['user_id'])]
+
+_USER_OVERVIEW = """
+    SELECT S.SaleID, U.UserName, C.FirstName, P.ProductName, P.SellingPrice, S.Quantity, S.SaleDate,
+           (SELECT COALESCE(SUM(SalesCount), 0) FROM SalesMonthlyRollup WHERE UserID = ?) AS SalesCount,
+           (SELECT COALESCE(SUM(Revenue), 0) FROM SalesMonthlyRollup WHERE UserID = ?) AS Revenue
+    FROM Sales S
+    JOIN Users U ON S.UserID = U.UserID
+    JOIN Clients C ON S.ClientID = C.ClientID
+    JOIN Products P ON S.ProductID = P.ProductID
+    """
+
+_COMPANY_SALES = """
+    SELECT S.SaleID, P.ProductName, U.Username, C.FirstName, P.SellingPrice, S.Quantity, S.SaleDate
+    FROM Sales S
+    JOIN Clients C ON S.ClientID = C.ClientID
+    JOIN Users U ON S.UserID = U.UserID
+    JOIN Products P ON S.ProductID = P.ProductID
+    """
+
+_USER_SALES = """
+    SELECT S.SaleID, U.UserName, C.FirstName, P.ProductName, P.SellingPrice, S.Quantity, S.SaleDate
+    FROM Sales S
+    JOIN Users U ON S.UserID = U.UserID
+    JOIN Clients C ON S.ClientID = C.ClientID
+    JOIN Products P ON S.ProductID = P.ProductID
+    """
+
+
+def _search_audit_logs(args):
+    '''
+    Company audit trail, newest first. Only the filters that are set reach
+    the SQL so each combination can use its (column, Timestamp) index, and
+    `after` continues from the (Timestamp, LogID) of the previous page. The
+    company is the log's own CompanyID, so an unfiltered page reads
+    CompanyTimestamp instead of every tenant's rows.
+    '''
+    where = ['a.CompanyID = ?']
+    params = [args['comp_id']]
+    for column, key in (('a.UserID', 'user_id'), ('a.Endpoint', 'endpoint'), ('a.ResponseStatus', 'status')):
+        if args.get(key) is not None:
+            where.append(f'{column} = ?')
+            params.append(args[key])
+    if args.get('since') is not None:
+        where.append('a.Timestamp >= ?')
+        params.append(args['since'])
+    if args.get('until') is not None:
+        where.append('a.Timestamp < ?')
+        params.append(args['until'])
+    if args.get('after') is not None:
+        timestamp, log_id = args['after']
+        where.append('(a.Timestamp < ? OR (a.Timestamp = ? AND a.LogID < ?))')
+        params.extend((timestamp, timestamp, log_id))
+    sql = f"""
+        SELECT a.LogID, a.UserID, u.Username, a.Endpoint, a.Method, a.SourceIP,
+               a.RequestHeaders, a.RequestBody, a.ResponseStatus, a.Timestamp
+        FROM AuditLogs a
+        JOIN Users u ON u.UserID = a.UserID
+        WHERE {' AND '.join(where)}
+        ORDER BY a.Timestamp DESC, a.LogID DESC
+        LIMIT ?
+        """
+    params.append(args['limit'])
+    return sql, params
+
+
+QUERIES = {
+    # --- READ QUERIES ---
+    'get_user_by_name': Query(
+        "SELECT UserID FROM Users WHERE Username = ?",
+        SCALAR, _arg, default=False),
+    'get_user_password': Query(
+        "SELECT PasswordHash FROM Users WHERE UserID = ?",
+        SCALAR, _arg, default=False),
+    'get_login_profile': Query(
+        "SELECT UserID, PasswordHash, IsAdmin, IsAgent, CompanyID, TokenVersion FROM Users WHERE Username = ?",
+        ONE, _arg),
+    'get_token_state': Query(
+        "SELECT isActive, TokenVersion FROM Users WHERE UserID = ?",
+        ONE, _arg),
+    'get_user_by_id': Query(
+        "SELECT * FROM Users WHERE UserID = ?",
+        ONE, _arg),
+    'get_clients_list': Query(
+        """
+        SELECT ClientID, FirstName, LastName, Email, PhoneNumber, Address, City, Country, EncryptedIBAN
+        FROM Clients
+        WHERE CompanyID = ?
+        """,
+        ALL, _arg),
+    'get_employees_list': Query(
+        "SELECT UserID, Username, Email, CommissionPercentage, isActive FROM Users WHERE CompanyID = ?",
+        ALL, _arg),
+    'get_compnay_id_by_user': Query(
+        "SELECT CompanyID FROM Users WHERE UserID = ?",
+        SCALAR, _arg),
+    'get_company_sales': Query(
+        """
+        SELECT Sales.SaleID, Products.ProductName, Users.Username, Clients.FirstName, Products.SellingPrice, Sales.Quantity, Sales.SaleDate
+        FROM Sales
+        JOIN Clients ON Sales.ClientID = Clients.ClientID
+        JOIN Users ON Sales.UserID = Users.UserID
+        JOIN Products ON Sales.ProductID = Products.ProductID
+        WHERE Clients.CompanyID = ?
+        """,
+        ALL, _arg),
+    'page_company_sales': Query(
+        shape=ALL, build=_sales_page(_COMPANY_SALES, 'S.CompanyID')),
+    'page_user_sales': Query(
+        shape=ALL, build=_sales_page(_USER_SALES, 'S.UserID')),
+    'get_user_overview': Query(script=_get_user_overview),
+    'page_user_overview': Query(
+        shape=ALL, build=_user_overview),
+    'get_user_totals': Query(
+        """
+        SELECT NULL AS SaleID, COALESCE(SUM(SalesCount), 0) AS SalesCount, COALESCE(SUM(Revenue), 0) AS Revenue
+        FROM SalesMonthlyRollup
+        WHERE UserID = ?
+        """,
+        ONE, _arg),
+    'get_user_sales': Query(
+        """
+        SELECT
+            S.SaleID, U.UserName, C.FirstName, P.ProductName, P.SellingPrice, S.Quantity, S.SaleDate
+        FROM Sales S
+        JOIN Users U ON S.UserID = U.UserID
+        JOIN Clients C ON S.ClientID = C.ClientID
+        JOIN Products P ON S.ProductID = P.ProductID
+        WHERE S.UserID = ?
+        """,
+        ALL, _arg),
+    'get_user_admin': Query(
+        "SELECT IsAdmin FROM Users WHERE UserID = ?",
+        SCALAR, _arg),
+    'get_user_comp_id': Query(
+        "SELECT CompanyID FROM Users WHERE UserID = ?",
+        SCALAR, _arg),
+    'get_import_job': Query(
+        """
+        SELECT JobID, CompanyID, FileName, ContentHash, Mode, Status, RowsParsed, RowsWritten, RowsPerSecond, Diff, Error,
+               CreatedAt, StartedAt, FinishedAt, UpdatedAt
+        FROM ImportJobs
+        WHERE JobID = ?
+        """,
+        ONE, _arg),
+    'get_last_import': Query(
+        """
+        SELECT JobID, ContentHash
+        FROM ImportJobs
+        WHERE CompanyID = ? AND Status = 'done'
+        ORDER BY JobID DESC
+        LIMIT 1
+        """,
+        ONE, _arg),
+    'get_idempotency_key': Query(
+        """
+        SELECT Endpoint, RequestHash, SaleID, Response
+        FROM IdempotencyKeys
+        WHERE UserID = ? AND IdempotencyKey = ?
+        """,
+        ONE, _keys('user_id', 'idempotency_key')),
+    'get_company_client_ids': Query(
+        "SELECT ClientID FROM Clients WHERE CompanyID = ?",
+        ALL, _arg, post=lambda rows: [row['ClientID'] for row in rows]),
+    'get_company_product_ids': Query(
+        "SELECT ProductID FROM Products WHERE CompanyID = ?",
+        ALL, _arg, post=lambda rows: [row['ProductID'] for row in rows]),
+    'get_company_user_ids': Query(
+        "SELECT UserID FROM Users WHERE CompanyID = ?",
+        ALL, _arg, post=lambda rows: [row['UserID'] for row in rows]),
+    'company_owns_client': Query(
+        "SELECT COUNT(*) FROM Clients WHERE ClientID = ? AND CompanyID = ?",
+        SCALAR, _keys('id', 'comp_id')),
+    'company_owns_product': Query(
+        "SELECT COUNT(*) FROM Products WHERE ProductID = ? AND CompanyID = ?",
+        SCALAR, _keys('id', 'comp_id')),
+    'company_owns_user': Query(
+        "SELECT COUNT(*) FROM Users WHERE UserID = ? AND CompanyID = ?",
+        SCALAR, _keys('id', 'comp_id')),
+    'get_product_catalog': Query(
+        "SELECT ProductID, ProductName, FactoryPrice, SellingPrice FROM Products WHERE CompanyID = ?",
+        ALL, _arg),
+    'get_foreign_product_ids': Query(shape=ALL, build=_product_ids(
+        "SELECT ProductID FROM Products WHERE CompanyID <> ? AND ProductID IN ({ids})"),
+        post=lambda rows: [row['ProductID'] for row in rows]),
+    'get_products_list': Query(
+        "SELECT ProductID, ProductName, SellingPrice FROM Products WHERE CompanyID = ?",
+        ALL, _arg),
+    'get_company_revenue': Query(
+        "SELECT Revenue FROM Companies WHERE CompanyID = ?",
+        SCALAR, _arg),
+    'get_company_sales_revenue': Query(
+        """
+        SELECT COALESCE(SUM(s.Quantity * p.SellingPrice), 0) AS Revenue
+        FROM Sales s
+        JOIN Products p ON s.ProductID = p.ProductID
+        JOIN Users u ON s.UserID = u.UserID
+        WHERE u.CompanyID = ?
+        """,
+        SCALAR, _arg),
+    'get_company_ids': Query(
+        "SELECT CompanyID FROM Companies",
+        ALL, post=lambda rows: [row['CompanyID'] for row in rows]),
+    'get_employees_return': Query(
+        """
+        SELECT
+            u.UserID, u.Username, u.CommissionPercentage,
+            SUM(r.SalesCount) AS TotalSales,
+            SUM(r.Revenue) AS TotalSalesAmount,
+            (SUM(r.Revenue) * (u.CommissionPercentage / 100)) AS TotalCommission
+        FROM SalesMonthlyRollup r
+        JOIN Users u ON r.UserID = u.UserID
+        WHERE r.CompanyID = ?
+        AND r.SalesMonth = ?
+        AND r.SalesYear = ?
+        GROUP BY u.UserID, u.CommissionPercentage
+        """,
+        ALL, _keys('comp_id', 'month', 'year')),
+    'get_last_3_sales': Query(
+        """
+        SELECT S.SaleID, U.UserName, C.FirstName, P.ProductName, P.SellingPrice, S.Quantity, S.SaleDate
+        FROM Sales S
+        JOIN Users U ON S.UserID = U.UserID
+        JOIN Clients C ON S.ClientID = C.ClientID
+        JOIN Products P ON S.ProductID = P.ProductID
+        WHERE S.UserID = ?
+        ORDER BY S.SaleDate DESC
+        LIMIT 3
+        """,
+        ALL, _arg),
+    'get_sales_month_comp_id': Query(
+        """
+        SELECT Sales.SaleID, Sales.UserID, Sales.ClientID, Sales.ProductID, Sales.Quantity, Sales.SaleDate
+        FROM Sales
+        JOIN Users ON Sales.UserID = Users.UserID
+        WHERE Users.CompanyID = ? AND Sales.SaleDate >= ? AND Sales.SaleDate < ?
+        """,
+        ALL, _month_bounds),
+    'get_costs_sales_month': Query(
+        """
+        SELECT
+            COALESCE(SUM(Revenue), 0) AS TotalSellingPrice,
+            COALESCE(SUM(FactoryCost), 0) AS TotalFactoryPrice
+        FROM SalesMonthlyRollup
+        WHERE CompanyID = ?
+        AND SalesMonth = ?
+        AND SalesYear = ?
+        """,
+        ONE, _keys('comp_id', 'month', 'year'), default=False),
+    'get_cash_flow_months': Query(
+        """
+        SELECT
+            r.SalesYear AS Year, r.SalesMonth AS Month,
+            u.UserID, u.Username, u.CommissionPercentage,
+            SUM(r.SalesCount) AS TotalSales,
+            SUM(r.Revenue) AS TotalSalesAmount,
+            SUM(r.FactoryCost) AS TotalFactoryPrice
+        FROM SalesMonthlyRollup r
+        JOIN Users u ON r.UserID = u.UserID
+        WHERE r.CompanyID = ?
+        AND r.SalesYear BETWEEN ? AND ?
+        AND r.SalesYear * 100 + r.SalesMonth >= ?
+        AND r.SalesYear * 100 + r.SalesMonth < ?
+        GROUP BY r.SalesYear, r.SalesMonth, u.UserID
+        ORDER BY Year, Month, u.UserID
+        """,
+        ALL, _month_range),
+    'get_admin_tickets': Query(
+        """
+        SELECT st.TicketID, st.UserID, u.CompanyID, st.Status, st.Category, st.Description, st.Messages, st.CreatedAt, st.UpdatedAt
+        FROM SupportTickets st
+        JOIN Users u ON st.UserID = u.UserID
+        WHERE u.CompanyID = ?
+        """,
+        ALL, _arg),
+    'get_user_tickets': Query(
+        """
+        SELECT TicketID, UserID, Status, Category, Description, Messages, CreatedAt, UpdatedAt
+        FROM SupportTickets st
+        WHERE UserID = ?
+        """,
+        ALL, _arg),
+    'get_user_agent': Query(
+        "SELECT IsAgent FROM Users WHERE UserID = ?",
+        SCALAR, _arg, post=lambda is_agent: is_agent == 1, default=False),
+    'get_ticket_by_id': Query(
+        "SELECT * FROM SupportTickets WHERE TicketID = ?",
+        ONE, _arg),
+    'get_agent_tickets': Query(
+        "SELECT * From SupportTickets",
+        ALL),
+
+    # --- PAGAMENTO & CARD QUERIES ---
+    'create_payment': Query(
+        """
+        INSERT INTO Payments (CompanyID, AdminUserID, TransactionID, Amount, Status, DigitalSignature, CreatedAt)
+        VALUES (?, ?, ?, ?, 'Pending', ?, CURRENT_TIMESTAMP)
+        """,
+        LASTROWID, _keys('company_id', 'user_id', 'transaction_id', 'amount', 'signature')),
+    'update_payment_status': Query(
+        "UPDATE Payments SET Status = ? WHERE TransactionID = ?",
+        ROWCOUNT, _keys('status', 'transaction_id'), post=_affected),
+    'get_payment_by_transaction': Query(
+        "SELECT * FROM Payments WHERE TransactionID = ?",
+        ONE, _arg),
+    'update_company_card_token': Query(
+        "UPDATE Companies SET FastPayCardToken = ? WHERE CompanyID = ?",
+        ROWCOUNT, _keys('token', 'company_id'), post=_done),
+    'update_company_schedule': Query(
+        "UPDATE Companies SET PaymentSchedule = ? WHERE CompanyID = ?",
+        ROWCOUNT, _keys('schedule', 'company_id'), post=_done),
+    'get_company_card_token': Query(
+        "SELECT FastPayCardToken FROM Companies WHERE CompanyID = ?",
+        SCALAR, _arg),
+    # The source account of a company's FastPay transfers is its admin's encrypted IBAN
+    'get_company_nib_encrypted': Query(
+        """
+        SELECT u.EncryptedIBAN
+        FROM Companies c
+        JOIN Users u ON u.UserID = c.AdminUserID
+        WHERE c.CompanyID = ?
+        """,
+        SCALAR, _arg),
+    'insert_payment_history': Query(
+        """
+        INSERT INTO PaymentHistory (CompanyID, DestinationIBANMasked, AmountCents, Status, ExternalID)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        LASTROWID, _keys('comp_id', 'dest_iban_masked', 'amount_cents', 'status', 'external_id')),
+    'insert_scheduled_payment': Query(
+        """
+        INSERT INTO ScheduledPayments (CompanyID, DestinationIBANMasked, AmountCents, ScheduledAt, Status, ExternalID)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        LASTROWID, _keys('comp_id', 'dest_iban_masked', 'amount_cents', 'schedule_at', 'status', 'external_id')),
+    # Cálculo de Comissões Reais: Soma das vendas * preço * comissão%
+    'get_pending_commissions': Query(
+        """
+        SELECT
+            u.UserID,
+            u.EncryptedIBAN,
+            SUM(r.Revenue * (u.CommissionPercentage / 100)) as TotalToPay
+        FROM SalesMonthlyRollup r
+        JOIN Users u ON r.UserID = u.UserID
+        WHERE r.CompanyID = ?
+          AND u.EncryptedIBAN IS NOT NULL
+        GROUP BY u.UserID, u.EncryptedIBAN
+        HAVING TotalToPay > 0
+        """,
+        ALL, _arg),
+    'create_audit_log': Query(
+        """
+        INSERT INTO AuditLogs (UserID, CompanyID, Endpoint, Method, SourceIP, RequestHeaders, RequestBody, ResponseStatus)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        ROWCOUNT, lambda args: (
+            args['user_id'], args.get('comp_id'), args['endpoint'], args['method'],
+            args['ip'], args['headers'], args['body'], args['status']
+        ), post=_done),
+    'search_audit_logs': Query(
+        shape=ALL, build=_search_audit_logs),
+    'update_user_iban': Query(
+        "UPDATE Users SET EncryptedIBAN = ? WHERE UserID = ?",
+        ROWCOUNT, _keys('iban', 'user_id'), post=_done),
+
+    # --- CREATE QUERIES ---
+    'create_user_employee': Query(
+        "INSERT INTO Users (Username, PasswordHash, Email, CompanyID, CommissionPercentage, CreatedAt) VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+        LASTROWID, lambda args: (args['username'], 'T3MP-password-32', args['email'], args['comp_id'], 5)),
+    'create_user_admin': Query(
+        "INSERT INTO Users (Username, PasswordHash, Email, IsAdmin, CreatedAt) VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)",
+        LASTROWID, _keys('username', 'password', 'email', 'is_admin')),
+    'create_company': Query(
+        "INSERT INTO Companies (CompanyName, NumberOfEmployees, AdminUserID, Revenue) VALUES (?, ?, ?, 0)",
+        LASTROWID, _keys('comp_name', 'num_employees', 'user_id')),
+    'create_client': Query(
+        """
+        INSERT INTO Clients
+        (FirstName, LastName, Email, PhoneNumber, Address, City, Country, CompanyID, EncryptedIBAN, CreatedAt)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """,
+        LASTROWID, lambda args: (
+            args['first_name'],
+            args['last_name'],
+            args['email'],
+            args['phone_number'],
+            args['address'],
+            args['city'],
+            args['country'],
+            args['comp_id'],
+            args.get('encrypted_iban')
+        )),
+    'create_sale': Query(script=_create_sale),
+    'insert_sale': Query(
+        """
+        INSERT INTO Sales (UserID, ClientID, ProductID, CompanyID, Quantity, SaleDate, ClientRef)
+        VALUES (?, ?, ?, (SELECT CompanyID FROM Clients WHERE ClientID = ?), ?, CURRENT_TIMESTAMP, ?)
+        """,
+        # A keyed sale stores the same ClientRef as in write-behind mode, so switching modes never records it twice
+        LASTROWID, lambda args: (
+            args['user_id'], args['client_id'], args['product_id'], args['client_id'], args['quantity'], args.get('client_ref')
+        )),
+    'add_sale_revenue': Query(
+        """
+        UPDATE Companies c
+        JOIN Users u ON u.CompanyID = c.CompanyID
+        JOIN Products p ON p.ProductID = ?
+        SET c.Revenue = COALESCE(c.Revenue, 0) + ? * p.SellingPrice
+        WHERE u.UserID = ?
+        """,
+        ROWCOUNT, _keys('product_id', 'quantity', 'user_id')),
+    'insert_journaled_sales': Query(
+        shape=ALL, build=_insert_journaled_sales, post=lambda rows: [row['SaleID'] for row in rows]),
+    # A replayed or retried write-behind sale is recognised by its ClientRef alone
+    'get_existing_client_refs': Query(shape=ALL, build=_sale_ids(
+        "SELECT ClientRef FROM Sales WHERE ClientRef IN ({ids})"
+    ), post=lambda rows: [row['ClientRef'] for row in rows]),
+    'get_sale_by_client_ref': Query(
+        "SELECT SaleID, UserID, ClientID, ProductID, Quantity FROM Sales WHERE ClientRef = ?",
+        ONE, _arg),
+    'create_sale_once': Query(script=_once('sales/new', _create_sale)),
+    'create_sales_bulk': Query(script=_create_sales),
+    'create_sales_bulk_once': Query(script=_once('sales/bulk', _create_sales)),
+    'claim_idempotency_key': Query(
+        """
+        INSERT IGNORE INTO IdempotencyKeys (UserID, IdempotencyKey, Endpoint, RequestHash)
+        VALUES (?, ?, ?, ?)
+        """,
+        ROWCOUNT, _keys('user_id', 'idempotency_key', 'endpoint', 'request_hash'), post=_affected),
+    'release_idempotency_key': Query(
+        "DELETE FROM IdempotencyKeys WHERE UserID = ? AND IdempotencyKey = ?",
+        ROWCOUNT, _keys('user_id', 'idempotency_key')),
+    'insert_sales': Query(
+        shape=ALL, build=_insert_sales, post=lambda rows: [row['SaleID'] for row in rows]),
+    # Bulk counterparts of add_sale_revenue / add_sale_to_rollup, one statement per chunk of sales
+    'add_sales_revenue': Query(shape=ROWCOUNT, build=_sale_ids(
+        """
+        UPDATE Companies
+        SET Revenue = COALESCE(Revenue, 0) + (
+            SELECT COALESCE(SUM(s.Quantity * p.SellingPrice), 0)
+            FROM Sales s
+            JOIN Products p ON s.ProductID = p.ProductID
+            WHERE s.SaleID IN ({ids})
+        )
+        WHERE CompanyID = ?
+        """)),
+    'add_sales_to_rollup': Query(shape=ROWCOUNT, build=_sale_ids(
+        """
+        INSERT INTO SalesMonthlyRollup
+            (CompanyID, SalesYear, SalesMonth, UserID, ProductID, SalesCount, Quantity, Revenue, FactoryCost)
+        SELECT u.CompanyID, YEAR(s.SaleDate), MONTH(s.SaleDate), s.UserID, s.ProductID,
+               COUNT(*), SUM(s.Quantity), SUM(s.Quantity * p.SellingPrice), SUM(s.Quantity * p.FactoryPrice)
+        FROM Sales s
+        JOIN Users u ON s.UserID = u.UserID
+        JOIN Products p ON s.ProductID = p.ProductID
+        WHERE s.SaleID IN ({ids})
+        GROUP BY u.CompanyID, YEAR(s.SaleDate), MONTH(s.SaleDate), s.UserID, s.ProductID
+        ON DUPLICATE KEY UPDATE
+            SalesCount = SalesCount + VALUES(SalesCount),
+            Quantity = Quantity + VALUES(Quantity),
+            Revenue = Revenue + VALUES(Revenue),
+            FactoryCost = FactoryCost + VALUES(FactoryCost)
+        """)),
+    'add_sale_to_rollup': Query(
+        """
+        INSERT INTO SalesMonthlyRollup
+            (CompanyID, SalesYear, SalesMonth, UserID, ProductID, SalesCount, Quantity, Revenue, FactoryCost)
+        SELECT u.CompanyID, YEAR(s.SaleDate), MONTH(s.SaleDate), s.UserID, s.ProductID,
+               1, s.Quantity, s.Quantity * p.SellingPrice, s.Quantity * p.FactoryPrice
+        FROM Sales s
+        JOIN Users u ON s.UserID = u.UserID
+        JOIN Products p ON s.ProductID = p.ProductID
+        WHERE s.SaleID = ?
+        ON DUPLICATE KEY UPDATE
+            SalesCount = SalesCount + 1,
+            Quantity = Quantity + VALUES(Quantity),
+            Revenue = Revenue + VALUES(Revenue),
+            FactoryCost = FactoryCost + VALUES(FactoryCost)
+        """,
+        ROWCOUNT, _arg),
+    'rebuild_company_rollup': Query(
+        """
+        INSERT INTO SalesMonthlyRollup
+            (CompanyID, SalesYear, SalesMonth, UserID, ProductID, SalesCount, Quantity, Revenue, FactoryCost)
+        SELECT u.CompanyID, YEAR(s.SaleDate), MONTH(s.SaleDate), s.UserID, s.ProductID,
+               COUNT(*), SUM(s.Quantity), SUM(s.Quantity * p.SellingPrice), SUM(s.Quantity * p.FactoryPrice)
+        FROM Sales s
+        JOIN Users u ON s.UserID = u.UserID
+        JOIN Products p ON s.ProductID = p.ProductID
+        WHERE u.CompanyID = ?
+        GROUP BY YEAR(s.SaleDate), MONTH(s.SaleDate), s.UserID, s.ProductID
+        """,
+        ROWCOUNT, _arg),
+    'create_ticket': Query(
+        "INSERT INTO SupportTickets (UserID, Status, Category, Description, Messages, CreatedAt) VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+        LASTROWID, _keys('user_id', 'status', 'category', 'description', 'messages')),
+    'create_import_job': Query(
+        "INSERT INTO ImportJobs (CompanyID, UserID, FileName, FilePath, ContentHash, Mode) VALUES (?, ?, ?, ?, ?, ?)",
+        LASTROWID, _keys('comp_id', 'user_id', 'file_name', 'file_path', 'content_hash', 'mode')),
+    'upsert_product': Query(
+        """
+        INSERT INTO Products (ProductID, CompanyID, ProductName, FactoryPrice, SellingPrice, CreatedAt)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON DUPLICATE KEY UPDATE
+            ProductName = VALUES(ProductName),
+            FactoryPrice = VALUES(FactoryPrice),
+            SellingPrice = VALUES(SellingPrice)
+        """,
+        ROWCOUNT, tuple),
+    'insert_product': Query(
+        """
+        INSERT INTO Products (ProductID, CompanyID, ProductName, FactoryPrice, SellingPrice, CreatedAt)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        # Rows come from the catalog import already in column order
+        ROWCOUNT, tuple),
+
+    # --- UPDATE QUERIES ---
+    'update_user_password': Query(
+        "UPDATE Users SET PasswordHash = ? WHERE UserID = ?",
+        ROWCOUNT, _keys('new_password', 'user_id'), post=_affected),
+    'update_user_comp_id': Query(
+        "UPDATE Users SET CompanyID = ? WHERE UserID = ?",
+        ROWCOUNT, _keys('comp_id', 'user_id'), post=_affected),
+    'update_user_activity': Query(
+        """
+        UPDATE Users
+        SET LastLogin = IF(?, CURRENT_TIMESTAMP, LastLogin),
+            LastLogout = IF(?, LastLogout, CURRENT_TIMESTAMP),
+            isActive = ?,
+            TokenVersion = TokenVersion + IF(?, 0, 1)
+        WHERE UserID = ?
+        """,
+        ROWCOUNT, _update_user_activity),
+    'record_user_login': Query(
+        """
+        UPDATE Users
+        SET LastLogin = ?, isActive = True
+        WHERE UserID = ? AND TokenVersion = ?
+        """,
+        ROWCOUNT, _keys('login_at', 'user_id', 'token_version')),
+    'update_products_by_comp_id': Query(script=_replace_products),
+    'lock_company_revenue': Query(
+        "SELECT Revenue FROM Companies WHERE CompanyID = ? FOR UPDATE",
+        SCALAR, _arg),
+    'subtract_company_revenue': Query(
+        "UPDATE Companies SET Revenue = COALESCE(Revenue, 0) - ? WHERE CompanyID = ?",
+        ROWCOUNT, _keys('amount', 'comp_id')),
+    'set_company_revenue': Query(
+        "UPDATE Companies SET Revenue = ? WHERE CompanyID = ?",
+        ROWCOUNT, _keys('revenue', 'comp_id'), post=_done),
+    'start_import_job': Query(
+        "UPDATE ImportJobs SET Status = 'running', StartedAt = CURRENT_TIMESTAMP WHERE JobID = ?",
+        ROWCOUNT, _arg),
+    'update_import_job_progress': Query(
+        "UPDATE ImportJobs SET RowsParsed = ?, RowsWritten = ? WHERE JobID = ?",
+        ROWCOUNT, _keys('rows_parsed', 'rows_written', 'job_id')),
+    'finish_import_job': Query(
+        """
+        UPDATE ImportJobs
+        SET Status = ?, RowsParsed = ?, RowsWritten = ?, RowsPerSecond = ?, Diff = ?, Error = ?,
+            FinishedAt = CURRENT_TIMESTAMP
+        WHERE JobID = ?
+        """,
+        ROWCOUNT, _keys('status', 'rows_parsed', 'rows_written', 'rows_per_second', 'diff', 'error', 'job_id')),
+    'store_idempotency_key': Query(
+        "UPDATE IdempotencyKeys SET SaleID = ?, Response = ? WHERE UserID = ? AND IdempotencyKey = ?",
+        ROWCOUNT, _keys('sale_id', 'response', 'user_id', 'idempotency_key')),
+    # A catalog upsert reprices sales already made: revenue and the rollup follow the new prices
+    'remove_products_revenue': _products_revenue('-'),
+    'add_products_revenue': _products_revenue('+'),
+    'reprice_products_rollup': Query(shape=ROWCOUNT, build=_product_ids(
+        """
+        UPDATE SalesMonthlyRollup r
+        JOIN Products p ON p.ProductID = r.ProductID
+        SET r.Revenue = r.Quantity * p.SellingPrice, r.FactoryCost = r.Quantity * p.FactoryPrice
+        WHERE r.CompanyID = ? AND r.ProductID IN ({ids})
+        """)),
+    'update_ticket_messages': Query(
+        """
+        UPDATE SupportTickets
+        SET
+            Messages = JSON_ARRAY_APPEND(
+                IFNULL(Messages, JSON_ARRAY()), '$', JSON_OBJECT('Username', ?, 'MessageText', ?)
+            ),
+            UpdatedAt = CURRENT_TIMESTAMP,
+            Status = ?
+        WHERE TicketID = ?
+        """,
+        ROWCOUNT, _update_ticket_messages, post=lambda rowcount: rowcount >= 0),
+    'update_ticket_status': Query(
+        """
+        UPDATE SupportTickets
+        SET Status = ?, UpdatedAt = CURRENT_TIMESTAMP
+        WHERE TicketID = ?
+        """,
+        ROWCOUNT, _keys('status', 'ticket_id'), post=lambda rowcount: rowcount >= 0),
+    'update_seller_commission': Query(
+        "UPDATE Users SET CommissionPercentage = ? WHERE UserID = ?",
+        ROWCOUNT, _keys('new_commission', 'seller_id')),
+    'update_client_payment_info': Query(
+        "UPDATE Clients SET EncryptedIBAN = ? WHERE ClientID = ?",
+        ROWCOUNT, _keys('encrypted_iban', 'client_id'), post=_done),
+
+    # --- DELETE QUERIES ---
+    # Deleting sales, or the products/users they join through, first takes them out of revenue and the rollup
+    'delete_sales_by_comp_id': Query(
+        script=_cleaning_up('delete_company_sales', 'remove_company_sales_revenue', 'delete_company_rollup')),
+    'delete_company_sales': Query(
+        """
+        DELETE FROM Sales
+        WHERE UserID IN (
+            SELECT UserID FROM Users WHERE CompanyID = ?
+        )
+        """,
+        ROWCOUNT, _arg, post=_done),
+    'remove_company_sales_revenue': _revenue_removal('u.CompanyID'),
+    'delete_products_by_comp_id': Query(
+        script=_cleaning_up('delete_company_products', 'remove_company_products_revenue', 'delete_company_products_rollup')),
+    'delete_company_products': Query(
+        "DELETE FROM Products WHERE CompanyID = ?",
+        ROWCOUNT, _arg, post=_done),
+    'remove_company_products_revenue': _revenue_removal('p.CompanyID'),
+    # Products that were sold stay: deleting them would null the ProductID of their sales
+    'delete_unsold_products': Query(shape=ROWCOUNT, build=_product_ids(
+        """
+        DELETE FROM Products
+        WHERE CompanyID = ? AND ProductID IN ({ids})
+        AND NOT EXISTS (SELECT 1 FROM Sales s WHERE s.ProductID = Products.ProductID)
+        """)),
+    'delete_expired_idempotency_keys': Query(
+        "DELETE FROM IdempotencyKeys WHERE CreatedAt < NOW() - INTERVAL ? HOUR LIMIT ?",
+        ROWCOUNT, _keys('ttl_hours', 'batch')),
+    'delete_users_by_comp_id': Query(
+        "DELETE FROM Users WHERE CompanyID = ?",
+        ROWCOUNT, _arg, post=_done),
+    'delete_user_by_id': Query(
+        script=_cleaning_up('delete_user', 'remove_user_sales_revenue', 'delete_user_rollup')),
+    'delete_user': Query(
+        "DELETE FROM Users WHERE UserID = ?",
+        ROWCOUNT, _arg, post=_affected),
+    'remove_user_sales_revenue': _revenue_removal('u.UserID'),
+    'delete_company_rollup': Query(
+        "DELETE FROM SalesMonthlyRollup WHERE CompanyID = ?",
+        ROWCOUNT, _arg),
+    # Revenue of a company's products per selling company; locks their rollup rows until they are deleted
+    'lock_company_products_rollup': Query(
+        """
+        SELECT r.CompanyID, SUM(r.Revenue) AS Revenue
+        FROM SalesMonthlyRollup r
+        JOIN Products p ON p.ProductID = r.ProductID
+        WHERE p.CompanyID = ?
+        GROUP BY r.CompanyID
+        ORDER BY r.CompanyID
+        FOR UPDATE
+        """,
+        ALL, _arg),
+    'delete_company_products_rollup': Query(
+        """
+        DELETE r FROM SalesMonthlyRollup r
+        JOIN Products p ON p.ProductID = r.ProductID
+        WHERE p.CompanyID = ?
+        """,
+        ROWCOUNT, _arg),
+    'delete_user_rollup': Query(
+        "DELETE FROM SalesMonthlyRollup WHERE UserID = ?",
+        ROWCOUNT, _arg),
+    'delete_company_by_id': Query(
+        "DELETE FROM Companies WHERE CompanyID = ?",
+        ROWCOUNT, _arg, post=_affected),
+    'delete_client_by_id': Query(
+        "DELETE FROM Clients WHERE ClientID = ?",
+        ROWCOUNT, _arg, post=_affected),
+}
@@ -14,6 +14,12 @@ cursor = db.cursor()
 def drop_all_tables():
     # A ordem é CRÍTICA devido às Foreign Keys
     tables = [
+        'ImportJobs',
+        'IdempotencyKeys',
+        'SalesMonthlyRollup',
+        'SchemaMigrations', # sem isto o create_db não voltaria a aplicar as migrations
+        'PaymentHistory',
+        'ScheduledPayments',
         'AuditLogs',      # <-- NOVO
         'Payments',       # <-- NOVO
         'Sales', 
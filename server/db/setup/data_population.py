@@ -124,6 +124,8 @@ def insert_sales():
     print("Inserting Sales...")
     tuples = [(s["UserID"], s["ClientID"], s["ProductID"], s['Quantity'], s["SaleDate"]) for s in fake_sales]
     cursor.executemany("INSERT INTO Sales (UserID, ClientID, ProductID, Quantity, SaleDate) VALUES (%s, %s, %s, %s, %s)", tuples)
+    # CompanyID das vendas = empresa do cliente (índice das listagens por empresa)
+    cursor.execute("UPDATE Sales S JOIN Clients C ON C.ClientID = S.ClientID SET S.CompanyID = C.CompanyID")
     db.commit()
 
 def insert_tickets():
@@ -132,6 +134,36 @@ def insert_tickets():
     cursor.executemany("INSERT INTO SupportTickets (UserID, Status, Category, Description, Messages, CreatedAt, UpdatedAt) VALUES (%s, %s, %s, %s, %s, %s, %s)", tuples)
     db.commit()
 
+def sync_revenue():
+    # As vendas inseridas acima não passam por create_sale, que mantém a receita
+    print("Syncing company revenue...")
+    cursor.execute("""
+    UPDATE Companies c
+    SET Revenue = (
+        SELECT COALESCE(SUM(s.Quantity * p.SellingPrice), 0)
+        FROM Sales s
+        JOIN Products p ON s.ProductID = p.ProductID
+        JOIN Users u ON s.UserID = u.UserID
+        WHERE u.CompanyID = c.CompanyID
+    )
+    """)
+    db.commit()
+
+def build_sales_rollup():
+    print("Building monthly sales rollup...")
+    cursor.execute("DELETE FROM SalesMonthlyRollup")
+    cursor.execute("""
+    INSERT INTO SalesMonthlyRollup
+        (CompanyID, SalesYear, SalesMonth, UserID, ProductID, SalesCount, Quantity, Revenue, FactoryCost)
+    SELECT u.CompanyID, YEAR(s.SaleDate), MONTH(s.SaleDate), s.UserID, s.ProductID,
+           COUNT(*), SUM(s.Quantity), SUM(s.Quantity * p.SellingPrice), SUM(s.Quantity * p.FactoryPrice)
+    FROM Sales s
+    JOIN Users u ON s.UserID = u.UserID
+    JOIN Products p ON s.ProductID = p.ProductID
+    GROUP BY u.CompanyID, YEAR(s.SaleDate), MONTH(s.SaleDate), s.UserID, s.ProductID
+    """)
+    db.commit()
+
 # Ordem de execução
 insert_users()
 insert_companies()
@@ -139,6 +171,8 @@ insert_clients()
 insert_products()
 insert_sales()
 insert_tickets()
+sync_revenue()
+build_sales_rollup()
 
 cursor.close()
 db.close()
@@ -0,0 +1,27 @@
+import os
+from datetime import datetime
+from .batch_writer import BatchWriter
+
+ACTIVITY_BATCH_SIZE = int(os.getenv('ACTIVITY_BATCH_SIZE', '200'))
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_FLUSH_INTERVAL', '1.0'))
+
+
+class ActivityService(BatchWriter):
+    ''' Defers the LastLogin/isActive update of a login and writes them in batches '''
+
+    def __init__(self):
+        super().__init__('record_user_login', ACTIVITY_BATCH_SIZE, ACTIVITY_FLUSH_INTERVAL)
+
+    def record_login(self, user_id: int, token_version: int):
+        '''
+        Queue the activity update of a successful login. It only applies while
+        the user's TokenVersion is the one read at login: a logout in between
+        bumps it, so a stale login never reactivates the user.
+        '''
+        self.put({
+            'user_id': user_id,
+            'login_at': datetime.now().replace(microsecond=0),
+            'token_version': token_version
+        })
+
+activity_service = ActivityService()
@@ -0,0 +1,45 @@
+import os
+from .batch_writer import BatchWriter
+
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', '200'))
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', '1.0'))
+AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', '10000'))
+AUDIT_BACKPRESSURE = os.getenv('AUDIT_BACKPRESSURE', 'spill')
+AUDIT_SPILL_PATH = os.getenv(
+    'AUDIT_SPILL_PATH',
+    os.path.join(os.path.dirname(__file__), 'files', 'audit_spill.jsonl')
+)
+
+# Only these headers are kept; credentials and cookies never reach the log
+AUDITED_HEADERS = ('User-Agent', 'Content-Type', 'Content-Length', 'Origin', 'Referer', 'X-Forwarded-For')
+
+
+class AuditService(BatchWriter):
+    ''' Writes AuditLogs rows in background batches so responses never wait on the INSERT '''
+
+    def __init__(self):
+        os.makedirs(os.path.dirname(AUDIT_SPILL_PATH), exist_ok=True)
+        super().__init__(
+            'create_audit_log',
+            batch_size=AUDIT_BATCH_SIZE,
+            flush_interval=AUDIT_FLUSH_INTERVAL,
+            max_queue=AUDIT_QUEUE_SIZE,
+            backpressure=AUDIT_BACKPRESSURE,
+            spill_path=AUDIT_SPILL_PATH
+        )
+
+    def record(self, user_id, request, status: int, body: str, comp_id=None):
+        ''' Queue the audit row of a handled request '''
+        headers = {name: request.headers[name] for name in AUDITED_HEADERS if name in request.headers}
+        self.put({
+            'user_id': user_id,
+            'comp_id': comp_id,
+            'endpoint': request.path,
+            'method': request.method,
+            'ip': request.remote_addr,
+            'headers': str(headers),
+            'body': body,
+            'status': status
+        })
+
+audit_service = AuditService()
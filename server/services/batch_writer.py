@@ -0,0 +1,146 @@
+import os
+import json
+import atexit
+import queue
+import threading
+import time
+from db.db_connector import DBConnector
+
+# What put() does when the queue is full
+BLOCK = 'block'   # wait for room
+DROP = 'drop'     # discard the row and count it
+SPILL = 'spill'   # append the row to a spill file, replayed by the writer thread
+
+
+class BatchWriter:
+    ''' Background thread that writes queued rows for a named query in executemany batches '''
+
+    def __init__(self, query: str, batch_size: int = 100, flush_interval: float = 1.0, max_queue: int = 10000,
+                 backpressure: str = BLOCK, spill_path: str = None):
+        if backpressure not in (BLOCK, DROP, SPILL):
+            raise ValueError(f'Unknown backpressure policy: {backpressure}')
+        if backpressure == SPILL and not spill_path:
+            raise ValueError('The spill policy needs a spill_path')
+        self.query = query
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.backpressure = backpressure
+        self.spill_path = spill_path
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {'queued': 0, 'written': 0, 'batches': 0, 'errors': 0, 'dropped': 0, 'spilled': 0}
+        atexit.register(self.close)
+
+    def put(self, row: dict):
+        ''' Queue a row for the next batch, applying the backpressure policy when full '''
+        self._start()
+        if self.backpressure == BLOCK:
+            self._queue.put(row)
+        else:
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                if self.backpressure == DROP:
+                    self.stats['dropped'] += 1
+                else:
+                    self._spill([row])
+                return
+        self.stats['queued'] += 1
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=f'batch-writer-{self.query}', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            rows = self._collect()
+            if rows:
+                self._write(rows)
+            elif self.spill_path:
+                self._replay_spill()
+
+    def _collect(self) -> list:
+        ''' Block for the first row, then gather more until the batch is full or the interval ends '''
+        try:
+            rows = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(rows) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                rows.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return rows
+
+    def _write(self, rows: list) -> bool:
+        try:
+            with DBConnector().transaction() as tx:
+                tx.execute_many(self.query, rows)
+            self.stats['written'] += len(rows)
+            self.stats['batches'] += 1
+            return True
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"[BATCH WRITER] Failed to write {len(rows)} rows for {self.query}: {e}")
+            if self.spill_path:
+                # Keep the rows on disk until the database is back
+                self._spill(rows)
+            return False
+
+    def _spill(self, rows: list):
+        with self._spill_lock:
+            with open(self.spill_path, 'a', encoding='utf-8') as spill:
+                for row in rows:
+                    spill.write(json.dumps(row, default=str) + '\n')
+                spill.flush()
+                os.fsync(spill.fileno())
+        self.stats['spilled'] += len(rows)
+
+    def _replay_spill(self):
+        ''' Move spilled rows back into the database once the queue is idle '''
+        replaying = f'{self.spill_path}.replay'
+        with self._spill_lock:
+            if not os.path.exists(replaying):
+                if not os.path.exists(self.spill_path) or os.path.getsize(self.spill_path) == 0:
+                    return
+                os.replace(self.spill_path, replaying)
+        with open(replaying, encoding='utf-8') as spill:
+            rows = [json.loads(line) for line in spill if line.strip()]
+        # Failed batches are spilled again by _write, so the replay file can go
+        for start in range(0, len(rows), self.batch_size):
+            self._write(rows[start:start + self.batch_size])
+        os.remove(replaying)
+
+    def flush(self):
+        ''' Write everything still queued from the calling thread '''
+        rows = []
+        while True:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(rows) == self.batch_size:
+                self._write(rows)
+                rows = []
+        if rows:
+            self._write(rows)
+
+    def close(self):
+        ''' Stop the background thread and flush the remaining rows '''
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+
+    def depth(self) -> int:
+        return self._queue.qsize()
@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import hashlib
+from datetime import datetime
+from db.db_connector import DBConnector
+from api.utils.cache import TTLCache
+
+# Sales per multi-row INSERT, and the most one request may carry
+SALES_BULK_CHUNK = int(os.getenv('SALES_BULK_CHUNK', '1000'))
+SALES_BULK_MAX = int(os.getenv('SALES_BULK_MAX', '50000'))
+OWNERSHIP_CACHE_TTL = float(os.getenv('OWNERSHIP_CACHE_TTL', '60'))
+# How long an ID confirmed missing is rejected without asking the database again
+OWNERSHIP_REFRESH_INTERVAL = float(os.getenv('OWNERSHIP_REFRESH_INTERVAL', '5'))
+
+
+class CompanyOwnership:
+    '''
+    Cached sets of the client, product and user IDs that belong to each
+    company. An ID missing from the set is looked up by primary key, so one
+    created since the set was loaded (by any worker) is accepted at once;
+    IDs that are really unknown are remembered for OWNERSHIP_REFRESH_INTERVAL.
+    '''
+
+    QUERIES = {
+        'client': ('get_company_client_ids', 'company_owns_client'),
+        'product': ('get_company_product_ids', 'company_owns_product'),
+        'user': ('get_company_user_ids', 'company_owns_user'),
+    }
+
+    def __init__(self):
+        self._cache = TTLCache(maxsize=3000, ttl=OWNERSHIP_CACHE_TTL)
+
+    def owns(self, comp_id: int, kind: str, item_id: int) -> bool:
+        entry = self._cache.get((kind, comp_id))
+        if entry is None:
+            entry = self._load(comp_id, kind)
+        if item_id in entry['ids']:
+            return True
+        missed_at = entry['missing'].get(item_id)
+        if missed_at is not None and time.monotonic() - missed_at < OWNERSHIP_REFRESH_INTERVAL:
+            return False
+        found = DBConnector().execute_query(self.QUERIES[kind][1], {'id': item_id, 'comp_id': comp_id})
+        if found:
+            entry['ids'].add(item_id)
+            entry['missing'].pop(item_id, None)
+            return True
+        if found is not None:
+            entry['missing'][item_id] = time.monotonic()
+        return False
+
+    def invalidate(self, comp_id: int, kind: str = None):
+        ''' Drop the cached sets of a company after its clients, users or catalog changed '''
+        for cached_kind in ([kind] if kind else self.QUERIES):
+            self._cache.pop((cached_kind, comp_id))
+
+    def _load(self, comp_id: int, kind: str) -> dict:
+        ids = DBConnector().execute_query(self.QUERIES[kind][0], comp_id)
+        entry = {'ids': set(ids or ()), 'missing': {}}
+        if ids is not None:
+            self._cache.set((kind, comp_id), entry)
+        return entry
+
+
+class SalesIngest:
+    '''
+    Records a batch of sales for one company. Rows are checked against the
+    cached ownership sets; the valid ones are inserted in chunks of
+    SALES_BULK_CHUNK inside one transaction (create_sales_bulk).
+    '''
+
+    def __init__(self, ownership: CompanyOwnership):
+        self.ownership = ownership
+
+    def validate(self, comp_id: int, user_id: int, is_admin: bool, row):
+        ''' (sale args, None) for a valid row, (None, error message) otherwise '''
+        if not isinstance(row, dict):
+            return None, 'Sale must be an object'
+        try:
+            sale = {
+                'user_id': int(row.get('user_id') or user_id),
+                'client_id': int(row['client_id']),
+                'product_id': int(row['product_id']),
+                'quantity': int(row['quantity']),
+                'sale_date': datetime.fromisoformat(row['sale_date']) if row.get('sale_date') else None
+            }
+        except KeyError as e:
+            return None, f'Missing {e}'
+        except (TypeError, ValueError) as e:
+            return None, f'Invalid value: {e}'
+        if sale['quantity'] < 1:
+            return None, 'quantity must be positive'
+        if sale['user_id'] != user_id and not is_admin:
+            return None, 'Only admins may record sales for other users'
+        for kind in ('user', 'client', 'product'):
+            if not self.ownership.owns(comp_id, kind, sale[f'{kind}_id']):
+                return None, f'Unknown {kind}_id {sale[kind + "_id"]}'
+        return sale, None
+
+    def ingest(self, comp_id: int, user_id: int, is_admin: bool, rows, idempotency_key: str = None) -> dict:
+        '''
+        {'results': per-row results in input order, 'replayed': bool}, or
+        {'conflict': True} when the idempotency key was used for another
+        request. A result is {'index', 'status': 'Ok', 'sale_id'} or
+        {'index', 'status': 'Error', 'error'}.
+        '''
+        results, valid = [], []
+        request_hash = hashlib.sha256()
+        for index, row in enumerate(rows):
+            if index >= SALES_BULK_MAX:
+                raise ValueError(f'At most {SALES_BULK_MAX} sales per request')
+            request_hash.update(json.dumps(row, sort_keys=True, default=str).encode() + b'\n')
+            if isinstance(row, Exception):
+                results.append({'index': index, 'status': 'Error', 'error': str(row)})
+                continue
+            sale, error = self.validate(comp_id, user_id, is_admin, row)
+            if error:
+                results.append({'index': index, 'status': 'Error', 'error': error})
+                continue
+            result = {'index': index, 'status': 'Ok', 'sale_id': None}
+            results.append(result)
+            valid.append((result, sale))
+        if not valid:
+            return {'results': results, 'replayed': False}
+
+        args = {'comp_id': comp_id, 'results': results, 'sales': valid, 'chunk': SALES_BULK_CHUNK}
+        # The session runs the script directly so thousands of rows are not logged as query args
+        with DBConnector().transaction() as tx:
+            if idempotency_key is None:
+                return {'results': tx.execute('create_sales_bulk', args), 'replayed': False}
+            outcome = tx.execute('create_sales_bulk_once', dict(
+                args, user_id=user_id, idempotency_key=idempotency_key, request_hash=request_hash.hexdigest()
+            ))
+        if outcome.get('conflict'):
+            return outcome
+        return {'results': outcome['result'], 'replayed': outcome['replayed']}
+
+company_ownership = CompanyOwnership()
+sales_ingest = SalesIngest(company_ownership)
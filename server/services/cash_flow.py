@@ -0,0 +1,86 @@
+import calendar
+from datetime import date
+from db.db_connector import DBConnector
+from services.vat_provider import vat_provider
+
+
+def next_month(day: date) -> date:
+    ''' First day of the month after `day` '''
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+def month_starts(start: date, end: date) -> list:
+    ''' First day of every month from start to end, both inclusive '''
+    months = []
+    current = date(start.year, start.month, 1)
+    while current <= end:
+        months.append(current)
+        current = next_month(current)
+    return months
+
+
+class CashFlow:
+    '''
+    Cash flow of a company for every month between two months (inclusive).
+    Revenue, production costs and commissions of the whole range come from a
+    single grouped query; nothing is written while computing it.
+    '''
+
+    def __init__(self, company_id: int, country_code: str, start: date, end: date):
+        self.company_id: int = company_id
+        self.country_code: str = country_code
+        self.months: list = []
+        self.profit: float = 0.0
+
+        self.start(month_starts(start, end))
+
+    def start(self, months: list):
+        ''' Build the per-month figures '''
+        if not months:
+            return
+        rows = DBConnector().execute_query('get_cash_flow_months', args={
+            'comp_id': self.company_id,
+            'start': months[0],
+            'end': next_month(months[-1])
+        }) or []
+        vat_rates = vat_provider.rates((self.country_code, month) for month in months)
+
+        by_month = {month: [] for month in months}
+        for row in rows:
+            by_month[date(row['Year'], row['Month'], 1)].append(row)
+
+        for month in months:
+            self.months.append(self.calculate(month, by_month[month], vat_rates[(self.country_code, month)] or 0))
+        self.profit = round(sum(month['profit'] for month in self.months), 2)
+
+    def calculate(self, month: date, rows: list, vat: int) -> dict:
+        ''' Figures of one month from its per-employee rows '''
+        employees = []
+        for row in rows:
+            sales_amount = float(row['TotalSalesAmount'] or 0)
+            employees.append({
+                'UserID': row['UserID'],
+                'Username': row['Username'],
+                'CommissionPercentage': float(row['CommissionPercentage'] or 0),
+                'TotalSales': row['TotalSales'],
+                'TotalSalesAmount': round(sales_amount, 2),
+                'TotalCommission': round(sales_amount * float(row['CommissionPercentage'] or 0) / 100, 2)
+            })
+        month_revenue = sum(float(row['TotalSalesAmount'] or 0) for row in rows)
+        prod_costs = sum(float(row['TotalFactoryPrice'] or 0) for row in rows)
+        total_payment = sum(employee['TotalCommission'] for employee in employees)
+        vat_value = month_revenue * vat * 0.01
+        return {
+            'year': month.year,
+            'month': month.month,
+            'name': calendar.month_name[month.month],
+            'country_code': self.country_code,
+            'vat': vat,
+            'vat_value': round(vat_value, 2),
+            'month_revenue': round(month_revenue, 2),
+            'month_prod_costs': round(prod_costs, 2),
+            'prod_costs': round(prod_costs, 2),
+            'total_payment': round(total_payment, 2),
+            'totalEmployeesPayment': round(total_payment, 2),
+            'employees': employees,
+            'profit': round(month_revenue - vat_value - total_payment - prod_costs, 2)
+        }
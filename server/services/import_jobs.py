@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import atexit
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from db.db_connector import DBConnector
+from services.process_file import ProcessFile
+
+IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS', '2'))
+# Seconds between progress writes of a running job
+IMPORT_PROGRESS_INTERVAL = float(os.getenv('IMPORT_PROGRESS_INTERVAL', '1.0'))
+# A running job without progress for this long most likely died with its API worker
+IMPORT_JOB_STALE_SECONDS = int(os.getenv('IMPORT_JOB_STALE_SECONDS', '300'))
+
+
+class ImportJobs:
+    '''
+    Runs catalog imports on a worker pool so the upload request returns at once.
+    Job state lives in the ImportJobs table, so any API worker can report it.
+    '''
+
+    def __init__(self, workers: int = IMPORT_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def submit(self, file_path: str, content_hash: str, file_name: str, comp_id: int, user_id: int, mode: str):
+        '''
+        Record a queued job and hand it to the pool. Returns (JobID, queued);
+        a file identical to the company's last successful import is not
+        imported again and the JobID of that import comes back with queued
+        False. JobID is None if the job could not be recorded.
+        '''
+        dbc = DBConnector()
+        last = dbc.execute_query('get_last_import', comp_id)
+        if last and last['ContentHash'] == content_hash:
+            return last['JobID'], False
+        job_id = dbc.execute_query('create_import_job', args={
+            'comp_id': comp_id,
+            'user_id': user_id,
+            'file_name': file_name,
+            'file_path': file_path,
+            'content_hash': content_hash,
+            'mode': mode
+        })
+        if not isinstance(job_id, int):
+            return None, False
+        self._pool().submit(self.run, job_id, file_path, comp_id, mode)
+        return job_id, True
+
+    def run(self, job_id: int, file_path: str, comp_id: int, mode: str):
+        ''' Import the file, writing progress at most every IMPORT_PROGRESS_INTERVAL seconds '''
+        dbc = DBConnector()
+        dbc.execute_query('start_import_job', job_id)
+        last_report = time.monotonic()
+
+        def progress(rows_parsed, rows_written):
+            nonlocal last_report
+            if time.monotonic() - last_report < IMPORT_PROGRESS_INTERVAL:
+                return
+            last_report = time.monotonic()
+            dbc.execute_query('update_import_job_progress', args={
+                'rows_parsed': rows_parsed, 'rows_written': rows_written, 'job_id': job_id
+            })
+
+        try:
+            pf = ProcessFile(file_path, comp_id, mode, progress=progress)
+            result = {
+                'status': 'done' if pf.is_updated else 'failed',
+                'rows_parsed': pf.rows_parsed,
+                # A failed import is rolled back, nothing it wrote remains
+                'rows_written': pf.rows if pf.is_updated else 0,
+                'rows_per_second': pf.rows_per_second if pf.is_updated else None,
+                'diff': json.dumps(pf.diff) if pf.diff else None,
+                'error': pf.error
+            }
+        except Exception as e:
+            print(f"[IMPORT JOBS] Job {job_id} crashed: {e}")
+            result = {
+                'status': 'failed', 'rows_parsed': 0, 'rows_written': 0, 'rows_per_second': None, 'diff': None, 'error': str(e)
+            }
+        dbc.execute_query('finish_import_job', args=dict(result, job_id=job_id))
+
+    def status(self, job_id: int):
+        ''' Job row as returned by /jobs/<id>, None if there is no such job '''
+        job = DBConnector().execute_query('get_import_job', job_id)
+        if not job:
+            return None
+        job = dict(job)
+        if job['RowsPerSecond'] is not None:
+            job['RowsPerSecond'] = float(job['RowsPerSecond'])
+        if isinstance(job['Diff'], str):
+            job['Diff'] = json.loads(job['Diff'])
+        job['Stale'] = (
+            job['Status'] == 'running'
+            and (datetime.now() - job['UpdatedAt']).total_seconds() > IMPORT_JOB_STALE_SECONDS
+        )
+        return job
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='import-job')
+        return self._executor
+
+    def close(self):
+        ''' Let running imports finish on shutdown '''
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+import_jobs = ImportJobs()
@@ -1,47 +1,235 @@
 import os
+import time
+import hashlib
+import tempfile
+from itertools import islice
 import pandas as pd
+from openpyxl import load_workbook
 from db.db_connector import DBConnector
 
+FILES_DIR = os.path.join(os.path.dirname(__file__), 'files')
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+# Rows parsed, validated and inserted per batch; memory stays bounded by this, not by the file
+IMPORT_CHUNK_ROWS = int(os.getenv('IMPORT_CHUNK_ROWS', '10000'))
+REQUIRED_COLUMNS = ('ProductID', 'ProductName', 'FactoryPrice', 'SellingPrice')
+# Invalid rows listed in the error message
+MAX_REPORTED_ROWS = 5
+# upsert: apply only the differences with the current catalog; replace: delete it and insert the file
+IMPORT_MODES = ('upsert', 'replace')
+
+
+class CatalogImportError(ValueError):
+    ''' Raised when an uploaded catalog has missing columns or rows that cannot be imported '''
+
+
+def csv_chunks(file_path: str, chunk_rows: int = IMPORT_CHUNK_ROWS):
+    ''' DataFrames of at most chunk_rows rows; numbers are parsed by the C reader, names kept as text '''
+    with pd.read_csv(file_path, chunksize=chunk_rows, dtype={'ProductName': str}, skipinitialspace=True) as reader:
+        yield from reader
+
+def xlsx_chunks(file_path: str, chunk_rows: int = IMPORT_CHUNK_ROWS):
+    ''' DataFrames of at most chunk_rows rows of the first sheet, read in read-only row mode '''
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = ['' if cell is None else str(cell).strip() for cell in next(rows, ())]
+        start = 0
+        while True:
+            batch = list(islice(rows, chunk_rows))
+            if not batch:
+                break
+            yield pd.DataFrame.from_records(batch, columns=header, index=range(start, start + len(batch)))
+            start += len(batch)
+    finally:
+        workbook.close()
+
+def product_rows(df: pd.DataFrame, comp_id: int) -> list:
+    '''
+    insert_product rows (ProductID, CompanyID, ProductName, FactoryPrice,
+    SellingPrice, CreatedAt) of one chunk. Types are coerced column by column and
+    the chunk is rejected as a whole if any row is invalid, since the import
+    replaces the catalog in one transaction.
+    '''
+    df = df.dropna(how='all')
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise CatalogImportError(f"Missing columns: {', '.join(missing)}")
+    product_id = pd.to_numeric(df['ProductID'], errors='coerce')
+    name = df['ProductName'].astype('string').str.strip()
+    factory_price = pd.to_numeric(df['FactoryPrice'], errors='coerce').round(2)
+    selling_price = pd.to_numeric(df['SellingPrice'], errors='coerce').round(2)
+    if 'CreatedAt' in df.columns:
+        created_at = pd.to_datetime(df['CreatedAt'], format='ISO8601', errors='coerce')
+        bad_date = created_at.isna() & df['CreatedAt'].notna()
+        created_at = created_at.fillna(pd.Timestamp.now().floor('s'))
+    else:
+        created_at = pd.Series(pd.Timestamp.now().floor('s'), index=df.index)
+        bad_date = pd.Series(False, index=df.index)
+
+    invalid = (
+        product_id.isna() | (product_id % 1 != 0) | (product_id < 1)
+        | name.isna() | (name == '')
+        | factory_price.isna() | (factory_price < 0)
+        | selling_price.isna() | (selling_price < 0)
+        | bad_date
+    ).fillna(True)
+    if invalid.any():
+        # +2: the header is line 1 and the index starts at 0
+        lines = ', '.join(str(line + 2) for line in invalid[invalid].index[:MAX_REPORTED_ROWS])
+        raise CatalogImportError(f'{int(invalid.sum())} invalid rows, first at lines {lines}')
+
+    # Column lists convert to Python values in bulk; zipping them is far cheaper than to_dict('records')
+    return list(zip(
+        product_id.astype('int64').tolist(),
+        [comp_id] * len(df),
+        name.astype(object).tolist(),
+        factory_price.tolist(),
+        selling_price.tolist(),
+        created_at.dt.strftime('%Y-%m-%d %H:%M:%S').tolist()
+    ))
+
+def save_upload(file, comp_id) -> tuple:
+    '''
+    Save an uploaded file as files/<comp_id>/<sha256>.<ext> and return
+    (path, sha256). The hash is computed while the upload streams to disk,
+    so identical uploads share one file and cost no extra read.
+    '''
+    comp_folder = os.path.join(FILES_DIR, str(comp_id))
+    os.makedirs(comp_folder, exist_ok=True)
+    extension = '.xlsx' if file.filename.lower().endswith('.xlsx') else '.csv'
+    sha256 = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(dir=comp_folder, suffix='.upload')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            for block in iter(lambda: file.stream.read(UPLOAD_BLOCK_SIZE), b''):
+                sha256.update(block)
+                temp_file.write(block)
+        content_hash = sha256.hexdigest()
+        file_path = os.path.join(comp_folder, content_hash + extension)
+        os.replace(temp_path, file_path)
+        return file_path, content_hash
+    except Exception as error:
+        print(error)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def product_digest(name, factory_price, selling_price) -> bytes:
+    ''' Fingerprint of the imported fields of a product, equal for a file row and its stored copy '''
+    return hashlib.blake2b(f'{name}\x1f{factory_price:.2f}\x1f{selling_price:.2f}'.encode(), digest_size=8).digest()
+
+
 class ProcessFile:
     ''' Calss to process uploaded file '''
 
-    def __init__(self, file, comp_id):
+    def __init__(self, file_path, comp_id, mode: str = 'upsert', progress=None):
         self.comp_id = comp_id
-        self.file = file
-        self.dir = os.path.join(os.path.dirname(__file__), 'files')
+        self.mode = mode
+        self.file_path = file_path
+        self.progress = progress
         self.status = False
-        self.file_path = self.save_file()
+        self.is_updated = False
+        self.error = None
+        self.rows = 0
+        self.rows_parsed = 0
+        self.rows_written = 0
+        self.rows_per_second = 0.0
+        self.diff = None
         self.update_products_from_file(self.file_path)
 
-    def save_file(self) -> str:
-        ''' save file in system '''
-        filename = self.file.filename
-        comp_folder = os.path.join(self.dir, str(self.comp_id))
-        os.makedirs(comp_folder, exist_ok=True)
-        print(comp_folder)
-
-        # Save the file
-        file_path = os.path.join(comp_folder, filename)
-        try:
-            self.file.save(file_path)
-            return file_path
-        except Exception as error:
-            print(error)
-            raise
+    def chunks(self, file_path):
+        ''' insert_product rows of the file, one list per chunk '''
+        reader = xlsx_chunks if file_path.endswith('.xlsx') else csv_chunks
+        for df in reader(file_path):
+            rows = product_rows(df, self.comp_id)
+            self.rows_parsed += len(df)
+            if rows:
+                yield rows
+                # The writer only asks for the next chunk once this one is written
+                self.rows_written += len(rows)
+            if self.progress:
+                self.progress(self.rows_parsed, self.rows_written)
 
     def update_products_from_file(self, file_path):
-        ''' upload database according to the escell data '''
-        # Load the Excel or CSV file into a DataFrame
-        if file_path.endswith('.xlsx'):
-            df = pd.read_excel(file_path)
-        else:
-            df = pd.read_csv(file_path)
-
-        # Establish a connection with the database (assuming mariadb)
+        ''' Import the file rows into the company catalog, parsed and written chunk by chunk in one transaction '''
+        started = time.perf_counter()
         dbc = DBConnector()
-        results = dbc.execute_query(query='update_products_by_comp_id', args={'file':df, 'comp_id':self.comp_id})
-        if results is True:
+        try:
+            if self.mode == 'replace':
+                results = dbc.execute_query(query='update_products_by_comp_id', args={
+                    'chunks': self.chunks(file_path), 'comp_id': self.comp_id
+                })
+            else:
+                with dbc.transaction() as tx:
+                    self.diff = self.upsert_products(tx, self.chunks(file_path))
+                results = self.diff['rows']
+        except Exception as e:
+            # The transaction is rolled back; the previous catalog is untouched
+            self.error = str(e)
+            print(f"Products import failed: {e}")
+            return
+        if isinstance(results, int):
+            elapsed = time.perf_counter() - started
+            # Imported here: the caches depend on the api package, which imports this module
+            from services.product_catalog import product_catalog
+            from services.bulk_sales import company_ownership
+            product_catalog.bump(self.comp_id)
+            company_ownership.invalidate(self.comp_id, 'product')
             self.is_updated = True
-            print("Products updated successfully.")
-        else:
-            self.is_updated = False
+            self.rows = results
+            self.rows_per_second = round(results / elapsed, 1) if elapsed > 0 else 0.0
+            print(f"Products updated successfully: {results} rows in {elapsed:.2f} s ({self.rows_per_second:,.0f} rows/s)")
+
+    def upsert_products(self, tx, chunks) -> dict:
+        '''
+        Write only the products that differ from the current catalog. Rows are
+        matched on ProductID and compared by digest; new and changed rows go
+        through one INSERT ... ON DUPLICATE KEY UPDATE batch per chunk, and
+        products missing from the file are deleted unless they were sold.
+        Revenue and the rollup are repriced last, so the company row is only
+        locked for that final step and not for the whole import.
+        '''
+        current = {
+            row['ProductID']: product_digest(row['ProductName'], row['FactoryPrice'], row['SellingPrice'])
+            for row in tx.execute('get_product_catalog', self.comp_id)
+        }
+        diff = {'rows': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0, 'kept_sold': 0}
+        changed_ids = []
+        for rows in chunks:
+            new, changed = [], []
+            for row in rows:
+                stored = current.pop(row[0], None)
+                if stored is None:
+                    new.append(row)
+                elif stored != product_digest(row[2], row[3], row[4]):
+                    changed.append(row)
+            diff['rows'] += len(rows)
+            diff['unchanged'] += len(rows) - len(new) - len(changed)
+            if new:
+                taken = tx.execute('get_foreign_product_ids', {'comp_id': self.comp_id, 'ids': [row[0] for row in new]})
+                if taken:
+                    raise CatalogImportError(f"ProductIDs used by another company: {', '.join(map(str, taken[:MAX_REPORTED_ROWS]))}")
+            if not new and not changed:
+                continue
+            tx.execute_many('upsert_product', new + changed)
+            changed_ids.extend(row[0] for row in changed)
+            diff['inserted'] += len(new)
+            diff['updated'] += len(changed)
+
+        missing = list(current)
+        for start in range(0, len(missing), IMPORT_CHUNK_ROWS):
+            batch = missing[start:start + IMPORT_CHUNK_ROWS]
+            deleted = tx.execute('delete_unsold_products', {'comp_id': self.comp_id, 'ids': batch})
+            diff['deleted'] += deleted
+            diff['kept_sold'] += len(batch) - deleted
+
+        if changed_ids:
+            # The rollup still holds the old prices until it is repriced: take them
+            # out of revenue, reprice, then add the new values back
+            tx.execute('lock_company_revenue', self.comp_id)
+            for start in range(0, len(changed_ids), IMPORT_CHUNK_ROWS):
+                batch = {'comp_id': self.comp_id, 'ids': changed_ids[start:start + IMPORT_CHUNK_ROWS]}
+                tx.execute('remove_products_revenue', batch)
+                tx.execute('reprice_products_rollup', batch)
+                tx.execute('add_products_revenue', batch)
+        return diff
@@ -1,6 +1,3 @@
-import subprocess
-import pandas as pd
-import os
 from db.db_connector import DBConnector
 
 class ProcessSales:
@@ -20,7 +17,25 @@ class ProcessSales:
     def get_total_revenue(self) -> float:
         ''' Calculate the total revenue of all sales '''
         revenue = 0
-        for sale in self.sales:
-            print(sale)
-            revenue += float(sale['SellingPrice'])
+        for sale in self.sales or []:
+            revenue += float(sale['SellingPrice']) * int(sale['Quantity'])
         return round(revenue, 2)
+
+
+def split_overview(rows: list) -> tuple:
+    '''
+    (sales, sales count, revenue) of get_user_overview rows: the seller's
+    totals ride on every row and a seller without sales gets one row of
+    totals with no sale in it.
+    '''
+    if not rows:
+        return [], 0, 0.0
+    sales_count, revenue = int(rows[0]['SalesCount']), round(float(rows[0]['Revenue']), 2)
+    sales = []
+    for row in rows:
+        if row['SaleID'] is None:
+            continue
+        sale = dict(row)
+        del sale['SalesCount'], sale['Revenue']
+        sales.append(sale)
+    return sales, sales_count, revenue
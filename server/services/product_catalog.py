@@ -0,0 +1,51 @@
+import os
+import json
+import hashlib
+import threading
+from db.db_connector import DBConnector
+from api.utils.cache import TTLCache
+
+PRODUCT_CACHE_SIZE = int(os.getenv('PRODUCT_CACHE_SIZE', '1000'))
+# Bounds how long another process may serve a catalog imported elsewhere
+PRODUCT_CACHE_TTL = float(os.getenv('PRODUCT_CACHE_TTL', '300'))
+
+
+class ProductCatalog:
+    '''
+    In-process LRU cache of each company's product list, kept as the
+    serialized response body with its ETag. Imports bump the company's
+    version; an entry filled under an older version is never served, even
+    when a read raced with the import.
+    '''
+
+    def __init__(self):
+        self._cache = TTLCache(maxsize=PRODUCT_CACHE_SIZE, ttl=PRODUCT_CACHE_TTL)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def version(self, comp_id: int) -> int:
+        return self._versions.get(comp_id, 0)
+
+    def get(self, comp_id: int):
+        ''' (JSON body, ETag) of the company's product list, (None, None) if it could not be read '''
+        version = self.version(comp_id)
+        entry = self._cache.get(comp_id)
+        if entry is not None and entry['version'] == version:
+            return entry['body'], entry['etag']
+        products = DBConnector().execute_query(query='get_products_list', args=comp_id)
+        if not isinstance(products, list):
+            return None, None
+        # default=str renders prices as jsonify does (Decimal as a string)
+        body = json.dumps({'status': 'Ok', 'products': products}, default=str)
+        # Derived from the content, so the tag stays valid across processes and restarts
+        etag = hashlib.sha256(body.encode()).hexdigest()[:32]
+        self._cache.set(comp_id, {'version': version, 'body': body, 'etag': etag})
+        return body, etag
+
+    def bump(self, comp_id: int):
+        ''' The company catalog changed: drop its cached list and any read in flight '''
+        with self._lock:
+            self._versions[comp_id] = self.version(comp_id) + 1
+        self._cache.pop(comp_id)
+
+product_catalog = ProductCatalog()
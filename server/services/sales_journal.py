@@ -0,0 +1,343 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import threading
+from datetime import datetime
+import mariadb
+from db.db_connector import DBConnector
+
+SYNC = 'sync'
+WRITE_BEHIND = 'write_behind'
+SALES_WRITE_MODE = os.getenv('SALES_WRITE_MODE', SYNC)
+SALES_JOURNAL_DIR = os.getenv(
+    'SALES_JOURNAL_DIR',
+    os.path.join(os.path.dirname(__file__), 'files', 'sales_journal')
+)
+# Seconds between group commits, and the most sales a commit waits for before going early
+SALES_FLUSH_INTERVAL = float(os.getenv('SALES_FLUSH_INTERVAL', '0.2'))
+SALES_FLUSH_BATCH = int(os.getenv('SALES_FLUSH_BATCH', '2000'))
+# Past this many unflushed sales, requests are written synchronously instead
+SALES_JOURNAL_MAX_PENDING = int(os.getenv('SALES_JOURNAL_MAX_PENDING', '100000'))
+SALES_FLUSH_CHUNK = int(os.getenv('SALES_FLUSH_CHUNK', '1000'))
+SALES_FLUSH_RETRY = float(os.getenv('SALES_FLUSH_RETRY', '2.0'))
+
+_JOURNAL = 'current.jsonl'
+_SEGMENT = 'segment-{:012d}.jsonl'
+# Acknowledged sales the database refused (e.g. their product was deleted before the flush)
+_DEAD_LETTER = 'dead_letter.jsonl'
+_REF_NAMESPACE = uuid.UUID('6f1c2a4e-9b7d-4c53-8e21-3d5a7b9c0f14')
+# Errors a single statement is rolled back for, leaving the rest of the transaction usable
+_REFUSED = (mariadb.IntegrityError, mariadb.DataError)
+
+
+def client_ref(user_id: int, idempotency_key: str) -> str:
+    ''' ClientRef of a sale sent with an Idempotency-Key: every retry maps to the same one '''
+    return str(uuid.uuid5(_REF_NAMESPACE, f'{user_id}:{idempotency_key}'))
+
+def _fingerprint(sale) -> tuple:
+    ''' What a retry must repeat to be the same sale '''
+    return (int(sale['user_id']), int(sale['client_id']), int(sale['product_id']), int(sale['quantity']))
+
+def _outcome(ref: str, recorded: tuple, fingerprint: tuple, sale_id=None) -> dict:
+    if recorded != fingerprint:
+        return {'conflict': True}
+    return {'sale_ref': ref, 'sale_id': sale_id, 'queued': sale_id is None, 'replayed': True}
+
+
+class SalesJournal:
+    '''
+    Write-behind mode of /sales/new. A validated sale gets a client-visible
+    reference (stored in Sales.ClientRef) and is appended to a local journal;
+    the request returns once the line is fsynced, and concurrent requests
+    share fsyncs. A background worker rotates the journal into a segment,
+    commits its sales in one transaction (group commit) and deletes it.
+    Segments left by a crash are replayed at start: sales whose ClientRef is
+    already stored are skipped, and rows the database refuses for any other
+    reason go to a dead-letter file. The journal belongs to one process:
+    run a single API worker per SALES_JOURNAL_DIR.
+    '''
+
+    def __init__(self, directory: str = SALES_JOURNAL_DIR, mode: str = SALES_WRITE_MODE):
+        if mode not in (SYNC, WRITE_BEHIND):
+            raise ValueError(f'Unknown sales write mode: {mode}')
+        self.mode = mode
+        self.directory = directory
+        self._lock = threading.Lock()       # journal file, pending list, rotation
+        self._sync_lock = threading.Lock()  # one fsync at a time
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._file = None
+        self._thread = None
+        self._pending = []
+        self._backlog = []                  # (segment path, sales) waiting to be committed
+        self._refs = {}                     # ClientRef -> fingerprint of every sale not committed yet
+        self._written = 0
+        self._synced = 0
+        self._segment = 0
+        self.stats = {
+            'accepted': 0, 'retries': 0, 'conflicts': 0, 'fsyncs': 0, 'flushes': 0, 'flushed': 0,
+            'duplicates': 0, 'dead_lettered': 0, 'errors': 0, 'fallbacks': 0, 'recovered': 0,
+            'last_flush_ms': 0.0, 'max_flush_ms': 0.0
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode == WRITE_BEHIND
+
+    def depth(self) -> int:
+        ''' Sales accepted but not committed yet '''
+        with self._lock:
+            return self._depth()
+
+    def _depth(self) -> int:
+        return len(self._pending) + sum(len(sales) for _, sales in self._backlog)
+
+    def metrics(self) -> dict:
+        return dict(self.stats, mode=self.mode, depth=self.depth())
+
+    def start(self):
+        ''' Replay segments left by a previous run and start the flush worker '''
+        if not self.enabled or self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self._recover()
+            self._file = open(os.path.join(self.directory, _JOURNAL), 'a', encoding='utf-8')
+        self._thread = threading.Thread(target=self._run, name='sales-journal', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, sale: dict, idempotency_key: str = None):
+        '''
+        Journal a validated sale (user_id, client_id, product_id, quantity,
+        comp_id). Returns {'sale_ref', 'sale_id', 'queued', 'replayed'} once
+        it is on disk, {'conflict': True} when the Idempotency-Key was used
+        for another sale, or None when the backlog is full and the caller
+        should write the sale itself. A retry with the same key gets the
+        first sale's reference back, and its SaleID once it is committed.
+        '''
+        fingerprint = _fingerprint(sale)
+        if idempotency_key is None:
+            ref = str(uuid.uuid4())
+        else:
+            ref = client_ref(sale['user_id'], idempotency_key)
+            outcome = self._replay(ref, fingerprint)
+            if outcome is not None:
+                return outcome
+        entry = dict(sale, ref=ref, sale_date=datetime.now().isoformat(sep=' ', timespec='seconds'))
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            if ref in self._refs:
+                # A concurrent retry journaled it first
+                recorded = self._refs[ref]
+                position = self._written
+            elif self._file is None or self._depth() >= SALES_JOURNAL_MAX_PENDING:
+                self.stats['fallbacks'] += 1
+                return None
+            else:
+                recorded = None
+                self._file.write(line)
+                self._file.flush()
+                self._pending.append(entry)
+                self._refs[ref] = fingerprint
+                self._written += 1
+                self.stats['accepted'] += 1
+                position = self._written
+                wake = len(self._pending) >= SALES_FLUSH_BATCH
+        self._fsync(position)
+        if recorded is not None:
+            return self._count(_outcome(ref, recorded, fingerprint))
+        if wake:
+            self._wake.set()
+        return {'sale_ref': ref, 'sale_id': None, 'queued': True, 'replayed': False}
+
+    def _replay(self, ref: str, fingerprint: tuple):
+        ''' Outcome of a retried key: from the journal while queued, from Sales once committed; None if unseen '''
+        with self._lock:
+            recorded = self._refs.get(ref)
+            position = self._written
+        if recorded is not None:
+            # The first request may still be waiting for its fsync; the retry is only answered once it is durable
+            self._fsync(position)
+            return self._count(_outcome(ref, recorded, fingerprint))
+        stored = DBConnector().execute_query('get_sale_by_client_ref', ref)
+        if not stored:
+            return None
+        recorded = (stored['UserID'], stored['ClientID'], stored['ProductID'], stored['Quantity'])
+        return self._count(_outcome(ref, recorded, fingerprint, stored['SaleID']))
+
+    def _count(self, outcome: dict) -> dict:
+        with self._lock:
+            self.stats['conflicts' if outcome.get('conflict') else 'retries'] += 1
+        return outcome
+
+    def _fsync(self, position: int):
+        ''' Make line `position` durable; a sync done by another request meanwhile may already cover it '''
+        with self._sync_lock:
+            if self._synced >= position:
+                return
+            written, journal = self._written, self._file
+            os.fsync(journal.fileno())
+            self._synced = max(self._synced, written)
+            self.stats['fsyncs'] += 1
+
+    def _rotate(self):
+        ''' Move the journal and its pending sales to a new segment (caller holds _lock) '''
+        if not self._pending:
+            return
+        with self._sync_lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._synced = self._written
+            self._file.close()
+            self._segment += 1
+            segment = os.path.join(self.directory, _SEGMENT.format(self._segment))
+            os.replace(os.path.join(self.directory, _JOURNAL), segment)
+            self._file = open(os.path.join(self.directory, _JOURNAL), 'a', encoding='utf-8')
+        self._backlog.append((segment, self._pending))
+        self._pending = []
+
+    def _recover(self):
+        ''' Queue the segments and journal of a previous run for commit (caller holds _lock) '''
+        names = sorted(name for name in os.listdir(self.directory) if name.startswith('segment-'))
+        if os.path.exists(os.path.join(self.directory, _JOURNAL)):
+            names.append(_JOURNAL)
+        for name in names:
+            path = os.path.join(self.directory, name)
+            with open(path, encoding='utf-8') as journal:
+                # A line cut short by the crash was never acknowledged
+                sales = []
+                for line in journal:
+                    try:
+                        sales.append(json.loads(line))
+                    except ValueError:
+                        continue
+            if not sales:
+                os.remove(path)
+                continue
+            if name == _JOURNAL:
+                self._segment += 1
+                segment = os.path.join(self.directory, _SEGMENT.format(self._segment))
+                os.replace(path, segment)
+                path = segment
+            else:
+                self._segment = max(self._segment, int(name[len('segment-'):-len('.jsonl')]))
+            self._backlog.append((path, sales))
+            for sale in sales:
+                self._refs.setdefault(sale['ref'], _fingerprint(sale))
+            self.stats['recovered'] += len(sales)
+        if self._backlog:
+            print(f"[SALES JOURNAL] Replaying {self.stats['recovered']} sales from {len(self._backlog)} journal files")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(SALES_FLUSH_INTERVAL)
+            self._wake.clear()
+            if not self.flush():
+                self._stop.wait(SALES_FLUSH_RETRY)
+
+    def flush(self) -> bool:
+        ''' Commit every journaled sale, oldest segment first; False if a batch could not be committed '''
+        with self._lock:
+            self._rotate()
+        while True:
+            with self._lock:
+                if not self._backlog:
+                    return True
+                segment, sales = self._backlog[0]
+            started = time.perf_counter()
+            try:
+                inserted, duplicates, rejected = self._commit(sales)
+            except Exception as e:
+                # The segment stays on disk and in the backlog; the next flush retries it
+                self.stats['errors'] += 1
+                print(f"[SALES JOURNAL] Failed to commit {len(sales)} sales: {e}")
+                return False
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if rejected:
+                # Written before the segment goes: a crash in between replays it and refuses the same rows again
+                self._dead_letter(rejected)
+            os.remove(segment)
+            with self._lock:
+                self._backlog.pop(0)
+                for sale in sales:
+                    self._refs.pop(sale['ref'], None)
+                self.stats['flushes'] += 1
+                self.stats['flushed'] += inserted
+                self.stats['duplicates'] += duplicates
+                self.stats['dead_lettered'] += len(rejected)
+                self.stats['last_flush_ms'] = round(elapsed_ms, 1)
+                self.stats['max_flush_ms'] = round(max(self.stats['max_flush_ms'], elapsed_ms), 1)
+
+    def _commit(self, sales: list) -> tuple:
+        '''
+        Insert a segment's sales in one transaction, company by company in
+        CompanyID order with each company row locked first, as create_sale
+        does. Returns (inserted, duplicates, rejected sales).
+        '''
+        unique = {}
+        for sale in sales:
+            unique.setdefault(sale['ref'], sale)
+        duplicates = len(sales) - len(unique)
+        by_company = {}
+        for sale in unique.values():
+            by_company.setdefault(sale['comp_id'], []).append(sale)
+        inserted, rejected = 0, []
+        with DBConnector().transaction() as tx:
+            for comp_id in sorted(by_company):
+                tx.execute('lock_company_revenue', comp_id)
+                company_sales = by_company[comp_id]
+                for start in range(0, len(company_sales), SALES_FLUSH_CHUNK):
+                    chunk = company_sales[start:start + SALES_FLUSH_CHUNK]
+                    # Only a stored ClientRef makes a sale a replay; anything else the database refuses is reported
+                    stored = set(tx.execute('get_existing_client_refs', {'ids': [sale['ref'] for sale in chunk]}))
+                    new = [sale for sale in chunk if sale['ref'] not in stored]
+                    duplicates += len(chunk) - len(new)
+                    sale_ids = self._insert(tx, new, rejected)
+                    if sale_ids:
+                        tx.execute('add_sales_revenue', {'ids': sale_ids, 'comp_id': comp_id})
+                        tx.execute('add_sales_to_rollup', {'ids': sale_ids})
+                        inserted += len(sale_ids)
+        return inserted, duplicates, rejected
+
+    def _insert(self, tx, sales: list, rejected: list) -> list:
+        ''' SaleIDs of the sales the database accepts; the refused ones are added to `rejected` '''
+        if not sales:
+            return []
+        try:
+            return tx.execute('insert_journaled_sales', sales)
+        except _REFUSED:
+            # Only the failed statement was rolled back: find the refused rows one by one
+            pass
+        sale_ids = []
+        for sale in sales:
+            try:
+                sale_ids.extend(tx.execute('insert_journaled_sales', [sale]))
+            except _REFUSED as e:
+                rejected.append(dict(sale, error=str(e)))
+        return sale_ids
+
+    def _dead_letter(self, rejected: list):
+        with open(os.path.join(self.directory, _DEAD_LETTER), 'a', encoding='utf-8') as dead_letter:
+            for sale in rejected:
+                dead_letter.write(json.dumps(sale) + '\n')
+            dead_letter.flush()
+            os.fsync(dead_letter.fileno())
+        print(f"[SALES JOURNAL] {len(rejected)} sales refused by the database written to {_DEAD_LETTER}")
+
+    def close(self):
+        ''' Stop the worker and commit what is left; anything still failing is replayed at next start '''
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+        with self._lock:
+            self._file.close()
+            self._file = None
+
+sales_journal = SalesJournal()
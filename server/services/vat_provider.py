@@ -0,0 +1,73 @@
+import os
+import json
+import time
+import threading
+from bisect import bisect_right
+from datetime import date
+
+VAT_RATES_PATH = os.getenv(
+    'VAT_RATES_PATH',
+    os.path.join(os.path.dirname(__file__), 'data', 'vat_rates.json')
+)
+# Seconds between checks of the rate table for changes
+VAT_RELOAD_INTERVAL = float(os.getenv('VAT_RELOAD_INTERVAL', '300'))
+
+
+class VatProvider:
+    '''
+    In-process VAT rates by country, replacing a `vat.py` run per lookup.
+    The table maps each country code to the rates in force from a given
+    date ({"PT": [{"from": "2011-01-01", "rate": 23}], ...}); it is read
+    once and re-read when the file changes, at most every reload interval.
+    '''
+
+    def __init__(self, path: str = VAT_RATES_PATH, reload_interval: float = VAT_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._table = {}
+        self._mtime = None
+        self._next_check = 0.0
+
+    def rate(self, country_code: str, on: date = None):
+        ''' VAT percentage in force in the country on the given day (today by default), or None '''
+        periods = self._periods().get(country_code.strip().upper())
+        if not periods:
+            return None
+        starts, rates = periods
+        index = bisect_right(starts, on or date.today()) - 1
+        return rates[index] if index >= 0 else None
+
+    def rates(self, lookups) -> dict:
+        ''' Bulk rate(): {(country_code, day): rate} for an iterable of (country_code, day) pairs '''
+        return {(country_code, on): self.rate(country_code, on) for country_code, on in lookups}
+
+    def _periods(self) -> dict:
+        now = time.monotonic()
+        if now >= self._next_check:
+            with self._lock:
+                if now >= self._next_check:
+                    self._reload()
+                    self._next_check = now + self.reload_interval
+        return self._table
+
+    def _reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._mtime:
+                return
+            with open(self.path, encoding='utf-8') as rates_file:
+                raw = json.load(rates_file)
+            table = {}
+            for country_code, entries in raw.items():
+                entries = sorted((date.fromisoformat(entry['from']), entry['rate']) for entry in entries)
+                table[country_code.upper()] = ([start for start, _ in entries], [rate for _, rate in entries])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Keep serving the last good table
+            print(f"[VAT] Could not load rates from {self.path}: {e}")
+            return
+        self._table = table
+        self._mtime = mtime
+        print(f"[VAT] Loaded rates for {len(table)} countries")
+
+vat_provider = VatProvider()
@@ -0,0 +1,41 @@
+import sys
+import os
+import time
+import jwt
+
+# Add server directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from api import create_app
+from api.auth.jwt_utils import issue_token, validate_token, verify_signature
+from api.auth.token_state import token_state
+
+ITERATIONS = int(os.getenv('BENCH_ITERATIONS', '2000'))
+
+def bench(name, func):
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        func()
+    elapsed = time.perf_counter() - started
+    print(f'{name:<40} {ITERATIONS / elapsed:>12,.0f} tokens/s')
+
+def pem_decode(app, token):
+    ''' Previous path: separate header parse, then decode with the PEM string '''
+    jwt.get_unverified_header(token)
+    jwt.decode(token, key=app.config['JWT_PUBLIC_PEM'], algorithms=['RS256'])
+
+def key_decode(app, token):
+    ''' Key object loaded once at app start, no cache '''
+    jwt.decode(token, key=app.config['JWT_PUBLIC_KEY'], algorithms=['RS256'])
+
+app = create_app()
+with app.app_context():
+    token = issue_token(user_id=1, comp_id=1, is_admin=True, is_agent=False)
+    # Revocation state comes from the in-process cache, keep the DB out of the loop
+    token_state.mark_login(1, 0)
+
+    print(f'validate_token micro-benchmark ({ITERATIONS} iterations)')
+    bench('before: PEM string per call', lambda: pem_decode(app, token))
+    bench('parsed key object', lambda: key_decode(app, token))
+    bench('verified-token cache', lambda: verify_signature(token))
+    bench('validate_token (cache + revocation)', lambda: validate_token(token))
@@ -1,5 +1,6 @@
 import requests
 import sys
+import time
 
 base_url = 'http://127.0.0.1:5000'
 
@@ -59,10 +60,22 @@ with open(file_path, 'rb') as file:
     )
 update_products_data = update_products_response.json()
 if update_products_data['status'] == 'Ok':
-    test_output_status('pass', 'Products update success')
+    test_output_status('pass', f"Products import queued as job {update_products_data['job_id']}")
 else:
     test_output_status('fail', 'Products update failed')
 
+# Admin polls the import job
+job_url = f"{base_url}/jobs/{update_products_data['job_id']}"
+for _ in range(60):
+    job = requests.get(job_url, headers={'Authorization': f'Bearer {ADMIN_AUTH_TOKEN}'}).json()['job']
+    if job['Status'] in ('done', 'failed'):
+        break
+    time.sleep(1)
+if job['Status'] == 'done':
+    test_output_status('pass', f"Products import done: {job['RowsWritten']} rows at {job['RowsPerSecond']} rows/s, {job['Diff']}")
+else:
+    test_output_status('fail', f"Products import {job['Status']}: {job['Error']}")
+
 # Admin calculates cashflow
 cash_flow_url = f'{base_url}/cash-flow'
 cash_flow_payload = {
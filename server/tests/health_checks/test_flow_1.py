@@ -1,6 +1,9 @@
 import requests
 import sys
 import os
+import time
+import uuid
+import json
 
 base_url = 'http://127.0.0.1:5000'
 
@@ -152,10 +155,19 @@ with open(absolute_path, 'rb') as file:
         files={'file': file}
     )
 update_products_data = update_products_response.json()
-if update_products_data['status'] == 'Ok':
+if update_products_data['status'] != 'Ok':
+    test_output_status('fail', 'Products update failed')
+# The import runs as a job; the sale below needs its products
+job_url = f"{base_url}/jobs/{update_products_data['job_id']}"
+for _ in range(60):
+    job = requests.get(job_url, headers={'Authorization': f'Bearer {admin_token}'}).json()['job']
+    if job['Status'] in ('done', 'failed'):
+        break
+    time.sleep(1)
+if job['Status'] == 'done':
     test_output_status('pass', 'Products update success')
 else:
-    test_output_status('fail', 'Products update failed')
+    test_output_status('fail', f"Products update {job['Status']}: {job['Error']}")
 
 # Employee first login
 test_output_status('info', 'Testing new employee first login')
@@ -210,9 +222,61 @@ sale_id = 0
 if new_sale_data['status'] == 'Ok':
     sale_id = new_sale_data['sale_id']
     test_output_status('pass', 'Sale creation success')
+    if new_sale_data.get('queued'):
+        # SALES_WRITE_MODE=write_behind: the sale is committed by the next group flush
+        test_output_status('info', f"Sale queued as {new_sale_data['sale_ref']}")
 else:
     test_output_status('fail', 'Sale creation failed')
 
+# Employee retries a sale with the same Idempotency-Key
+test_output_status('info', 'Testing idempotent sale creation')
+idempotency_headers = {'Idempotency-Key': str(uuid.uuid4())}
+first_sale_data = requests.post(new_sale_url, json=new_sale_payload, headers=idempotency_headers).json()
+retry_sale_data = requests.post(new_sale_url, json=new_sale_payload, headers=idempotency_headers).json()
+# In write-behind mode a queued sale is identified by its sale_ref until it is committed
+sale_key = 'sale_ref' if first_sale_data.get('queued') else 'sale_id'
+if (first_sale_data['status'] == 'Ok' and retry_sale_data['status'] == 'Ok'
+        and not first_sale_data['replayed'] and retry_sale_data['replayed']
+        and retry_sale_data[sale_key] == first_sale_data[sale_key]):
+    test_output_status('pass', f"Retry replayed sale {first_sale_data[sale_key]}")
+else:
+    test_output_status('fail', f'Retry was not replayed: {first_sale_data} then {retry_sale_data}')
+conflict_sale_response = requests.post(
+    new_sale_url, json=dict(new_sale_payload, quantity=new_sale_payload['quantity'] + 1), headers=idempotency_headers
+)
+if conflict_sale_response.status_code == 422:
+    test_output_status('pass', 'Idempotency-Key reused for another sale rejected')
+else:
+    test_output_status('fail', f'Idempotency-Key reuse got {conflict_sale_response.status_code}, expected 422')
+
+# Employee records sales in bulk; each row gets its own result
+test_output_status('info', 'Testing bulk sales')
+bulk_sales_url = f'{base_url}/sales/bulk'
+bulk_sales = [
+    {'client_id': client_id, 'product_id': 90, 'quantity': 1},
+    {'client_id': client_id, 'product_id': -1, 'quantity': 1},
+    {'client_id': client_id, 'product_id': 90, 'quantity': 3},
+]
+bulk_sales_data = requests.post(bulk_sales_url, json={'token': employee_token, 'sales': bulk_sales}).json()
+results = bulk_sales_data.get('results', [])
+if (bulk_sales_data['status'] == 'Ok' and bulk_sales_data['created'] == 2 and bulk_sales_data['failed'] == 1
+        and [result['index'] for result in results] == [0, 1, 2]
+        and [result['status'] for result in results] == ['Ok', 'Error', 'Ok']
+        and all(isinstance(results[index]['sale_id'], int) for index in (0, 2))):
+    test_output_status('pass', 'Bulk sales recorded valid rows and reported the invalid one')
+else:
+    test_output_status('fail', f'Bulk sales results unexpected: {bulk_sales_data}')
+bulk_ndjson_response = requests.post(
+    bulk_sales_url,
+    data=''.join(json.dumps(sale) + '\n' for sale in bulk_sales[:1]) + '{not json\n',
+    headers={'Content-Type': 'application/x-ndjson', 'Authorization': f'Bearer {employee_token}'}
+)
+bulk_ndjson_data = bulk_ndjson_response.json()
+if bulk_ndjson_data['status'] == 'Ok' and bulk_ndjson_data['created'] == 1 and bulk_ndjson_data['failed'] == 1:
+    test_output_status('pass', 'NDJSON bulk sales recorded per line')
+else:
+    test_output_status('fail', f'NDJSON bulk sales results unexpected: {bulk_ndjson_data}')
+
 # Delete employee
 test_output_status('info', 'Testing employee deletion')
 delete_employee_url = f'{base_url}/employee/delete'
@@ -288,6 +352,38 @@ if analytics_data['status'] == 'Ok':
 else:
     test_output_status('fail', 'Company analytics failed')
 
+# Admin revalidates the product list with its ETag
+test_output_status('info', 'Testing product list revalidation')
+products_url = f'{base_url}/products'
+products_headers = {'Authorization': f'Bearer {admin_token}'}
+products_response = requests.get(products_url, headers=products_headers)
+etag = products_response.headers.get('ETag')
+if products_response.status_code != 200 or products_response.json()['status'] != 'Ok' or not etag:
+    test_output_status('fail', f'Product list failed ({products_response.status_code}, ETag {etag})')
+revalidated_response = requests.get(products_url, headers=dict(products_headers, **{'If-None-Match': etag}))
+if revalidated_response.status_code == 304 and not revalidated_response.content:
+    test_output_status('pass', 'Unchanged product list answered with 304')
+else:
+    test_output_status('fail', f'Product list revalidation got {revalidated_response.status_code}, expected 304')
+
+# Admin pages through the audit trail with cursors
+test_output_status('info', 'Testing audit log pages')
+audit_logs_url = f'{base_url}/audit-logs'
+first_page = requests.post(audit_logs_url, json={'token': admin_token, 'limit': 2}).json()
+if first_page['status'] != 'Ok' or len(first_page['logs']) > 2:
+    test_output_status('fail', f'Audit logs first page failed: {first_page}')
+if first_page['next_cursor'] is None:
+    test_output_status('info', f"Only {len(first_page['logs'])} audit logs, no second page to check")
+else:
+    second_page = requests.post(
+        audit_logs_url, json={'token': admin_token, 'limit': 2, 'cursor': first_page['next_cursor']}
+    ).json()
+    keys = [(log['Timestamp'], log['LogID']) for log in first_page['logs'] + second_page['logs']]
+    if second_page['status'] == 'Ok' and second_page['logs'] and keys == sorted(keys, reverse=True) and len(set(keys)) == len(keys):
+        test_output_status('pass', 'Audit log cursor continues newest first without repeats')
+    else:
+        test_output_status('fail', f'Audit log pages out of order or overlapping: {keys}')
+
 # Admin calculates cashflow
 cash_flow_url = f'{base_url}/cash-flow'
 cash_flow_payload = {
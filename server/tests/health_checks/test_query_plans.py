@@ -0,0 +1,92 @@
+import sys
+import os
+import re
+from datetime import date
+
+# Add server directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from db.db_connector import DBConnector
+from db.queries import QUERIES
+
+def test_output_status(status, text):
+    if status == 'pass':
+        print(f'\033[92m[PASS]\033[0m {text}')
+    elif status == 'info':
+        print(f'\033[96m[INFO]\033[0m {text}')
+    else:
+        print(f'\033[91m[FAIL]\033[0m {text}')
+        sys.exit(1)
+
+# (query, args, table as named in the plan, index it must be able to use, ordered by that index)
+HOT_QUERIES = [
+    ('get_login_profile', 'jdoe', 'Users', 'Username', False),
+    ('get_user_sales', 1, 'S', 'UserSaleDate', False),
+    ('get_last_3_sales', 1, 'S', 'UserSaleDate', True),
+    ('page_user_sales', {'owner_id': 1, 'limit': 101}, 'S', 'UserSaleDate', True),
+    ('page_user_overview', {'user_id': 1, 'limit': 101}, 'S', 'UserSaleDate', True),
+    ('page_company_sales', {'owner_id': 1, 'limit': 101}, 'S', 'CompanySaleDate', True),
+    ('get_company_sales', 1, 'Clients', 'CompanyID', False),
+    ('get_clients_list', 1, 'Clients', 'CompanyID', False),
+    ('get_products_list', 1, 'Products', 'CompanyID', False),
+    ('get_sales_month_comp_id', {'comp_id': 1, 'month': 8, 'year': 2024}, 'Sales', 'UserSaleDate', False),
+    ('get_costs_sales_month', {'comp_id': 1, 'month': 8, 'year': 2024}, 'SalesMonthlyRollup', 'PRIMARY', False),
+    ('get_employees_return', {'comp_id': 1, 'month': 8, 'year': 2024}, 'r', 'PRIMARY', False),
+    ('get_cash_flow_months', {'comp_id': 1, 'start': date(2024, 7, 1), 'end': date(2024, 10, 1)}, 'r', 'PRIMARY', False),
+    ('get_pending_commissions', 1, 'r', 'PRIMARY', False),
+    ('search_audit_logs', {'comp_id': 1, 'limit': 101}, 'a', 'CompanyTimestamp', True),
+    ('search_audit_logs', {'comp_id': 1, 'user_id': 1, 'limit': 101}, 'a', 'UserTimestamp', True),
+]
+
+# Tables of the hot queries; fresh statistics keep the optimizer from scanning out of ignorance
+TABLES = ('Users', 'Sales', 'Clients', 'Products', 'SalesMonthlyRollup', 'AuditLogs')
+# FROM/JOIN <Table> [alias]; the alias is whatever word follows that is not a keyword
+TABLE_REF = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?!(?:ON|WHERE|JOIN|LEFT|INNER|ORDER|GROUP|LIMIT)\b)(\w+))?', re.IGNORECASE)
+
+def force_index(sql: str, table: str, index: str):
+    ''' sql with FORCE INDEX (index) on the reference named `table` in the plan, None if it is not found '''
+    for match in TABLE_REF.finditer(sql):
+        if (match.group(2) or match.group(1)) == table:
+            return f'{sql[:match.end()]} FORCE INDEX (`{index}`){sql[match.end():]}'
+    return None
+
+def explain(cursor, name, sql, params, table):
+    cursor.execute(f'EXPLAIN {sql}', params)
+    plan = {row['table']: row for row in cursor.fetchall()}
+    if table not in plan:
+        test_output_status('fail', f'{name}: {table} missing from plan {list(plan)}')
+    return plan[table], plan
+
+connection = DBConnector().connect()
+if connection is None:
+    test_output_status('fail', 'Could not connect to the database')
+cursor = connection.cursor(dictionary=True)
+
+for table in TABLES:
+    cursor.execute(f'ANALYZE TABLE {table}')
+    cursor.fetchall()
+
+test_output_status('info', 'Checking that hot queries are served by an index')
+for name, args, table, index, ordered in HOT_QUERIES:
+    sql, params = QUERIES[name].statement(args)
+    row, plan = explain(cursor, name, sql, params, table)
+    usable = (row['possible_keys'] or '').split(',')
+    if index not in usable and row['key'] != index:
+        test_output_status('fail', f'{name}: {table} cannot use {index} (type {row["type"]}, possible keys {usable})')
+    note = ''
+    if row['key'] != index:
+        # Small seed tables can make a scan look cheaper: the forced plan must then read the index, not scan
+        forced = force_index(sql, table, index)
+        if forced is None:
+            test_output_status('fail', f'{name}: cannot force {index} on {table}')
+        note = f', forced; optimizer chose {row["key"] or "a scan"} over {row["rows"]} rows'
+        row, plan = explain(cursor, name, forced, params, table)
+    if row['type'] == 'ALL' or row['key'] != index:
+        test_output_status('fail', f'{name}: {table} scanned instead of using {index} (type {row["type"]})')
+    # The sort shows on whichever table the join starts from
+    if ordered and any('filesort' in (step['Extra'] or '') for step in plan.values()):
+        test_output_status('fail', f'{name}: {table} sorts instead of reading {index} in order')
+    test_output_status('pass', f'{name}: {table} uses {index} ({row["type"]}{note})')
+
+cursor.close()
+connection.close()